@@ -0,0 +1,266 @@
+# --------------------------------------------------
+# Ballistic arc prediction for airborne kernel ticks
+# --------------------------------------------------
+# ‣ ArcPredictor(world).solve(k, dt, steers) = the arc ahead from kernel k's
+#                                              state and held input, checked
+#                                              against the world once per chunk
+# ‣ ArcPredictor.follows(x, y, z, dx, dy, dz)  = the tick about to run stays on
+#                                              the arc where it touches nothing
+# ‣ ArcPredictor.landed / land_x/y/z          = first floor the arc comes down
+#   ArcPredictor.time_to_land()                 on, and how long until then
+# ‣ python sm64_arc.py                        = same trajectories as the probing
+#                                              kernel + probes saved + timing
+# The arc runs the kernel's own recurrences (momentum easing towards the
+# stick, gravity per tick) with no probes, so a clear tick lands on the
+# same floats and the kernel moves it with one add (an untouched
+# move_capsule ends on that add too, so replays match either way). A tick
+# is clear when nothing comes within `margin` of any point of its sweep
+# (box test, then the exact capsule distance); clear ticks need no probes
+# while Mario stays within half the margin of the arc, the rest are probed
+# as usual. Leaving the arc (a stomp bounce, new input, a different dt)
+# drops it and waits RETRY ticks before solving again. A tick long enough
+# for the easing to overshoot is never solved, and an arc ends where it
+# leaves the world's bounds.
+# --------------------------------------------------
+from array import array
+from math import ceil, sqrt
+from sm64_collision import BOX
+
+HORIZON = 180       # ticks looked ahead, 3 s at 60 Hz
+CHUNK = 10          # ticks per broad-phase query
+RETRY = 4           # ticks to wait after leaving an arc before solving again
+
+
+class ArcPredictor:
+    __slots__ = ('world', 'horizon', 'margin', 'xs', 'ys', 'zs', 'clear_ticks', 'tick', 'last', 'retry', 'landed',
+                 'land_x', 'land_y', 'land_z', 'land_tick', 'dt', 'solves', 'skipped')
+
+    def __init__(self, world, horizon=HORIZON, margin=0.1):
+        self.world = world
+        self.horizon = horizon
+        self.margin = margin
+        self.xs = array('d', bytes(8 * (horizon + 1)))
+        self.ys = array('d', bytes(8 * (horizon + 1)))
+        self.zs = array('d', bytes(8 * (horizon + 1)))
+        self.clear_ticks = array('b', bytes(horizon + 1))     # 1: tick n - 1 -> n touches nothing
+        self.solves = 0
+        self.skipped = 0        # ticks moved without a probe
+        self.clear()
+
+    def clear(self):
+        # Forget the arc; the next solve() goes ahead without waiting
+        self.tick = -1
+        self.last = 0
+        self.retry = 0
+        self.landed = False
+        self.land_x = self.land_y = self.land_z = 0.0
+        self.land_tick = 0
+        self.dt = 0.0
+
+    def time_to_land(self):
+        return (self.land_tick - self.tick) * self.dt if self.landed and self.tick >= 0 else -1.0
+
+    # ---------- Solving ----------
+    def solve(self, k, dt, steers):
+        # From k's state after a tick, assuming the next ticks keep its input
+        if self.retry > 0:
+            self.retry -= 1
+            return False
+        if steers and 12 * dt >= 1.0:
+            # A hitch this long makes the kernel's easing overshoot and grow: probe it like any other tick
+            return False
+        self.solves += 1
+        self.tick = 0
+        self.dt = dt
+        self.landed = False
+        x, y, z, vy, g = k.x, k.y, k.z, k.velocity_y, k.gravity_strength * dt
+        mx, mz = k.mom_x, k.mom_z
+        # The kernel's own recurrences, written the same way so the arc lands on the same floats
+        ease = steers and k.moving
+        drag = steers and not k.moving
+        tx, tz = k.move_x * k.speed, k.move_z * k.speed
+        xs, ys, zs, clear = self.xs, self.ys, self.zs, self.clear_ticks
+        xs[0], ys[0], zs[0] = x, y, z
+        body = k.body
+        r, height, m, mask = body.radius, body.height, self.margin, body.mask
+        top = max(height, 2 * r)
+        world = self.world
+        horizon = self.horizon
+        falling_from = ceil(vy / g) - 1 if vy > 0.0 else 0     # tick n -> n + 1 comes down from here on
+        for start in range(0, horizon, CHUNK):
+            end = min(start + CHUNK, horizon)
+            lo_x = hi_x = x
+            lo_y = hi_y = y
+            lo_z = hi_z = z
+            for n in range(start + 1, end + 1):
+                if ease:
+                    mx += (tx - mx) * 10 * dt
+                    mz += (tz - mz) * 10 * dt
+                elif drag:
+                    mx -= mx * 12 * dt
+                    mz -= mz * 12 * dt
+                vy -= g
+                x = xs[n] = x + mx * dt
+                y = ys[n] = y + vy * dt
+                z = zs[n] = z + mz * dt
+                if x < lo_x:
+                    lo_x = x
+                elif x > hi_x:
+                    hi_x = x
+                if y < lo_y:
+                    lo_y = y
+                elif y > hi_y:
+                    hi_y = y
+                if z < lo_z:
+                    lo_z = z
+                elif z > hi_z:
+                    hi_z = z
+            lo_x, lo_y, lo_z = lo_x - r - m, lo_y - m, lo_z - r - m
+            hi_x, hi_y, hi_z = hi_x + r + m, hi_y + top + m, hi_z + r + m
+            if (lo_x > world.max_x or hi_x < world.min_x or lo_z > world.max_z or hi_z < world.min_z
+                    or hi_y < world.min_y):
+                # Off the world: nothing left to touch, so the arc ends here clear and unlanded
+                for n in range(start + 1, end + 1):
+                    clear[n] = 1
+                self.last = end
+                return True
+            candidates = world.query(max(lo_x, world.min_x), max(lo_y, world.min_y), max(lo_z, world.min_z),
+                                     min(hi_x, world.max_x), min(hi_y, world.max_y), min(hi_z, world.max_z), mask)
+            if not candidates:
+                for n in range(start + 1, end + 1):
+                    clear[n] = 1
+                continue
+            for n in range(start, end):
+                # Tick n -> n + 1 is clear when nothing comes within the margin of any point of it
+                ax, bx, ay, by, az, bz = xs[n], xs[n + 1], ys[n], ys[n + 1], zs[n], zs[n + 1]
+                lo_x, hi_x = (ax if ax < bx else bx) - r - m, (bx if ax < bx else ax) + r + m
+                lo_y, hi_y = (ay if ay < by else by) - m, (by if ay < by else ay) + top + m
+                lo_z, hi_z = (az if az < bz else bz) - r - m, (bz if az < bz else az) + r + m
+                clear[n + 1] = 1
+                falling = n >= falling_from
+                for c in candidates:
+                    if not (c.max_x >= lo_x and c.min_x <= hi_x and c.max_y >= lo_y and c.min_y <= hi_y
+                            and c.max_z >= lo_z and c.min_z <= hi_z):
+                        continue
+                    if not (c.kind == BOX and c.axes[4] == 1.0):
+                        # Upright boxes are their bounds; anything else gets the exact distance
+                        reach = r + m + 0.5 * sqrt((bx - ax) ** 2 + (by - ay) ** 2 + (bz - az) ** 2)
+                        if not world.capsule_within(c, (ax + bx) * 0.5, (ay + by) * 0.5, (az + bz) * 0.5, r,
+                                                    height, reach):
+                            continue
+                    clear[n + 1] = 0
+                    # Coming down onto it: is it a floor Mario would stand on? (the feet must be below its top)
+                    if falling and by < c.max_y and world.touches_floor((c,), bx, by, bz, r, height):
+                        self.landed = True
+                        self.land_x, self.land_y, self.land_z = bx, by, bz
+                        self.land_tick = self.last = n + 1
+                        return True
+                    if not falling:
+                        break
+        self.last = horizon
+        return True
+
+    # ---------- Following ----------
+    def follows(self, x, y, z, dx, dy, dz):
+        # True when the tick about to run, from (x, y, z) by (dx, dy, dz), stays on the arc
+        # and the arc is clear there, so it needs no probes
+        n = self.tick + 1
+        if n > self.last:
+            self.tick = -1      # still in the air past the prediction: solve again
+            return False
+        tolerance = self.margin * 0.5
+        xs, ys, zs = self.xs, self.ys, self.zs
+        if (abs(x - xs[n - 1]) > tolerance or abs(y - ys[n - 1]) > tolerance or abs(z - zs[n - 1]) > tolerance
+                or abs(x + dx - xs[n]) > tolerance or abs(y + dy - ys[n]) > tolerance
+                or abs(z + dz - zs[n]) > tolerance):
+            self.tick = -1
+            self.retry = RETRY
+            return False
+        self.tick = n
+        if not self.clear_ticks[n]:
+            return False
+        self.skipped += 1
+        return True
+
+
+if __name__ == '__main__':
+    import time
+    from math import sin, cos
+    from sm64_collision import CollisionWorld
+    from sm64_heightfield import Heightfield
+    from sm64_kernel import MarioKernel
+
+    world = CollisionWorld()
+    world.add_box(0, -0.05, 0, 120, 0.1, 120)
+    world.add_box(12, 2.5, 12, 10, 5, 10)
+    world.add_box(25, 1.5, -12, 15, 3, 8, rx=-20)
+    world.add_box(-10, 4, -10, 6, 0.5, 6)
+    world.add_sphere(-20, 1, 20, 2)
+    world.heightfield = Heightfield(world)
+
+    def play(arcs, seconds=40):
+        # Scripted play: runs, jump chains, long jumps, dives, pounds and wall kicks over the test world
+        k = MarioKernel(world)
+        if not arcs:
+            k.arc = None
+        k.reset(0, 0, -20)
+        dt = 1 / 60
+        trace = []
+        for tick in range(int(seconds / dt)):
+            phase = tick % 240
+            angle = tick // 240 * 0.7
+            mx, mz = (0.0, 0.0) if 150 < phase < 170 else (sin(angle), cos(angle))
+            if phase in (20, 50, 62):
+                k.jump()
+            elif phase == 100:
+                k.crouch(True)
+                k.long_jump(mx, mz)
+                k.crouch(False)
+            elif phase == 110:
+                k.dive(mx, mz)
+            elif phase == 180:
+                k.jump()
+            elif phase == 200:
+                k.ground_pound()
+            k.step(dt, mx, mz)
+            if k.y < -30 or abs(k.x) > 55 or abs(k.z) > 55:
+                k.reset(0, 0, -20)
+            trace.append((k.x, k.y, k.z, k.action, k.velocity_y))
+        return k, trace
+
+    k, with_arcs = play(True)
+    probed, without = play(False)
+    assert with_arcs == without, next(i for i, (a, b) in enumerate(zip(with_arcs, without)) if a != b)
+    airborne = sum(1 for s in without if s[3] >= 4)
+    print(f'identical over {len(without)} ticks; {k.arc.skipped} of {airborne} airborne ticks moved without probes, '
+          f'{k.arc.solves} arcs solved')
+    assert k.arc.skipped > airborne // 3
+    # Landing prediction: a drop from above the heightfield's band comes down straight below
+    k = MarioKernel(world)
+    k.reset(0, 6, -20)
+    k.step(1 / 60, 0, 0)
+    assert k.arc.landed and abs(k.arc.land_y) < 0.05 and abs(k.arc.land_z + 20) < 1e-6, (k.arc.land_y, k.arc.land_z)
+    predicted = k.clock + k.arc.time_to_land()
+    while not k.grounded:
+        k.step(1 / 60, 0, 0)
+    assert abs(k.clock - predicted) < 1.5 / 60, (k.clock, predicted)
+    # A frame hitch while steering in the air is probed, not solved, and a fall off the world ends the arc there
+    from sm64_level import LEVEL_TERRAIN, PLAYER_SPAWN, build_collision_world
+    k = MarioKernel(build_collision_world(LEVEL_TERRAIN))
+    k.reset(*PLAYER_SPAWN)
+    solves = k.arc.solves
+    for dt in (0.25, 0.5, 1.0):
+        k.step(dt, 0.0, 1.0)
+    assert k.arc.solves == solves
+    k.reset(500, 50, 500)
+    k.step(1 / 60, 0.0, 0.0)
+    assert k.arc.solves == solves + 1 and not k.arc.landed and k.arc.last == CHUNK, k.arc.last
+    # Cost of the airborne ticks, best of a few interleaved runs so machine noise doesn't pick the winner
+    best = {False: float('inf'), True: float('inf')}
+    for _ in range(7):
+        for arcs in best:
+            start = time.perf_counter()
+            play(arcs)
+            best[arcs] = min(best[arcs], time.perf_counter() - start)
+    for label, arcs in (('probing', False), ('arcs', True)):
+        print(f'{label:8} {best[arcs] / len(without) * 1e6:.2f} us a tick')
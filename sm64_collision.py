@@ -0,0 +1,457 @@
+# --------------------------------------------------
+# Static collision world for the Ursina SM64 ports
+# --------------------------------------------------
+# ‣ CollisionWorld.add_box / add_sphere = register level geometry once
+# ‣ CollisionWorld.raycast              = nearest hit, written to world.hit
+# ‣ CollisionWorld.move_capsule         = swept move-and-slide with step-up
+# ‣ LAYER_* / MASK_*                    = every query filters by layer mask
+#                                         before any narrow-phase work
+# ‣ CollisionWorld.heightfield          = optional baked ground for snapping
+# ‣ CollisionWorld.min_x .. max_z       = bounds of every collider added
+# ‣ CollisionWorld.probe_log            = list to record rays / moves into (debug)
+# Coordinates and rotations follow Ursina (Y up, degrees, left-handed).
+# --------------------------------------------------
+from math import sqrt, sin, cos, radians, floor, inf
+
+BOX = 0
+SPHERE = 1
+
+# Collision layers; a collider sits on one layer, queries pass a mask of layers
+LAYER_TERRAIN = 1 << 0
+LAYER_PLAYER = 1 << 1
+LAYER_ENEMY = 1 << 2
+LAYER_PICKUP = 1 << 3
+LAYER_FX = 1 << 4
+LAYER_CAMERA = 1 << 5    # camera-only blockers, ignored by gameplay probes
+MASK_ALL = (1 << 6) - 1
+MASK_PLAYER_MOVE = LAYER_TERRAIN
+MASK_PLAYER_TOUCH = LAYER_ENEMY | LAYER_PICKUP
+MASK_ENEMY_PROBE = LAYER_TERRAIN
+MASK_CAMERA = LAYER_TERRAIN | LAYER_CAMERA
+
+FLOOR_MIN_NY = 0.35      # contact normals steeper than ~70 degrees are walls
+CEILING_MAX_NY = -0.7
+
+
+def rotation_axes(rx, ry, rz):
+    # World-space local x/y/z axes for an Ursina rotation (roll, then pitch, then yaw)
+    sx, cx = sin(radians(rx)), cos(radians(rx))
+    sy, cy = sin(radians(ry)), cos(radians(ry))
+    sz, cz = sin(radians(rz)), cos(radians(rz))
+
+    def turn(x, y, z):
+        y, z = y * cx - z * sx, y * sx + z * cx
+        return x * cy + z * sy, y, -x * sy + z * cy
+
+    return turn(cz, -sz, 0) + turn(sz, cz, 0) + turn(0, 0, 1)
+
+
+class Collider:
+    __slots__ = ('kind', 'layer', 'x', 'y', 'z', 'hx', 'hy', 'hz', 'radius', 'axes',
+                 'min_x', 'min_y', 'min_z', 'max_x', 'max_y', 'max_z', 'owner', 'stamp')
+
+    def __init__(self, kind, x, y, z, layer=LAYER_TERRAIN, owner=None):
+        self.kind = kind
+        self.layer = layer
+        self.x, self.y, self.z = x, y, z
+        self.hx = self.hy = self.hz = self.radius = 0.0
+        self.axes = (1.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 1.0)
+        self.owner = owner
+        self.stamp = 0
+
+
+class RayHit:
+    __slots__ = ('hit', 'distance', 'x', 'y', 'z', 'nx', 'ny', 'nz', 'collider')
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.hit = False
+        self.distance = 0.0
+        self.x = self.y = self.z = 0.0
+        self.nx, self.ny, self.nz = 0.0, 1.0, 0.0
+        self.collider = None
+
+
+class Capsule:
+    # Upright capsule, (x, y, z) is the feet position like Mario's origin_y=-0.5 box
+    __slots__ = ('x', 'y', 'z', 'radius', 'height', 'step_height', 'mask',
+                 'grounded', 'ground_nx', 'ground_ny', 'ground_nz', 'ground_collider',
+                 'hit_wall', 'wall_nx', 'wall_ny', 'wall_nz', 'hit_ceiling')
+
+    def __init__(self, radius=0.3, height=1.8, step_height=0.5, mask=MASK_PLAYER_MOVE):
+        self.x = self.y = self.z = 0.0
+        self.radius = radius
+        self.height = height
+        self.step_height = step_height
+        self.mask = mask
+        self.clear_contacts()
+
+    def clear_contacts(self):
+        self.grounded = False
+        self.ground_nx, self.ground_ny, self.ground_nz = 0.0, 1.0, 0.0
+        self.ground_collider = None
+        self.hit_wall = False
+        self.wall_nx = self.wall_ny = self.wall_nz = 0.0
+        self.hit_ceiling = False
+
+
+class CollisionWorld:
+    def __init__(self, cell_size=8.0):
+        self.cell_size = cell_size
+        self.colliders = []
+        self.hit = RayHit()
+        self.heightfield = None
+        self.probe_log = None
+        self.sweeps = 0         # moves the heightfield could not take, so the capsule sweep did
+        self.version = 0        # bumped by every collider added: cached contacts compare it
+        self.min_x = self.min_y = self.min_z = inf
+        self.max_x = self.max_y = self.max_z = -inf
+        self._cells = {}
+        self._stamp = 0
+        self._candidates = []
+        # Contact output of the last narrow-phase test
+        self._depth = 0.0
+        self._nx = self._ny = self._nz = 0.0
+        self._top = 0.0
+        # Remaining motion of the current move_capsule sub-step
+        self._sx = self._sy = self._sz = 0.0
+
+    # ---------- Registration ----------
+    def add_box(self, x, y, z, sx, sy, sz, rx=0, ry=0, rz=0, layer=LAYER_TERRAIN, owner=None):
+        c = Collider(BOX, x, y, z, layer, owner)
+        c.hx, c.hy, c.hz = abs(sx) * 0.5, abs(sy) * 0.5, abs(sz) * 0.5
+        a = c.axes = rotation_axes(rx, ry, rz)
+        ex = abs(a[0]) * c.hx + abs(a[3]) * c.hy + abs(a[6]) * c.hz
+        ey = abs(a[1]) * c.hx + abs(a[4]) * c.hy + abs(a[7]) * c.hz
+        ez = abs(a[2]) * c.hx + abs(a[5]) * c.hy + abs(a[8]) * c.hz
+        self._insert(c, ex, ey, ez)
+        return c
+
+    def add_sphere(self, x, y, z, radius, layer=LAYER_TERRAIN, owner=None):
+        c = Collider(SPHERE, x, y, z, layer, owner)
+        c.radius = radius
+        self._insert(c, radius, radius, radius)
+        return c
+
+    def add_entity(self, entity, shape='box', layer=LAYER_TERRAIN):
+        # Mirrors an Ursina Entity's collider; cylinders are approximated by their box
+        x, y, z = entity.world_position
+        sx, sy, sz = entity.world_scale
+        if shape == 'sphere':
+            return self.add_sphere(x, y, z, max(abs(sx), abs(sy), abs(sz)) * 0.5, layer, entity)
+        rx, ry, rz = entity.world_rotation
+        return self.add_box(x, y, z, sx, sy, sz, rx, ry, rz, layer, entity)
+
+    def _insert(self, c, ex, ey, ez):
+        c.min_x, c.min_y, c.min_z = c.x - ex, c.y - ey, c.z - ez
+        c.max_x, c.max_y, c.max_z = c.x + ex, c.y + ey, c.z + ez
+        self.colliders.append(c)
+        self.version += 1
+        if c.min_x < self.min_x:
+            self.min_x = c.min_x
+        if c.min_y < self.min_y:
+            self.min_y = c.min_y
+        if c.min_z < self.min_z:
+            self.min_z = c.min_z
+        if c.max_x > self.max_x:
+            self.max_x = c.max_x
+        if c.max_y > self.max_y:
+            self.max_y = c.max_y
+        if c.max_z > self.max_z:
+            self.max_z = c.max_z
+        if self.heightfield is not None and c.layer & self.heightfield.mask:
+            self.heightfield.invalidate(c.min_x, c.min_z, c.max_x, c.max_z)
+        cs = self.cell_size
+        for ix in range(floor(c.min_x / cs), floor(c.max_x / cs) + 1):
+            for iz in range(floor(c.min_z / cs), floor(c.max_z / cs) + 1):
+                self._cells.setdefault((ix, iz), []).append(c)
+
+    # ---------- Broad-phase ----------
+    def query(self, min_x, min_y, min_z, max_x, max_y, max_z, mask=MASK_ALL):
+        # Colliders on a masked layer whose bounds overlap the box; the returned list is reused
+        self._stamp += 1
+        stamp = self._stamp
+        out = self._candidates
+        out.clear()
+        cs = self.cell_size
+        cells = self._cells
+        for ix in range(floor(min_x / cs), floor(max_x / cs) + 1):
+            for iz in range(floor(min_z / cs), floor(max_z / cs) + 1):
+                cell = cells.get((ix, iz))
+                if cell is None:
+                    continue
+                for c in cell:
+                    if c.stamp == stamp:
+                        continue
+                    c.stamp = stamp
+                    if not c.layer & mask:
+                        continue
+                    if (c.max_x >= min_x and c.min_x <= max_x and c.max_y >= min_y and c.min_y <= max_y
+                            and c.max_z >= min_z and c.min_z <= max_z):
+                        out.append(c)
+        return out
+
+    # ---------- Rays ----------
+    def raycast(self, ox, oy, oz, dx, dy, dz, distance, mask=MASK_ALL):
+        hit = self.hit
+        hit.clear()
+        length = sqrt(dx * dx + dy * dy + dz * dz)
+        if length < 1e-9:
+            return False
+        dx, dy, dz = dx / length, dy / length, dz / length
+        ex, ey, ez = ox + dx * distance, oy + dy * distance, oz + dz * distance
+        best = distance
+        for c in self.query(min(ox, ex), min(oy, ey), min(oz, ez), max(ox, ex), max(oy, ey), max(oz, ez), mask):
+            if c.kind == BOX:
+                t = self._ray_box(c, ox, oy, oz, dx, dy, dz, best)
+            else:
+                t = self._ray_sphere(c, ox, oy, oz, dx, dy, dz, best)
+            if 0.0 <= t <= best:
+                best = t
+                hit.hit = True
+                hit.collider = c
+                hit.nx, hit.ny, hit.nz = self._nx, self._ny, self._nz
+        if hit.hit:
+            hit.distance = best
+            hit.x, hit.y, hit.z = ox + dx * best, oy + dy * best, oz + dz * best
+        if self.probe_log is not None:
+            if hit.hit:
+                self.probe_log.append(('hit', ox, oy, oz, hit.x, hit.y, hit.z))
+            else:
+                self.probe_log.append(('miss', ox, oy, oz, ex, ey, ez))
+        return hit.hit
+
+    def _ray_box(self, c, ox, oy, oz, dx, dy, dz, max_t):
+        a = c.axes
+        rx, ry, rz = ox - c.x, oy - c.y, oz - c.z
+        t_min, t_max = 0.0, max_t
+        axis, sign = -1, 0.0
+        for i, h in ((0, c.hx), (1, c.hy), (2, c.hz)):
+            ax, ay, az = a[3 * i], a[3 * i + 1], a[3 * i + 2]
+            lo = rx * ax + ry * ay + rz * az
+            ld = dx * ax + dy * ay + dz * az
+            if -1e-9 < ld < 1e-9:
+                if lo < -h or lo > h:
+                    return -1.0
+                continue
+            t1, t2, s = (-h - lo) / ld, (h - lo) / ld, -1.0
+            if t1 > t2:
+                t1, t2, s = t2, t1, 1.0
+            if t1 > t_min:
+                t_min, axis, sign = t1, i, s
+            if t2 < t_max:
+                t_max = t2
+            if t_min > t_max:
+                return -1.0
+        if axis < 0:
+            return -1.0  # origin inside the box
+        self._nx, self._ny, self._nz = a[3 * axis] * sign, a[3 * axis + 1] * sign, a[3 * axis + 2] * sign
+        return t_min
+
+    def _ray_sphere(self, c, ox, oy, oz, dx, dy, dz, max_t):
+        rx, ry, rz = ox - c.x, oy - c.y, oz - c.z
+        b = rx * dx + ry * dy + rz * dz
+        q = rx * rx + ry * ry + rz * rz - c.radius * c.radius
+        if q < 0.0:
+            return -1.0  # origin inside the sphere
+        disc = b * b - q
+        if disc < 0.0 or b > 0.0:
+            return -1.0
+        t = -b - sqrt(disc)
+        if t > max_t:
+            return -1.0
+        r = c.radius
+        self._nx, self._ny, self._nz = (rx + dx * t) / r, (ry + dy * t) / r, (rz + dz * t) / r
+        return t
+
+    # ---------- Capsule contacts ----------
+    def _capsule_contact(self, c, x, y0, y1, z, r):
+        # Penetration of the segment (x, y0..y1, z) inflated by r; fills _depth/_n*/_top
+        if c.kind == SPHERE:
+            py = c.y if y0 < c.y < y1 else (y0 if c.y <= y0 else y1)
+            dx, dy, dz = x - c.x, py - c.y, z - c.z
+            reach = r + c.radius
+            d2 = dx * dx + dy * dy + dz * dz
+            if d2 >= reach * reach:
+                return False
+            d = sqrt(d2)
+            if d < 1e-9:
+                self._nx, self._ny, self._nz = 0.0, 1.0, 0.0
+            else:
+                self._nx, self._ny, self._nz = dx / d, dy / d, dz / d
+            self._depth = reach - d
+            self._top = c.y + c.radius * self._ny
+            return True
+
+        a = c.axes
+        hx, hy, hz = c.hx, c.hy, c.hz
+        rx, ry, rz = x - c.x, y0 - c.y, z - c.z
+        # Segment start and direction in box space (direction is world up)
+        px = rx * a[0] + ry * a[1] + rz * a[2]
+        py = rx * a[3] + ry * a[4] + rz * a[5]
+        pz = rx * a[6] + ry * a[7] + rz * a[8]
+        length = y1 - y0
+        ux, uy, uz = a[1] * length, a[4] * length, a[7] * length
+        dd = length * length
+        t = 0.0
+        if dd > 1e-12:
+            t = -(px * ux + py * uy + pz * uz) / dd
+            t = 0.0 if t < 0.0 else (1.0 if t > 1.0 else t)
+            # Alternate projections between segment and box converge on the closest pair
+            for _ in range(3):
+                qx = min(max(px + ux * t, -hx), hx)
+                qy = min(max(py + uy * t, -hy), hy)
+                qz = min(max(pz + uz * t, -hz), hz)
+                t = ((qx - px) * ux + (qy - py) * uy + (qz - pz) * uz) / dd
+                t = 0.0 if t < 0.0 else (1.0 if t > 1.0 else t)
+        sx, sy, sz = px + ux * t, py + uy * t, pz + uz * t
+        qx, qy, qz = min(max(sx, -hx), hx), min(max(sy, -hy), hy), min(max(sz, -hz), hz)
+        dx, dy, dz = sx - qx, sy - qy, sz - qz
+        d2 = dx * dx + dy * dy + dz * dz
+        if d2 >= r * r:
+            return False
+        if d2 > 1e-12:
+            d = sqrt(d2)
+            lx, ly, lz = dx / d, dy / d, dz / d
+            self._depth = r - d
+        else:
+            # Segment point inside the box: leave through the nearest face
+            ex, ey, ez = hx - abs(sx), hy - abs(sy), hz - abs(sz)
+            lx = ly = lz = 0.0
+            if ex <= ey and ex <= ez:
+                lx, depth = (1.0 if sx >= 0 else -1.0), ex
+            elif ey <= ez:
+                ly, depth = (1.0 if sy >= 0 else -1.0), ey
+            else:
+                lz, depth = (1.0 if sz >= 0 else -1.0), ez
+            self._depth = depth + r
+        self._nx = lx * a[0] + ly * a[3] + lz * a[6]
+        self._ny = lx * a[1] + ly * a[4] + lz * a[7]
+        self._nz = lx * a[2] + ly * a[5] + lz * a[8]
+        self._top = c.y + qx * a[1] + qy * a[4] + qz * a[7]
+        return True
+
+    def overlaps(self, cap):
+        r = cap.radius
+        y0, y1 = cap.y + r, cap.y + max(cap.height - r, r)
+        for c in self.query(cap.x - r, cap.y, cap.z - r, cap.x + r, cap.y + cap.height, cap.z + r, cap.mask):
+            if self._capsule_contact(c, cap.x, y0, y1, cap.z, r) and self._depth > 1e-4:
+                return True
+        return False
+
+    def capsule_within(self, c, x, y, z, radius, height, reach):
+        # Does c come within reach of the axis of a capsule with its feet at (x, y, z)?
+        return self._capsule_contact(c, x, y + radius, y + max(height - radius, radius), z, reach)
+
+    def touches_floor(self, colliders, x, y, z, radius, height):
+        # Would a capsule with its feet at (x, y, z) stand on one of colliders (a query() result)?
+        y0, y1 = y + radius, y + max(height - radius, radius)
+        for c in colliders:
+            if self._capsule_contact(c, x, y0, y1, z, radius) and self._ny >= FLOOR_MIN_NY:
+                return True
+        return False
+
+    def _resolve(self, cap, can_step):
+        r = cap.radius
+        for _ in range(4):
+            y0, y1 = cap.y + r, cap.y + max(cap.height - r, r)
+            pushed = False
+            for c in self.query(cap.x - r, cap.y, cap.z - r, cap.x + r, cap.y + cap.height, cap.z + r, cap.mask):
+                if not self._capsule_contact(c, cap.x, y0, y1, cap.z, r):
+                    continue
+                nx, ny, nz, depth = self._nx, self._ny, self._nz, self._depth
+                if ny >= FLOOR_MIN_NY:
+                    # Floors push straight up so Mario doesn't creep down slopes
+                    cap.y += depth / ny
+                    cap.grounded = True
+                    cap.ground_nx, cap.ground_ny, cap.ground_nz = nx, ny, nz
+                    cap.ground_collider = c
+                    if self._sy < 0.0:
+                        self._sy = 0.0
+                elif ny <= CEILING_MAX_NY:
+                    cap.x += nx * depth
+                    cap.y += ny * depth
+                    cap.z += nz * depth
+                    cap.hit_ceiling = True
+                    if self._sy > 0.0:
+                        self._sy = 0.0
+                else:
+                    rise = self._top - cap.y
+                    if can_step and 0.0 < rise <= cap.step_height and self._try_step(cap, rise):
+                        pushed = True
+                        break
+                    # Walls: push out horizontally and drop the into-wall part of the motion
+                    h = sqrt(nx * nx + nz * nz)
+                    nx, nz = nx / h, nz / h
+                    cap.x += nx * depth
+                    cap.z += nz * depth
+                    cap.hit_wall = True
+                    cap.wall_nx, cap.wall_ny, cap.wall_nz = nx, 0.0, nz
+                    into = self._sx * nx + self._sz * nz
+                    if into < 0.0:
+                        self._sx -= into * nx
+                        self._sz -= into * nz
+                pushed = True
+                y0, y1 = cap.y + r, cap.y + max(cap.height - r, r)
+            if not pushed:
+                return
+
+    def _try_step(self, cap, rise):
+        y = cap.y
+        cap.y = y + rise + 0.01
+        if self.overlaps(cap):
+            cap.y = y
+            return False
+        cap.grounded = True
+        return True
+
+    def move_capsule(self, cap, dx, dy, dz, snap=0.0):
+        # Moves cap by (dx, dy, dz) in sub-steps no longer than half its radius so
+        # fast dives can't tunnel, sliding along walls and stepping up ledges.
+        if self.probe_log is not None:
+            x, y, z = cap.x, cap.y, cap.z
+            grounded = self._move_capsule(cap, dx, dy, dz, snap)
+            self.probe_log.append(('move', x, y, z, cap.x, cap.y, cap.z))
+            return grounded
+        return self._move_capsule(cap, dx, dy, dz, snap)
+
+    def _move_capsule(self, cap, dx, dy, dz, snap):
+        if self.heightfield is not None and self.heightfield.move(cap, dx, dy, dz, snap):
+            return cap.grounded
+        self.sweeps += 1
+        was_grounded = cap.grounded
+        cap.clear_contacts()
+        x, y, z = cap.x, cap.y, cap.z
+        length = sqrt(dx * dx + dy * dy + dz * dz)
+        steps = int(length / (cap.radius * 0.5)) + 1
+        self._sx, self._sy, self._sz = dx / steps, dy / steps, dz / steps
+        for _ in range(steps):
+            cap.x += self._sx
+            cap.y += self._sy
+            cap.z += self._sz
+            self._resolve(cap, was_grounded or cap.grounded)
+        if not (cap.grounded or cap.hit_wall or cap.hit_ceiling):
+            # Nothing pushed: end exactly where one add would, whatever the sub-steps rounded to
+            # (sm64_arc moves clear ticks that way, and replays must match either path)
+            cap.x, cap.y, cap.z = x + dx, y + dy, z + dz
+        if snap > 0.0 and not cap.grounded and dy <= 0.0:
+            # Stay glued to the floor when walking off small drops and down slopes
+            if self.heightfield is not None:
+                found = self.heightfield.snap(cap, snap)
+                if found >= 0:
+                    return found == 1
+            x, y, z = cap.x, cap.y, cap.z
+            hit_wall, wall_nx, wall_nz = cap.hit_wall, cap.wall_nx, cap.wall_nz
+            steps = int(snap / (cap.radius * 0.5)) + 1
+            self._sx, self._sy, self._sz = 0.0, -snap / steps, 0.0
+            for _ in range(steps):
+                cap.y += self._sy
+                self._resolve(cap, False)
+                if cap.grounded:
+                    break
+            if not cap.grounded:
+                cap.x, cap.y, cap.z = x, y, z
+            cap.hit_wall, cap.wall_nx, cap.wall_nz = hit_wall, wall_nx, wall_nz
+        return cap.grounded
@@ -0,0 +1,166 @@
+# --------------------------------------------------
+# Debug overlay: colliders and probes as batched wireframes
+# --------------------------------------------------
+# ‣ DebugOverlay(world, bodies, capsules).toggle() = show / hide, O(1)
+#   (bodies: a SweepAndPrune, capsules: e.g. (kernel.body,); both optional)
+# Every collider on a layer goes into one GeomLines, rebuilt only when the
+# collision world gains colliders; broadphase coins likewise, when one is
+# added or removed. Moving bodies and the capsules are drawn again each
+# frame. While visible, the world logs its rays and capsule moves, and the
+# last frame's probes are drawn as a few more line batches (cyan: moves
+# along a predicted arc, made without probing). Nothing else in the scene
+# is touched.
+# --------------------------------------------------
+from array import array
+from math import sin, cos, pi
+from panda3d.core import Geom, GeomLines, GeomNode, GeomVertexData, GeomVertexFormat
+from ursina import Entity, color
+from sm64_collision import SPHERE, LAYER_TERRAIN, LAYER_ENEMY, LAYER_PICKUP, LAYER_CAMERA
+
+LAYER_COLORS = {LAYER_TERRAIN: color.lime, LAYER_ENEMY: color.red, LAYER_PICKUP: color.yellow, LAYER_CAMERA: color.cyan}
+PROBE_COLORS = {'hit': color.orange, 'miss': color.white, 'move': color.magenta, 'arc': color.cyan}
+CAPSULE_COLOR = color.azure
+CIRCLE_SEGMENTS = 16
+BOX_EDGES = ((0, 1), (2, 3), (4, 5), (6, 7), (0, 2), (1, 3), (4, 6), (5, 7), (0, 4), (1, 5), (2, 6), (3, 7))
+
+
+def sphere_lines(x, y, z, r, out):
+    # Appends line-segment endpoints (x, y, z pairs): one circle around each axis
+    for i in range(CIRCLE_SEGMENTS):
+        a0, a1 = 2 * pi * i / CIRCLE_SEGMENTS, 2 * pi * (i + 1) / CIRCLE_SEGMENTS
+        u0, v0, u1, v1 = cos(a0) * r, sin(a0) * r, cos(a1) * r, sin(a1) * r
+        out.extend((x + u0, y + v0, z, x + u1, y + v1, z))
+        out.extend((x + u0, y, z + v0, x + u1, y, z + v1))
+        out.extend((x, y + u0, z + v0, x, y + u1, z + v1))
+
+
+def capsule_lines(cap, out):
+    # Rings at both sphere centres joined by four side lines, and half circles over each end
+    r, x, z = cap.radius, cap.x, cap.z
+    y0, y1 = cap.y + r, cap.y + max(cap.height - r, r)
+    for i in range(CIRCLE_SEGMENTS):
+        a0, a1 = 2 * pi * i / CIRCLE_SEGMENTS, 2 * pi * (i + 1) / CIRCLE_SEGMENTS
+        u0, v0, u1, v1 = cos(a0) * r, sin(a0) * r, cos(a1) * r, sin(a1) * r
+        out.extend((x + u0, y0, z + v0, x + u1, y0, z + v1))
+        out.extend((x + u0, y1, z + v0, x + u1, y1, z + v1))
+        if i < CIRCLE_SEGMENTS // 2:
+            out.extend((x + u0, y1 + v0, z, x + u1, y1 + v1, z))
+            out.extend((x, y1 + v0, z + u0, x, y1 + v1, z + u1))
+            out.extend((x + u0, y0 - v0, z, x + u1, y0 - v1, z))
+            out.extend((x, y0 - v0, z + u0, x, y0 - v1, z + u1))
+    for dx, dz in ((r, 0.0), (-r, 0.0), (0.0, r), (0.0, -r)):
+        out.extend((x + dx, y0, z + dz, x + dx, y1, z + dz))
+
+
+def collider_lines(c, out):
+    # Appends line-segment endpoints (x, y, z pairs) for one collider
+    if c.kind == SPHERE:
+        sphere_lines(c.x, c.y, c.z, c.radius, out)
+        return
+    a = c.axes
+    corners = []
+    for sx in (-c.hx, c.hx):
+        for sy in (-c.hy, c.hy):
+            for sz in (-c.hz, c.hz):
+                corners.append((c.x + a[0] * sx + a[3] * sy + a[6] * sz,
+                                c.y + a[1] * sx + a[4] * sy + a[7] * sz,
+                                c.z + a[2] * sx + a[5] * sy + a[8] * sz))
+    for i, j in BOX_EDGES:
+        out.extend(corners[i])
+        out.extend(corners[j])
+
+
+def line_node(name, points):
+    # One vertex buffer and one GeomLines primitive for every segment in points
+    count = len(points) // 3
+    vdata = GeomVertexData(name, GeomVertexFormat.get_v3(), Geom.UH_static)
+    vdata.unclean_set_num_rows(count)
+    memoryview(vdata.modify_array(0)).cast('B')[:] = points.tobytes()
+    lines = GeomLines(Geom.UH_static)
+    lines.add_next_vertices(count)
+    geom = Geom(vdata)
+    geom.add_primitive(lines)
+    node = GeomNode(name)
+    node.add_geom(geom)
+    return node
+
+
+class DebugOverlay(Entity):
+    def __init__(self, world, bodies=None, capsules=(), **kwargs):
+        super().__init__(**kwargs)
+        self.world = world
+        self.bodies = bodies
+        self.capsules = capsules
+        self.collider_count = -1
+        self.static_count = -1
+        self.collider_batches = []
+        self.static_batches = []
+        self.body_batches = []
+        self.probe_batches = []
+        self.enabled = False
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        self.world.probe_log = [] if self.enabled else None
+        if not self.enabled:
+            self._clear(self.probe_batches)
+            self._clear(self.body_batches)
+
+    def _clear(self, batches):
+        for batch in batches:
+            batch.remove_node()
+        batches.clear()
+
+    def _add_batch(self, batches, name, points, tint):
+        if not points:
+            return
+        batch = self.attach_new_node(line_node(name, points))
+        batch.set_color(tint)
+        batch.set_light_off(1)
+        batch.set_shader_off(1)
+        batch.set_bin('fixed', 0)
+        batches.append(batch)
+
+    def rebuild(self):
+        self._clear(self.collider_batches)
+        by_layer = {}
+        for c in self.world.colliders:
+            collider_lines(c, by_layer.setdefault(c.layer, array('f')))
+        for layer, points in by_layer.items():
+            self._add_batch(self.collider_batches, f'colliders-{layer}', points, LAYER_COLORS.get(layer, color.gray))
+        self.collider_count = len(self.world.colliders)
+
+    def _add_bodies(self, batches, name, bodies):
+        by_layer = {}
+        for b in bodies:
+            sphere_lines(b.x, b.y, b.z, b.radius, by_layer.setdefault(b.layer, array('f')))
+        for layer, points in by_layer.items():
+            self._add_batch(batches, f'{name}-{layer}', points, LAYER_COLORS.get(layer, color.gray))
+
+    def update(self):
+        if self.collider_count != len(self.world.colliders):
+            self.rebuild()
+        # Broadphase bodies: coins only when their set changes, movers and capsules where they are now
+        self._clear(self.body_batches)
+        if self.bodies is not None:
+            if self.static_count != len(self.bodies.statics):
+                self._clear(self.static_batches)
+                self._add_bodies(self.static_batches, 'statics', self.bodies.statics)
+                self.static_count = len(self.bodies.statics)
+            self._add_bodies(self.body_batches, 'movers', self.bodies.movers)
+        if self.capsules:
+            points = array('f')
+            for cap in self.capsules:
+                capsule_lines(cap, points)
+            self._add_batch(self.body_batches, 'capsules', points, CAPSULE_COLOR)
+        # Probes logged since the last frame, then start a fresh log
+        self._clear(self.probe_batches)
+        log = self.world.probe_log
+        if not log:
+            return
+        by_kind = {}
+        for kind, x0, y0, z0, x1, y1, z1 in log:
+            by_kind.setdefault(kind, array('f')).extend((x0, y0, z0, x1, y1, z1))
+        for kind, points in by_kind.items():
+            self._add_batch(self.probe_batches, f'probes-{kind}', points, PROBE_COLORS[kind])
+        log.clear()
@@ -0,0 +1,80 @@
+# --------------------------------------------------
+# Entity bookkeeping for the Entity-based pyport (the 4k port uses sm64_ecs)
+# --------------------------------------------------
+# ‣ EntityIndex  = unordered entity set, O(1) add / swap-remove
+# ‣ DestroyQueue = deferred destroy(), flushed once at the end of a frame
+# --------------------------------------------------
+
+
+class EntityIndex:
+    # Keyed by id() so entities stay removable after their NodePath is emptied
+    def __init__(self):
+        self.items = []
+        self._slot = {}
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __contains__(self, entity):
+        return id(entity) in self._slot
+
+    def add(self, entity):
+        key = id(entity)
+        if key in self._slot:
+            return False
+        self._slot[key] = len(self.items)
+        self.items.append(entity)
+        return True
+
+    def discard(self, entity):
+        slot = self._slot.pop(id(entity), None)
+        if slot is None:
+            return False
+        last = self.items.pop()
+        if slot < len(self.items):
+            self.items[slot] = last
+            self._slot[id(last)] = slot
+        return True
+
+    def clear(self):
+        self.items.clear()
+        self._slot.clear()
+
+
+class DestroyQueue:
+    # Entities pushed during a frame stay in place (and stay iterable) until
+    # flush(), which unlinks them from every registered index and destroys them.
+    def __init__(self, destroy_fn, *indices):
+        self.destroy_fn = destroy_fn
+        self.indices = list(indices)
+        self.pending = []
+        self._queued = set()
+
+    def __len__(self):
+        return len(self.pending)
+
+    def push(self, entity):
+        key = id(entity)
+        if key in self._queued:
+            return False
+        self._queued.add(key)
+        self.pending.append(entity)
+        return True
+
+    def is_pending(self, entity):
+        return id(entity) in self._queued
+
+    def flush(self):
+        if not self.pending:
+            return 0
+        count = len(self.pending)
+        for entity in self.pending:
+            for index in self.indices:
+                index.discard(entity)
+            self.destroy_fn(entity)
+        self.pending.clear()
+        self._queued.clear()
+        return count
@@ -0,0 +1,163 @@
+# --------------------------------------------------
+# Garbage-collector pause control and hitch log
+# --------------------------------------------------
+# ‣ GCManager().start()          = collect + gc.freeze() once the level is built,
+#                                  then hold young collections for idle time
+# ‣ GCManager.idle(seconds)      = collect if one is due and its last pause fits
+#                                  (hook it on FramePacer.idle)
+# ‣ GCManager.frame()            = once per frame: counts frames and forces an
+#                                  overdue collection when there is never idle time
+# ‣ GCManager.summary() / export = every pause: frame, generation, ms, and whether
+#                                  the manager ran it or CPython fired mid-frame
+# ‣ python sm64_gc.py            = deferred vs automatic pauses on a churny loop
+# Freezing moves everything alive after the level build (meshes, colliders,
+# nav grid, ...) out of the collector, so gen 2 passes only walk what the
+# game made since. With defer=False the manager just raises the thresholds
+# and logs.
+# --------------------------------------------------
+import gc
+import json
+import time
+from collections import deque
+
+THRESHOLDS = (2000, 20, 10)        # used when collections are left to CPython
+OVERDUE = 8                        # deferred: force a collection past 8x the young threshold
+
+
+class GCManager:
+    def __init__(self, defer=True, thresholds=THRESHOLDS, clock=time.perf_counter, keep=4096):
+        self.defer = defer
+        self.thresholds = thresholds
+        self.clock = clock
+        self.events = deque(maxlen=keep)    # (frame, generation, ms, collected, scheduled)
+        self.frames = 0
+        self.frozen = 0
+        self.count = [0, 0, 0]
+        self.total = [0.0, 0.0, 0.0]
+        self.worst = [0.0, 0.0, 0.0]
+        self.last = [0.0, 0.0, 0.0]
+        self.scheduled = False
+        self._start = 0.0
+        self._saved = None
+
+    def start(self, freeze=True):
+        # Call after the level is built; everything alive now is left out of later passes
+        self._saved = gc.get_threshold(), gc.isenabled()
+        if self._callback not in gc.callbacks:
+            gc.callbacks.append(self._callback)
+        if freeze:
+            self.collect(2)
+            gc.freeze()
+            self.frozen = gc.get_freeze_count()
+            self.last[2] = 0.0      # that pass walked the whole level; later ones will not
+        if self.defer:
+            gc.disable()
+        else:
+            gc.set_threshold(*self.thresholds)
+
+    def stop(self):
+        if self._callback in gc.callbacks:
+            gc.callbacks.remove(self._callback)
+        if self._saved:
+            (threshold, enabled), self._saved = self._saved, None
+            gc.set_threshold(*threshold)
+            (gc.enable if enabled else gc.disable)()
+        gc.unfreeze()
+
+    def _callback(self, phase, info):
+        if phase == 'start':
+            self._start = self.clock()
+            return
+        ms = (self.clock() - self._start) * 1000
+        g = info['generation']
+        self.events.append((self.frames, g, ms, info['collected'], self.scheduled))
+        self.count[g] += 1
+        self.total[g] += ms
+        self.last[g] = ms
+        if ms > self.worst[g]:
+            self.worst[g] = ms
+
+    def collect(self, generation):
+        self.scheduled = True
+        try:
+            return gc.collect(generation)
+        finally:
+            self.scheduled = False
+
+    def due(self, scale=1):
+        # Oldest generation whose counter passed its threshold, as CPython would pick; -1 when none
+        counts, thresholds = gc.get_count(), self.thresholds
+        for g in (2, 1, 0):
+            if counts[g] > thresholds[g] * scale:
+                return g
+        return -1
+
+    # ---------- Per frame ----------
+    def idle(self, seconds):
+        if not self.defer:
+            return
+        g = self.due()
+        # Unknown cost (never collected yet) counts as fitting; a gen 2 pass is the slow one
+        if g >= 0 and self.last[g] <= seconds * 1000:
+            self.collect(g)
+
+    def frame(self):
+        self.frames += 1
+        if self.defer and self.due(OVERDUE) >= 0:
+            self.collect(self.due())
+
+    # ---------- Reading ----------
+    def stats(self):
+        scheduled = sum(1 for e in self.events if e[4])
+        return {
+            'frames': self.frames, 'frozen': self.frozen, 'collections': list(self.count),
+            'total_ms': list(self.total), 'worst_ms': list(self.worst),
+            'scheduled': scheduled, 'automatic': len(self.events) - scheduled,
+        }
+
+    def summary(self):
+        s = self.stats()
+        gens = '  '.join(f'gen{g} {s["collections"][g]}x max {s["worst_ms"][g]:.2f} ms' for g in range(3))
+        return f'gc: {gens}  ({s["scheduled"]} scheduled, {s["automatic"]} automatic, {s["frozen"]} objects frozen)'
+
+    def export(self, path):
+        data = self.stats()
+        data['events'] = [dict(zip(('frame', 'generation', 'ms', 'collected', 'scheduled'), e)) for e in self.events]
+        with open(path, 'w') as f:
+            json.dump(data, f)
+
+
+if __name__ == '__main__':
+    class Node:
+        def __init__(self, parent):
+            self.parent = parent
+            self.children = [self]      # a cycle, so only the collector frees it
+
+    def run(manager, frames=600, budget=0.004):
+        # Each frame makes cyclic garbage; the pacer would hand over `budget` seconds of spare time
+        worst = 0.0
+        for frame in range(frames):
+            start = time.perf_counter()
+            for i in range(300):
+                Node(None)
+            worst = max(worst, time.perf_counter() - start)
+            manager.idle(budget)
+            manager.frame()
+        return worst * 1000
+
+    level = [Node(None) for i in range(200000)]     # long-lived level data
+    for defer in (False, True):
+        gc.collect()
+        manager = GCManager(defer=defer)
+        manager.start(freeze=defer)
+        worst = run(manager)
+        manager.stop()
+        print(f'{"deferred" if defer else "automatic"}: worst frame {worst:.2f} ms, {manager.summary()}')
+    assert manager.stats()['automatic'] == 0, manager.stats()
+    # No idle time at all: the overdue fallback keeps garbage bounded
+    manager = GCManager()
+    manager.start(freeze=False)
+    run(manager, budget=0.0)
+    manager.stop()
+    assert manager.count[0] and gc.get_count()[0] < THRESHOLDS[0] * OVERDUE + 1000
+    assert gc.isenabled() and gc.get_freeze_count() == 0
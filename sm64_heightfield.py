@@ -0,0 +1,253 @@
+# --------------------------------------------------
+# Heightfield baked from static terrain for O(1) ground queries
+# --------------------------------------------------
+# ‣ Heightfield(world, resolution)  = top surface, normal and slope class per cell
+#   (bounds=(x0, z0, x1, z1) bakes only that window of a large level)
+# ‣ world.heightfield = hf          = move_capsule goes through it when it can
+# ‣ python sm64_heightfield.py      = agreement with the capsule sweep + timing
+# Only the top surface is stored. A cell is "simple" when a single flat box
+# face covers it (plus a margin) and nothing else sits near that face, so
+# its plane is exact; other cells, anything under the top surface and
+# colliders added after the bake fall back to the capsule sweep, and so
+# does everything outside `bounds`.
+# --------------------------------------------------
+from array import array
+from math import cos, radians
+from sm64_collision import BOX, FLOOR_MIN_NY, MASK_PLAYER_MOVE
+
+SLOPE_NONE, SLOPE_FLAT, SLOPE_GENTLE, SLOPE_STEEP, SLOPE_WALL = range(5)
+FLAT_NY = cos(radians(5))
+SLIDE_NY = cos(radians(30))   # Mario slides on anything steeper
+
+
+def baked_extent(solids, bounds=None):
+    # (min_x, min_z, max_x, max_z) of the solids, cut down to bounds when given
+    extent = (min((c.min_x for c in solids), default=0.0), min((c.min_z for c in solids), default=0.0),
+              max((c.max_x for c in solids), default=0.0), max((c.max_z for c in solids), default=0.0))
+    if bounds is None:
+        return extent
+    return max(extent[0], bounds[0]), max(extent[1], bounds[1]), min(extent[2], bounds[2]), min(extent[3], bounds[3])
+
+
+def slope_class(ny):
+    if ny >= FLAT_NY:
+        return SLOPE_FLAT
+    if ny >= SLIDE_NY:
+        return SLOPE_GENTLE
+    if ny >= FLOOR_MIN_NY:
+        return SLOPE_STEEP
+    return SLOPE_WALL
+
+
+class Heightfield:
+    def __init__(self, world, resolution=1.0, margin=0.5, band_below=1.0, band_above=2.0, mask=MASK_PLAYER_MOVE,
+                 bounds=None):
+        self.world = world
+        self.resolution = resolution
+        self.margin = margin
+        self.band_above = band_above
+        self.mask = mask
+        solids = [c for c in world.colliders if c.layer & mask]
+        self.min_x, self.min_z, max_x, max_z = baked_extent(solids, bounds)
+        self.cols = max(1, int((max_x - self.min_x) / resolution))
+        self.rows = max(1, int((max_z - self.min_z) / resolution))
+        top = max((c.max_y for c in solids), default=0.0) + 1.0
+        bottom = min((c.min_y for c in solids), default=0.0) - 1.0
+        n = self.cols * self.rows
+        self.heights = array('d', bytes(8 * n))
+        self.nx = array('d', bytes(8 * n))
+        self.ny = array('d', bytes(8 * n))
+        self.nz = array('d', bytes(8 * n))
+        self.slope = bytearray(n)
+        self.simple = bytearray(n)
+        self.faces = [None] * n
+        hit = world.hit
+        half = resolution * 0.5 + margin
+        for i in range(n):
+            x, z = self.center(i)
+            if not world.raycast(x, top, z, 0, -1, 0, top - bottom, mask):
+                continue
+            h = hit.y
+            self.heights[i], self.nx[i], self.ny[i], self.nz[i] = h, hit.nx, hit.ny, hit.nz
+            self.slope[i] = slope_class(hit.ny)
+            face = self.faces[i] = hit.collider
+            if face.kind != BOX or self.slope[i] == SLOPE_WALL:
+                continue
+            nearby = world.query(x - half, h - band_below, z - half, x + half, h + band_above, z + half, mask)
+            if len(nearby) == 1 and self._face_covers(face, i, half):
+                self.simple[i] = 1
+        self.hits = self.misses = 0
+
+    def _face_covers(self, c, i, half):
+        # The box face the probe hit must span the whole cell plus margin
+        a = c.axes
+        x0, z0 = self.center(i)
+        n = (self.nx[i], self.ny[i], self.nz[i])
+        extents = (c.hx, c.hy, c.hz)
+        face_axis = max(range(3), key=lambda k: abs(a[3 * k] * n[0] + a[3 * k + 1] * n[1] + a[3 * k + 2] * n[2]))
+        for x, z in ((x0 - half, z0 - half), (x0 + half, z0 - half), (x0 - half, z0 + half), (x0 + half, z0 + half)):
+            px, py, pz = x - c.x, self.plane_height(i, x, z) - c.y, z - c.z
+            for k in range(3):
+                if k != face_axis and abs(px * a[3 * k] + py * a[3 * k + 1] + pz * a[3 * k + 2]) > extents[k] + 1e-6:
+                    return False
+        return True
+
+    # ---------- Lookups ----------
+    def cell_at(self, x, z):
+        col = int((x - self.min_x) // self.resolution)
+        row = int((z - self.min_z) // self.resolution)
+        if 0 <= col < self.cols and 0 <= row < self.rows:
+            return row * self.cols + col
+        return -1
+
+    def center(self, i):
+        row, col = divmod(i, self.cols)
+        return self.min_x + (col + 0.5) * self.resolution, self.min_z + (row + 0.5) * self.resolution
+
+    def plane_height(self, i, x, z):
+        cx, cz = self.center(i)
+        return self.heights[i] - (self.nx[i] * (x - cx) + self.nz[i] * (z - cz)) / self.ny[i]
+
+    def invalidate(self, min_x, min_z, max_x, max_z):
+        # A collider added after the bake: cells near it go back to the sweep
+        pad = self.margin + self.resolution
+        c0 = max(0, int((min_x - pad - self.min_x) // self.resolution))
+        c1 = min(self.cols - 1, int((max_x + pad - self.min_x) // self.resolution))
+        r0 = max(0, int((min_z - pad - self.min_z) // self.resolution))
+        r1 = min(self.rows - 1, int((max_z + pad - self.min_z) // self.resolution))
+        for row in range(r0, r1 + 1):
+            base = row * self.cols
+            for col in range(c0, c1 + 1):
+                self.simple[base + col] = 0
+
+    def move(self, cap, dx, dy, dz, snap):
+        # The whole of move_capsule for a short move that stays inside one simple
+        # cell's margin: no wall, ceiling or step can be touched there, only the plane.
+        limit = self.margin - cap.radius
+        if dx > limit or dx < -limit or dz > limit or dz < -limit or cap.mask != self.mask:
+            return False
+        i = self.cell_at(cap.x, cap.z)
+        if i < 0 or not self.simple[i]:
+            self.misses += 1
+            return False
+        x, z = cap.x + dx, cap.z + dz
+        h = self.plane_height(i, x, z)
+        feet = h + cap.radius * (1.0 / self.ny[i] - 1.0)
+        y = cap.y + dy
+        grounded = y <= feet or (snap > 0.0 and dy <= 0.0 and y - feet <= snap)
+        if grounded:
+            y = feet
+        elif y + cap.height > h + self.band_above:
+            self.misses += 1
+            return False
+        self.hits += 1
+        cap.clear_contacts()
+        cap.x, cap.y, cap.z = x, y, z
+        if grounded:
+            self._ground(cap, i)
+        return True
+
+    def snap(self, cap, distance):
+        # 1 = landed on the plane, 0 = nothing within reach, -1 = not known here
+        i = self.cell_at(cap.x, cap.z)
+        if i < 0 or not self.simple[i] or cap.mask != self.mask:
+            self.misses += 1
+            return -1
+        h = self.plane_height(i, cap.x, cap.z)
+        feet = h + cap.radius * (1.0 / self.ny[i] - 1.0)
+        drop = cap.y - feet
+        if drop < -1e-6 or cap.y - distance > h + self.band_above:
+            self.misses += 1
+            return -1
+        self.hits += 1
+        if drop > distance:
+            return 0
+        cap.y = feet
+        self._ground(cap, i)
+        return 1
+
+    def _ground(self, cap, i):
+        cap.grounded = True
+        cap.ground_nx, cap.ground_ny, cap.ground_nz = self.nx[i], self.ny[i], self.nz[i]
+        cap.ground_collider = self.faces[i]
+
+
+if __name__ == '__main__':
+    import random
+    import time
+    from sm64_collision import Capsule
+    from sm64_level import LEVEL_TERRAIN, scatter_props, build_collision_world
+    world = build_collision_world(LEVEL_TERRAIN + scatter_props(random.Random(1)))
+    start = time.perf_counter()
+    hf = Heightfield(world)
+    print(f'{hf.cols}x{hf.rows} cells, {sum(hf.simple)} simple, baked in {(time.perf_counter() - start) * 1000:.0f} ms')
+    # A window baked on its own matches the full bake inside it and knows nothing outside
+    window = Heightfield(world, bounds=(-20, -20, 20, 20))
+    assert window.cols * window.rows == 1600 and window.cell_at(30, 0) < 0
+    for x, z in ((0.3, -5.2), (12.5, 12.5), (-19.5, 19.5)):
+        i, j = hf.cell_at(x, z), window.cell_at(x, z)
+        assert window.heights[j] == hf.heights[i] and window.simple[j] == hf.simple[i], (x, z)
+    rng = random.Random(2)
+    cap = Capsule()
+    checked = 0
+    sweep_time = field_time = 0.0
+    for _ in range(20000):
+        x, z = rng.uniform(-50, 50), rng.uniform(-50, 50)
+        i = hf.cell_at(x, z)
+        if not hf.simple[i]:
+            continue
+        y = hf.plane_height(i, x, z) + cap.radius * (1 / hf.ny[i] - 1) + rng.uniform(0.0, 0.6)
+        world.heightfield = None
+        cap.x, cap.y, cap.z = x, y, z
+        cap.grounded = False
+        t = time.perf_counter()
+        swept = world.move_capsule(cap, 0, 0, 0, 0.4)
+        sweep_time += time.perf_counter() - t
+        swept_y = cap.y
+        world.heightfield = hf
+        cap.x, cap.y, cap.z = x, y, z
+        cap.grounded = False
+        t = time.perf_counter()
+        baked = world.move_capsule(cap, 0, 0, 0, 0.4)
+        field_time += time.perf_counter() - t
+        assert swept == baked and abs(swept_y - cap.y) < 1e-3, (x, y, z, swept_y, cap.y)
+        checked += 1
+    print(f'{checked} snaps agree; move_capsule with snap {sweep_time / checked * 1e6:.1f} us swept, '
+          f'{field_time / checked * 1e6:.1f} us through the heightfield')
+    # Short moves (a running / falling Mario tick) inside simple cells
+    checked = 0
+    worst = 0.0
+    sweep_time = field_time = 0.0
+    for _ in range(20000):
+        x, z = rng.uniform(-50, 50), rng.uniform(-50, 50)
+        i = hf.cell_at(x, z)
+        if not hf.simple[i]:
+            continue
+        y = hf.plane_height(i, x, z) + cap.radius * (1 / hf.ny[i] - 1) + rng.choice((0.0, rng.uniform(0.0, 0.5)))
+        dx, dy, dz = rng.uniform(-0.2, 0.2), rng.uniform(-0.5, 0.2), rng.uniform(-0.2, 0.2)
+        grounded = rng.random() < 0.5
+        results = []
+        for field in (None, hf):
+            world.heightfield = field
+            cap.x, cap.y, cap.z = x, y, z
+            cap.grounded = grounded
+            t = time.perf_counter()
+            landed = world.move_capsule(cap, dx, dy, dz, 0.4 if grounded else 0.0)
+            elapsed = time.perf_counter() - t
+            results.append((landed, cap.x, cap.y, cap.z, cap.hit_wall))
+            if field is None:
+                sweep_time += elapsed
+            else:
+                field_time += elapsed
+        (a, *pa), (b, *pb) = results
+        assert a == b and abs(pa[0] - pb[0]) < 1e-9 and abs(pa[2] - pb[2]) < 1e-9, (x, y, z, dx, dy, dz, results)
+        if hf.slope[i] == SLOPE_FLAT:
+            assert abs(pa[1] - pb[1]) < 1e-6, (x, y, z, dx, dy, dz, results)
+        else:
+            # Landing mid-sweep zeroes the fall, so going downhill the sweep ends a little
+            # above the slope; the plane answer is the touching height, never lower.
+            assert pb[1] <= pa[1] + 1e-6, (x, y, z, dx, dy, dz, results)
+            worst = max(worst, pa[1] - pb[1])
+        checked += 1
+    print(f'{checked} short moves agree (sweep floats up to {worst:.3f} above slopes); {sweep_time / checked * 1e6:.1f} us '
+          f'swept, {field_time / checked * 1e6:.1f} us through the heightfield ({hf.hits} hits, {hf.misses} misses)')
@@ -0,0 +1,171 @@
+# --------------------------------------------------
+# Frame-budgeted cooperative job scheduler
+# --------------------------------------------------
+# ‣ JobScheduler(budget_ms).add(name, fn, priority, hz) = fn(dt) once a frame
+#                                                        (or hz times a second)
+#                                                        while the budget lasts
+# ‣   critical=True                                    = runs every frame, budget
+#                                                        or not
+# ‣ JobScheduler.run(dt)                               = once per frame, sim dt
+# ‣ JobScheduler.summary() / Job.deferred              = what ran, what waited
+# ‣ python sm64_jobs.py                                = budget, fairness and
+#                                                        catch-up checks
+# Due jobs run highest priority first, and within a priority the one that
+# has gone longest without running first, so equal jobs take turns. Each
+# frame a job waits adds one to its priority until it runs, so nothing
+# waits forever behind busier work. dt is the sim time since the job last
+# ran: a deferred job catches up in one larger step instead of being lost.
+# A job starts only when its recent cost fits what is left of the budget,
+# so a cheap job can still use the end of a frame a big one would overrun.
+# Critical jobs run first and are not counted against the budget.
+# --------------------------------------------------
+import time
+from collections import deque
+
+
+class Job:
+    __slots__ = ('name', 'fn', 'priority', 'interval', 'critical', 'last', 'waiting', 'runs', 'deferred',
+                 'seconds', 'cost')
+
+    def __init__(self, name, fn, priority, interval, critical, now):
+        self.name = name
+        self.fn = fn
+        self.priority = priority
+        self.interval = interval    # sim seconds between runs, 0 = every frame
+        self.critical = critical
+        self.last = now             # sim time of the last run
+        self.waiting = 0            # frames it has been due without running
+        self.runs = 0
+        self.deferred = 0
+        self.seconds = 0.0          # wall time spent in fn
+        self.cost = 0.0             # recent wall time per run (moving average)
+
+
+class JobScheduler:
+    def __init__(self, budget_ms=3.0, clock=time.perf_counter, history=600):
+        self.budget = budget_ms / 1000.0
+        self.clock = clock
+        self.jobs = []
+        self.now = 0.0
+        self.frames = 0
+        self.over_budget = 0                    # frames that deferred something
+        self.log = deque(maxlen=history)        # (frame, names deferred) for recent frames that deferred
+        self.spent = 0.0                        # wall time of the last run()
+
+    def add(self, name, fn, priority=0, hz=0, critical=False):
+        job = Job(name, fn, priority, 1.0 / hz if hz else 0.0, critical, self.now)
+        self.jobs.append(job)
+        return job
+
+    def remove(self, job):
+        if job in self.jobs:
+            self.jobs.remove(job)
+
+    def run(self, dt):
+        self.now = now = self.now + dt
+        self.frames += 1
+        clock = self.clock
+        start = clock()
+        due = []
+        for job in self.jobs:
+            if job.critical:
+                self._run(job, now)
+            elif now - job.last >= job.interval - 1e-9:     # summed frame dts land a hair short
+                due.append(job)
+        # The budget is for the rest, timed from here
+        deadline = clock() + self.budget
+        due.sort(key=lambda job: (-job.priority - job.waiting, job.last))
+        deferred = None
+        for i, job in enumerate(due):
+            # Starts when its usual cost still fits; the first always starts, so nothing is too big to run
+            if i == 0 or clock() + job.cost <= deadline:
+                self._run(job, now)
+                continue
+            job.waiting += 1
+            job.deferred += 1
+            if deferred is None:
+                deferred = []
+            deferred.append(job.name)
+        if deferred:
+            self.over_budget += 1
+            self.log.append((self.frames, tuple(deferred)))
+        self.spent = clock() - start
+
+    def _run(self, job, now):
+        clock = self.clock
+        start = clock()
+        job.fn(now - job.last)
+        seconds = clock() - start
+        job.last = now
+        job.waiting = 0
+        job.runs += 1
+        job.seconds += seconds
+        job.cost += (seconds - job.cost) * (0.1 if job.runs > 1 else 1.0)
+
+    def summary(self):
+        lines = [f'jobs: {self.over_budget} of {self.frames} frames deferred work to stay in the '
+                 f'{self.budget * 1000:g} ms budget']
+        for job in sorted(self.jobs, key=lambda job: -job.priority):
+            average = job.seconds / job.runs * 1000 if job.runs else 0.0
+            lines.append(f'  {job.name:16} ran {job.runs:6} ({average:.3f} ms avg)  deferred {job.deferred}'
+                         + ('  critical' if job.critical else ''))
+        return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    # A fake clock: each job advances it by its cost, so budgets are exact
+    now = [0.0]
+
+    def clock():
+        return now[0]
+
+    def work(name, ms, steps):
+        def fn(dt):
+            now[0] += ms / 1000.0
+            steps.append((name, dt))
+        return fn
+
+    # Critical work always runs; the rest fits the budget in priority order and takes turns
+    steps = []
+    jobs = JobScheduler(budget_ms=3.0, clock=clock)
+    jobs.add('physics', work('physics', 5.0, steps), critical=True)
+    jobs.add('ai', work('ai', 1.5, steps), priority=2)
+    jobs.add('coins', work('coins', 1.0, steps), priority=1)
+    jobs.add('particles', work('particles', 1.0, steps), priority=1)
+    jobs.add('hud', work('hud', 0.5, steps), priority=0, hz=10)
+    worst = 0.0
+    for frame in range(600):
+        jobs.run(1 / 60)
+        if frame:       # the first frame has no costs to go on yet
+            worst = max(worst, jobs.spent)
+    runs = {job.name: job.runs for job in jobs.jobs}
+    print(jobs.summary())
+    assert runs['physics'] == 600
+    # 4 ms of work a frame for a 3 ms budget: ai leads on priority, the rest take turns as their wait grows,
+    # and no frame's budgeted work runs over
+    assert all(runs[name] > 0 for name in runs) and runs['ai'] >= runs['coins'] > 0
+    assert abs(runs['coins'] - runs['particles']) <= 2
+    assert worst <= 0.008 + 1e-9, worst        # 5 ms critical + 3 ms budget
+    # Deferred jobs catch up: dt adds up to the sim time that passed
+    for name in ('ai', 'coins', 'hud'):
+        total = sum(dt for n, dt in steps if n == name)
+        last = next(job for job in jobs.jobs if job.name == name).last
+        assert abs(total - last) < 1e-9, (name, total, last)
+    assert jobs.log and jobs.log[-1][0] == 600
+    # With room to spare everything runs at its own rate and nothing is deferred
+    steps = []
+    jobs = JobScheduler(budget_ms=8.0, clock=clock)
+    jobs.add('ai', work('ai', 1.5, steps), priority=2)
+    jobs.add('coins', work('coins', 1.0, steps), priority=1)
+    hud = jobs.add('hud', work('hud', 0.5, steps), hz=10)
+    for frame in range(600):
+        jobs.run(1 / 60)
+    assert jobs.over_budget == 0 and hud.runs == 100 and sum(job.runs for job in jobs.jobs) == 1300
+    # Overhead of the scheduler itself on real time, 20 trivial jobs
+    jobs = JobScheduler(budget_ms=3.0)
+    for i in range(20):
+        jobs.add(f'job{i}', lambda dt: None, priority=i % 3, hz=(0, 30, 10)[i % 3])
+    start = time.perf_counter()
+    for frame in range(10000):
+        jobs.run(1 / 60)
+    print(f'scheduler overhead: {(time.perf_counter() - start) / 10000 * 1e6:.1f} us a frame for 20 jobs')
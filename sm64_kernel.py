@@ -0,0 +1,365 @@
+# --------------------------------------------------
+# Mario movement kernel (no Ursina, no per-tick garbage)
+# --------------------------------------------------
+# ‣ MarioKernel.step(dt, move_x, move_z) = one physics tick
+# ‣ jump / crouch / dive / ground_pound   = input actions
+# ‣ MarioKernel.action                    = ACT_* id, as in SM64
+# ‣ python sm64_kernel.py                 = allocation self-check
+# State lives in float slots instead of Vec3s, so a steady-state tick
+# allocates nothing that survives it and never feeds the cyclic GC.
+# Each action's row in ACTION_FLAGS says what it may do; a tick runs only
+# the ground step (slope test) or the air step (ceiling, landing, wall
+# kick) for the current action, and inputs are table lookups.
+# Airborne ticks the heightfield cannot take follow a predicted arc
+# (sm64_arc) and move by one add, without probes, while it is clear; every
+# action change drops the arc. Standing idle on ground that gave the same
+# height twice is a resting contact: until there is input, an action, a push or
+# a new collider, ticks keep the cached contact and skip gravity and probes.
+# --------------------------------------------------
+from math import sqrt, atan2, degrees
+from sm64_collision import Capsule
+from sm64_arc import ArcPredictor
+from sm64_heightfield import SLIDE_NY
+
+REST_SPEED = 1e-3       # idle momentum below this (under 0.02 mm a tick) is zeroed, so resting can start
+
+(ACT_IDLE, ACT_WALK, ACT_CROUCH, ACT_SLIDE, ACT_JUMP, ACT_DOUBLE_JUMP, ACT_TRIPLE_JUMP, ACT_LONG_JUMP,
+ ACT_FREEFALL, ACT_DIVE, ACT_GROUND_POUND, ACT_WALL_KICK) = range(12)
+ACTION_NAMES = ('idle', 'walk', 'crouch', 'slide', 'jump', 'double jump', 'triple jump', 'long jump',
+                'freefall', 'dive', 'ground pound', 'wall kick')
+
+AIRBORNE, STEERS, CAN_JUMP, CAN_LONG_JUMP, CAN_DIVE, CAN_POUND, CAN_WALL_KICK = 1, 2, 4, 8, 16, 32, 64
+_AIR = AIRBORNE | STEERS | CAN_DIVE | CAN_POUND | CAN_WALL_KICK
+ACTION_FLAGS = (
+    STEERS | CAN_JUMP,                       # idle
+    STEERS | CAN_JUMP,                       # walk
+    STEERS | CAN_JUMP | CAN_LONG_JUMP,       # crouch
+    CAN_JUMP,                                # slide: the slope steers
+    _AIR, _AIR, _AIR, _AIR, _AIR,            # jump, double, triple, long jump, freefall
+    AIRBORNE | STEERS | CAN_POUND | CAN_WALL_KICK,   # dive
+    AIRBORNE | STEERS,                       # ground pound: straight down until it lands
+    _AIR,                                    # wall kick
+)
+# Jump pressed during an action: grounded actions start a jump, jumps chain
+# within chain_window of the last one; -1 = no jump from here
+NEXT_JUMP = (ACT_JUMP, ACT_JUMP, ACT_JUMP, ACT_JUMP, ACT_DOUBLE_JUMP, ACT_TRIPLE_JUMP,
+             -1, -1, -1, -1, -1, -1)
+JUMP_COUNT = (0, 0, 0, 0, 1, 2, 3, 0, 0, 0, 0, 0)
+
+
+class MarioKernel:
+    __slots__ = ('world', 'body', 'speed', 'jump_height', 'double_jump_height', 'triple_jump_height',
+                 'jump_duration', 'gravity_strength', 'wall_kick_speed', 'wall_kick_push', 'launch_per_duration',
+                 'chain_window', 'wall_kick_time', 'long_jump_height', 'long_jump_push', 'x', 'y', 'z',
+                 'rotation_y', 'velocity_y', 'mom_x', 'mom_z', 'move_x', 'move_z', 'moving', 'action', 'grounded',
+                 'jump_count', 'last_jump_time', 'crouching', 'diving', 'sliding', 'wall_kick_cooldown', 'clock',
+                 'pound_landed', 'wall_kicked', 'arc', 'rest', 'resting', '_rest_x', '_rest_y', '_rest_z',
+                 '_rest_version', '_steps', '_jump_speeds')
+
+    def __init__(self, world, speed=8, jump_height=5.0, double_jump_height=6.0, triple_jump_height=7.5,
+                 jump_duration=0.35, gravity_strength=24, wall_kick_speed=5.0, wall_kick_push=4.0,
+                 launch_per_duration=False, chain_window=None, wall_kick_time=0.3, long_jump_height=4.0,
+                 long_jump_push=5.0):
+        # launch_per_duration: jumps leave at height / jump_duration, as the Entity ports do, instead of
+        # at height itself; chain_window (default jump_duration) is how long a jump can chain into the next
+        self.world = world
+        self.body = Capsule(radius=0.3, height=1.8, step_height=0.5)
+        self.speed = speed
+        self.jump_height = jump_height
+        self.double_jump_height = double_jump_height
+        self.triple_jump_height = triple_jump_height
+        self.jump_duration = jump_duration
+        self.gravity_strength = gravity_strength
+        self.wall_kick_speed = wall_kick_speed
+        self.wall_kick_push = wall_kick_push
+        self.launch_per_duration = launch_per_duration
+        self.chain_window = jump_duration if chain_window is None else chain_window
+        self.wall_kick_time = wall_kick_time
+        self.long_jump_height = long_jump_height
+        self.long_jump_push = long_jump_push
+        # Per-action dispatch, built once so a tick only indexes it
+        self._steps = tuple(self._step_air if flags & AIRBORNE else self._step_ground for flags in ACTION_FLAGS)
+        heights = {ACT_JUMP: jump_height, ACT_DOUBLE_JUMP: double_jump_height, ACT_TRIPLE_JUMP: triple_jump_height,
+                   ACT_LONG_JUMP: long_jump_height}
+        self._jump_speeds = {action: height / jump_duration if launch_per_duration else height
+                             for action, height in heights.items()}
+        self.clock = 0.0
+        self.arc = ArcPredictor(world)      # None: probe every airborne tick
+        self.rest = True                    # False: run the full tick even while resting
+        self.resting = False
+        self._rest_x = self._rest_y = self._rest_z = 0.0
+        self._rest_version = 0
+        self.reset(0.0, 0.0, 0.0)
+
+    def reset(self, x, y, z):
+        self.x, self.y, self.z = float(x), float(y), float(z)
+        self.rotation_y = 0.0
+        self.velocity_y = 0.0
+        self.mom_x = self.mom_z = 0.0
+        self.move_x = self.move_z = 0.0
+        self.moving = False
+        self.last_jump_time = -1.0
+        self.crouching = False
+        self.wall_kick_cooldown = 0.0
+        self.pound_landed = False
+        self.wall_kicked = False
+        self.body.grounded = False
+        self.set_action(ACT_FREEFALL)
+        self.jump_count = 0
+
+    def set_action(self, action):
+        # The flags readers (HUD, net, telemetry) use are kept in step with the action
+        self.action = action
+        self.resting = False
+        if self.arc is not None:
+            self.arc.clear()
+        self.grounded = not ACTION_FLAGS[action] & AIRBORNE
+        self.sliding = action == ACT_SLIDE
+        self.diving = action == ACT_DIVE
+        count = JUMP_COUNT[action]
+        if count:
+            self.jump_count = count
+
+    # ---------- Per-tick physics ----------
+    def step(self, dt, move_x, move_z):
+        # move_x/move_z: camera-relative input on the XZ plane, any length
+        self.clock += dt
+        self.pound_landed = False
+        self.wall_kicked = False
+        if self.resting:
+            # Nothing moved it and the ground is unchanged: the full tick would land where it stands
+            if (move_x * move_x + move_z * move_z <= 0.0001 and self.velocity_y == 0.0 and self.mom_x == 0.0
+                    and self.mom_z == 0.0 and self.x == self._rest_x and self.y == self._rest_y
+                    and self.z == self._rest_z and self.world.version == self._rest_version):
+                self.wall_kick_cooldown -= dt
+                return
+            self.resting = False
+        length = sqrt(move_x * move_x + move_z * move_z)
+        self.moving = length > 0.01
+        if self.moving:
+            move_x /= length
+            move_z /= length
+        else:
+            move_x = move_z = 0.0
+        self.move_x, self.move_z = move_x, move_z
+        if ACTION_FLAGS[self.action] & STEERS:
+            if self.moving:
+                target_rotation = degrees(atan2(move_x, move_z))
+                self.rotation_y += (target_rotation - self.rotation_y) * 15 * dt
+                self.mom_x += (move_x * self.speed - self.mom_x) * 10 * dt
+                self.mom_z += (move_z * self.speed - self.mom_z) * 10 * dt
+            else:
+                self.mom_x -= self.mom_x * 12 * dt
+                self.mom_z -= self.mom_z * 12 * dt
+
+        # Gravity and swept move-and-slide
+        self.velocity_y -= self.gravity_strength * dt
+        body = self.body
+        body.x, body.y, body.z = self.x, self.y, self.z
+        snap = 0.4 if self.grounded and self.velocity_y <= 0 else 0.0
+        dx, dy, dz = self.mom_x * dt, self.velocity_y * dt, self.mom_z * dt
+        world, arc = self.world, self.arc
+        sweeps = world.sweeps
+        if arc is not None and arc.tick >= 0 and arc.follows(self.x, self.y, self.z, dx, dy, dz):
+            # A clear tick of the arc touches nothing: one add, no sweep, sub-steps or heightfield
+            body.clear_contacts()
+            body.x, body.y, body.z = self.x + dx, self.y + dy, self.z + dz
+            if world.probe_log is not None:
+                world.probe_log.append(('arc', self.x, self.y, self.z, body.x, body.y, body.z))
+        else:
+            world.move_capsule(body, dx, dy, dz, snap)
+        x, y, z = self.x, self.y, self.z
+        self.x, self.y, self.z = body.x, body.y, body.z
+        self._steps[self.action](dt, body)
+        self.wall_kick_cooldown -= dt
+        if self.action == ACT_IDLE or self.action == ACT_CROUCH:
+            self._settle(x, y, z)
+        # Airborne and past what the heightfield covers: the ticks ahead may follow an arc instead
+        flags = ACTION_FLAGS[self.action]
+        if arc is not None and world.sweeps != sweeps and arc.tick < 0 and flags & AIRBORNE:
+            arc.solve(self, dt, flags & STEERS)
+
+    def _settle(self, x, y, z):
+        # Idle: drop the last of the momentum, and rest once a tick leaves Mario where it found him
+        if -REST_SPEED < self.mom_x < REST_SPEED and -REST_SPEED < self.mom_z < REST_SPEED:
+            self.mom_x = self.mom_z = 0.0
+            if self.rest and self.x == x and self.y == y and self.z == z:
+                self.resting = True
+                self._rest_x, self._rest_y, self._rest_z = x, y, z
+                self._rest_version = self.world.version
+
+    def _step_ground(self, dt, body):
+        if body.grounded and self.velocity_y <= 0:
+            self.velocity_y = 0.0
+            self._stand(dt, body)
+        else:
+            self.set_action(ACT_FREEFALL)
+
+    def _step_air(self, dt, body):
+        if body.hit_ceiling and self.velocity_y > 0:
+            self.velocity_y = 0.0
+        if body.grounded and self.velocity_y <= 0:
+            self.velocity_y = 0.0
+            self.jump_count = 0
+            self.pound_landed = self.action == ACT_GROUND_POUND
+            self._stand(dt, body)
+            return
+        # Wall kick: only airborne actions ever look at the wall contact
+        if ACTION_FLAGS[self.action] & CAN_WALL_KICK and self.wall_kick_cooldown <= 0 and body.hit_wall:
+            if self.move_x * body.wall_nx + self.move_z * body.wall_nz < -0.7:
+                self.velocity_y = self.wall_kick_speed
+                self.mom_x, self.mom_z = -self.move_x * self.wall_kick_push, -self.move_z * self.wall_kick_push
+                self.wall_kick_cooldown = self.wall_kick_time
+                self.wall_kicked = True
+                self.set_action(ACT_WALL_KICK)
+
+    def _stand(self, dt, body):
+        # Slope test for every grounded tick: steep ground slides unless crouching
+        if body.ground_ny < SLIDE_NY and not self.crouching:
+            h = sqrt(body.ground_nx * body.ground_nx + body.ground_nz * body.ground_nz)
+            self.mom_x += body.ground_nx / h * 8 * dt
+            self.mom_z += body.ground_nz / h * 8 * dt
+            self.set_action(ACT_SLIDE)
+        else:
+            self.set_action(ACT_CROUCH if self.crouching else (ACT_WALK if self.moving else ACT_IDLE))
+
+    # ---------- Input actions ----------
+    def jump(self):
+        action = self.action
+        next_action = NEXT_JUMP[action]
+        if next_action < 0 or (ACTION_FLAGS[action] & AIRBORNE and self.clock - self.last_jump_time >= self.chain_window):
+            return False
+        self.velocity_y = self._jump_speeds[next_action]
+        self.last_jump_time = self.clock
+        self.set_action(next_action)
+        return True
+
+    def long_jump(self, forward_x, forward_z):
+        if not ACTION_FLAGS[self.action] & CAN_LONG_JUMP:
+            return False
+        self.velocity_y = self._jump_speeds[ACT_LONG_JUMP]
+        self._push(forward_x, forward_z, self.long_jump_push)
+        self.set_action(ACT_LONG_JUMP)
+        return True
+
+    def crouch(self, held):
+        self.crouching = held
+        if self.action in (ACT_IDLE, ACT_WALK, ACT_CROUCH):
+            self.set_action(ACT_CROUCH if held else (ACT_WALK if self.moving else ACT_IDLE))
+
+    def dive(self, forward_x, forward_z):
+        if not ACTION_FLAGS[self.action] & CAN_DIVE:
+            return False
+        self.velocity_y = 2.0
+        self._push(forward_x, forward_z, 6)
+        self.set_action(ACT_DIVE)
+        return True
+
+    def ground_pound(self):
+        if not ACTION_FLAGS[self.action] & CAN_POUND:
+            return False
+        self.velocity_y = -15.0
+        self.set_action(ACT_GROUND_POUND)
+        return True
+
+    def _push(self, forward_x, forward_z, amount):
+        length = sqrt(forward_x * forward_x + forward_z * forward_z)
+        if length > 1e-6:
+            self.mom_x += forward_x / length * amount
+            self.mom_z += forward_z / length * amount
+
+
+def measure_tick_allocations(kernel, ticks=600, dt=1 / 60, move_x=0.0, move_z=0.0, warmup=300):
+    # Returns (bytes still allocated, GC-tracked objects created) across steady-state ticks
+    import gc
+    import tracemalloc
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    tracemalloc.start()
+    try:
+        # Warm up under tracing so interpreter free lists are already primed
+        for _ in range(warmup):
+            kernel.step(dt, move_x, move_z)
+        memory_before = tracemalloc.get_traced_memory()[0]
+        objects_before = gc.get_count()[0]
+        for _ in range(ticks):
+            kernel.step(dt, move_x, move_z)
+        memory_after = tracemalloc.get_traced_memory()[0]
+        objects_after = gc.get_count()[0]
+    finally:
+        tracemalloc.stop()
+        if gc_enabled:
+            gc.enable()
+    return memory_after - memory_before, objects_after - objects_before
+
+
+if __name__ == '__main__':
+    from sm64_collision import CollisionWorld
+    world = CollisionWorld()
+    world.add_box(0, -0.05, 0, 120, 0.1, 120)
+    world.add_box(12, 2.5, 12, 10, 5, 10)
+    world.add_box(25, 1.5, -12, 15, 3, 8, rx=-20)
+    from sm64_heightfield import Heightfield
+    world.heightfield = Heightfield(world)
+    for label, start, move in (('idle', (0, 0, 0), (0, 0)), ('run', (0, 0, -30), (0, 1)),
+                               ('wall', (12, 0, 3), (0, 1)), ('slope', (25, 6, -12), (0, 0))):
+        kernel = MarioKernel(world)
+        kernel.reset(*start)
+        grown, objects = measure_tick_allocations(kernel, move_x=move[0], move_z=move[1])
+        print(f'{label:6} retained bytes: {grown:4}  gc objects: {objects:4}')
+        # Colliders keep their last query stamp and floats hop between free lists
+        # and the heap, so allow a few dozen boxed numbers of jitter; real
+        # per-tick garbage grows with the tick count (one float a tick is
+        # already 14 KB here) and trips this immediately.
+        assert grown <= 1024 and objects == 0, label
+    # Resting contact: the same ticks as running every one in full, and an idle tick costs next to nothing
+    import time
+    from math import sin, cos
+
+    def play(rest, seconds=30):
+        # Runs and jumps broken up by idle stretches, on flat ground, the box top and the slope
+        k = MarioKernel(world)
+        k.rest = rest
+        k.reset(0, 0, 0)
+        rested, trace = 0, []
+        for tick in range(int(seconds * 60)):
+            phase, angle = tick % 300, tick // 300 * 1.3
+            moving = phase < 60 or 200 < phase < 215
+            if phase in (30, 205):
+                k.jump()
+            elif phase == 120:
+                k.crouch(True)
+            elif phase == 160:
+                k.crouch(False)
+            k.step(1 / 60, sin(angle) if moving else 0.0, cos(angle) if moving else 0.0)
+            rested += k.resting
+            trace.append((k.x, k.y, k.z, k.action, k.velocity_y, k.mom_x, k.mom_z, k.wall_kick_cooldown))
+        return trace, rested
+
+    resting, rested = play(True)
+    assert resting == play(False)[0]
+    print(f'resting contact: identical over {len(resting)} ticks, {rested} of them resting')
+    assert rested > len(resting) // 4
+    kernel = MarioKernel(world)
+    kernel.reset(0, 0, 0)
+    for i in range(60):
+        kernel.step(1 / 60, 0, 0)
+    assert kernel.resting
+    kernel.velocity_y = 3.0             # a push from outside wakes it
+    kernel.step(1 / 60, 0, 0)
+    assert not kernel.resting and kernel.y > 0
+    for i in range(120):
+        kernel.step(1 / 60, 0, 0)
+    assert kernel.resting
+    world.add_box(kernel.x, 0.2, kernel.z, 2, 0.4, 2)     # so does a change to the world: a step appears underfoot
+    for i in range(10):
+        kernel.step(1 / 60, 0, 0)
+    assert abs(kernel.y - 0.4) < 0.01, kernel.y
+    for label, rest in (('full idle tick', False), ('resting tick', True)):
+        kernel.rest, kernel.resting = rest, False
+        for i in range(10):
+            kernel.step(1 / 60, 0, 0)
+        start = time.perf_counter()
+        for i in range(20000):
+            kernel.step(1 / 60, 0, 0)
+        print(f'{label:15} {(time.perf_counter() - start) / 20000 * 1e6:.2f} us')
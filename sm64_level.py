@@ -0,0 +1,65 @@
+# --------------------------------------------------
+# Level layout for the 4k port, shared with headless tools
+# --------------------------------------------------
+# ‣ Pieces are (shape, position, scale, rotation_x, color name) tuples
+# ‣ build_collision_world(pieces) = CollisionWorld without Ursina
+# ‣ scatter_prop_positions(rng)   = ground points per prop type, for sm64_props
+# Pass a seeded random.Random to reproduce prop and spawn placement.
+# --------------------------------------------------
+import random
+from sm64_collision import CollisionWorld, LAYER_TERRAIN
+
+LEVEL_TERRAIN = [
+    ('box', (0, -0.05, 0), (120, 0.1, 120), 0, 'grass'),
+    ('box', (12, 2.5, 12), (10, 5, 10), 0, 'dirt'),
+    ('box', (-18, 4, 8), (8, 8, 8), 0, 'dirt'),
+    ('box', (0, 6, -15), (12, 2, 6), 0, 'orange'),
+    ('box', (25, 1.5, -12), (15, 3, 8), -20, 'gray'),
+    ('box', (-12, 3, -8), (10, 6, 10), 25, 'gray'),
+    # Cannon prop
+    ('cylinder', (20, 1, 20), (1, 2, 1), 30, 'gray'),
+]
+
+PLAYER_SPAWN = (0, 10, 0)
+
+
+# Environmental props: parts as (shape, offset from the prop's ground point, scale, color name)
+PROP_PARTS = {
+    'tree': (('box', (0, 1.5, 0), (0.5, 3, 0.5), 'dirt'), ('sphere', (0, 3, 0), (2.5, 2.5, 2.5), 'grass')),
+    'rock': (('sphere', (0, 1, 0), (2, 2, 2), 'gray'),),
+}
+
+
+def scatter_prop_positions(rng=random, trees=3, rocks=2, extent=40):
+    positions = {}
+    for kind, count in (('tree', trees), ('rock', rocks)):
+        positions[kind] = [(rng.uniform(-extent, extent), 0, rng.uniform(-extent, extent)) for i in range(count)]
+    return positions
+
+
+def scatter_props(rng=random, trees=3, rocks=2):
+    # The same props as loose pieces, for tools that build every piece by itself
+    pieces = []
+    for kind, positions in scatter_prop_positions(rng, trees, rocks).items():
+        for x, y, z in positions:
+            for shape, (ox, oy, oz), scale, color_name in PROP_PARTS[kind]:
+                pieces.append((shape, (x + ox, y + oy, z + oz), scale, 0, color_name))
+    return pieces
+
+
+def coin_spawns(rng=random, count=5):
+    return [(rng.uniform(-20, 20), rng.uniform(2, 5), rng.uniform(-20, 20)) for i in range(count)]
+
+
+def goomba_spawns(rng=random, count=3):
+    return [(rng.uniform(-20, 20), 1, rng.uniform(-20, 20)) for i in range(count)]
+
+
+def build_collision_world(pieces, world=None):
+    world = world or CollisionWorld()
+    for shape, (x, y, z), (sx, sy, sz), rotation_x, color_name in pieces:
+        if shape == 'sphere':
+            world.add_sphere(x, y, z, max(sx, sy, sz) * 0.5, LAYER_TERRAIN)
+        else:
+            world.add_box(x, y, z, sx, sy, sz, rotation_x, 0, 0, LAYER_TERRAIN)
+    return world
@@ -0,0 +1,147 @@
+# --------------------------------------------------
+# Seeded stress levels in the style of the 4k level
+# --------------------------------------------------
+# ‣ generate_level(seed, objects, density) = GeneratedLevel; same arguments,
+#                                            same level on every machine
+# ‣ GeneratedLevel.solid_groups()          = (parts, positions, rotations, scales)
+#                                            per PropBatch / add_prop_colliders call
+# ‣ GeneratedLevel.build_collision_world() = every solid in a CollisionWorld
+# ‣ python sm64_levelgen.py SEED OBJECTS   = generate (or load) + collision timing
+# Plateaus, slopes, trees, rocks, coins and Goombas are drawn from one
+# NumPy generator. `density` is objects per square unit, so the level
+# grows with the object count. Levels are cached by their arguments in
+# levels/*.npz, so a million-object world is only generated once.
+# --------------------------------------------------
+import os
+import sys
+import numpy as np
+from sm64_collision import CollisionWorld
+from sm64_level import PROP_PARTS
+from sm64_props import add_prop_colliders
+
+GENERATOR_VERSION = 1   # bump when the output for a seed changes, so stale caches are skipped
+MIX = (('box', 0.04), ('slope', 0.02), ('tree', 0.40), ('rock', 0.20), ('coin', 0.26), ('goomba', 0.08))
+BOX_COLORS = ('dirt', 'orange', 'gray')
+CACHE_DIR = 'levels'
+
+_levels = {}
+
+
+def level_counts(objects):
+    # Objects per kind in MIX proportions; rounding leftovers become trees
+    counts = {kind: int(objects * share) for kind, share in MIX}
+    counts['tree'] += objects - sum(counts.values())
+    return counts
+
+
+def _generate(seed, objects, density):
+    rng = np.random.default_rng(seed)
+    counts = level_counts(objects)
+    extent = max(20.0, np.sqrt(objects / density) * 0.5)
+    a = {'extent': np.array(extent)}
+
+    def ground_points(n, y=0.0):
+        return np.column_stack((rng.uniform(-extent, extent, n), np.full(n, y), rng.uniform(-extent, extent, n)))
+
+    def yaw(n, step=None):
+        angles = rng.uniform(0, 360, n) if step is None else rng.integers(0, 360 // step, n) * float(step)
+        return np.column_stack((np.zeros(n), angles, np.zeros(n)))
+
+    # Plateaus like the dirt blocks, axis-aligned
+    n = counts['box']
+    a['box_scales'] = np.column_stack((rng.uniform(2, 12, n), rng.uniform(1, 8, n), rng.uniform(2, 12, n)))
+    a['box_positions'] = ground_points(n)
+    a['box_positions'][:, 1] = a['box_scales'][:, 1] * 0.5
+    a['box_colors'] = rng.integers(0, len(BOX_COLORS), n).astype(np.uint8)
+    # Tilted slabs like the gray ramps, turned in 90 degree steps
+    n = counts['slope']
+    a['slope_scales'] = np.column_stack((rng.uniform(6, 12, n), rng.uniform(2, 4, n), rng.uniform(8, 16, n)))
+    a['slope_positions'] = ground_points(n)
+    a['slope_positions'][:, 1] = a['slope_scales'][:, 1] * 0.5
+    a['slope_rotations'] = yaw(n, 90)
+    a['slope_rotations'][:, 0] = rng.uniform(15, 30, n) * rng.choice((-1.0, 1.0), n)
+    for kind, low, high in (('tree', 0.7, 1.3), ('rock', 0.5, 1.5)):
+        n = counts[kind]
+        a[kind + '_positions'] = ground_points(n)
+        a[kind + '_rotations'] = yaw(n)
+        a[kind + '_scales'] = rng.uniform(low, high, n)
+    a['coins'] = ground_points(counts['coin'])
+    a['coins'][:, 1] = rng.uniform(2, 5, counts['coin'])
+    a['goombas'] = ground_points(counts['goomba'], 1.0)
+    return a
+
+
+class GeneratedLevel:
+    def __init__(self, seed, objects, density, arrays):
+        self.seed = seed
+        self.objects = objects
+        self.density = density
+        self.arrays = arrays
+        self.extent = float(arrays['extent'])
+        self.coins = arrays['coins']
+        self.goombas = arrays['goombas']
+        # The ground slab, as a loose piece for the usual terrain path
+        size = self.extent * 2 + 20
+        self.terrain = [('box', (0, -0.05, 0), (size, 0.1, size), 0, 'grass')]
+
+    def solid_groups(self):
+        a = self.arrays
+        for i, color_name in enumerate(BOX_COLORS):
+            mask = a['box_colors'] == i
+            yield (('box', (0, 0, 0), (1, 1, 1), color_name),), a['box_positions'][mask], None, a['box_scales'][mask]
+        yield (('box', (0, 0, 0), (1, 1, 1), 'gray'),), a['slope_positions'], a['slope_rotations'], a['slope_scales']
+        for kind in ('tree', 'rock'):
+            yield PROP_PARTS[kind], a[kind + '_positions'], a[kind + '_rotations'], a[kind + '_scales']
+
+    def build_collision_world(self, world=None):
+        world = world or CollisionWorld()
+        for shape, (x, y, z), (sx, sy, sz), rotation_x, color_name in self.terrain:
+            world.add_box(x, y, z, sx, sy, sz, rotation_x)
+        for parts, positions, rotations, scales in self.solid_groups():
+            add_prop_colliders(world, parts, positions, rotations, scales)
+        return world
+
+
+def generate_level(seed=0, objects=1000, density=0.02, cache_dir=CACHE_DIR):
+    key = f'v{GENERATOR_VERSION}-seed{seed}-{objects}-{density:g}'
+    level = _levels.get(key)
+    if level is not None:
+        return level
+    path = os.path.join(cache_dir, key + '.npz') if cache_dir else None
+    if path and os.path.exists(path):
+        with np.load(path) as data:
+            arrays = {name: data[name] for name in data.files}
+    else:
+        arrays = _generate(seed, objects, density)
+        if path:
+            # Written under a temporary name so an interrupted run never leaves half a level
+            os.makedirs(cache_dir, exist_ok=True)
+            np.savez(path + '.tmp.npz', **arrays)
+            os.replace(path + '.tmp.npz', path)
+    level = _levels[key] = GeneratedLevel(seed, objects, density, arrays)
+    return level
+
+
+if __name__ == '__main__':
+    import time
+    seed = int(sys.argv[1]) if len(sys.argv) > 1 else 0
+    objects = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+    start = time.perf_counter()
+    fresh = generate_level(seed, objects, cache_dir=None)
+    print(f'seed {seed}, {objects} objects, {fresh.extent * 2:.0f} units across: generated in '
+          f'{(time.perf_counter() - start) * 1000:.0f} ms {level_counts(objects)}')
+    generate_level(seed, objects)
+    _levels.clear()
+    start = time.perf_counter()
+    cached = generate_level(seed, objects)
+    print(f'loaded from {CACHE_DIR}/ in {(time.perf_counter() - start) * 1000:.0f} ms')
+    assert all(np.array_equal(fresh.arrays[name], cached.arrays[name]) for name in fresh.arrays)
+    assert not np.array_equal(generate_level(seed + 1, objects, cache_dir=None).coins, fresh.coins)
+    start = time.perf_counter()
+    world = fresh.build_collision_world()
+    print(f'{len(world.colliders)} colliders in {time.perf_counter() - start:.1f} s')
+    rng = np.random.default_rng(seed)
+    probes = rng.uniform(-fresh.extent, fresh.extent, (10000, 2)).tolist()
+    start = time.perf_counter()
+    hits = sum(world.raycast(x, 30, z, 0, -1, 0, 40) for x, z in probes)
+    print(f'down rays {(time.perf_counter() - start) / len(probes) * 1e6:.1f} us each, {hits} hits')
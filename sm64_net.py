@@ -0,0 +1,646 @@
+# --------------------------------------------------
+# Headless authoritative multiplayer for the 4k port
+# --------------------------------------------------
+# ‣ python sm64_net.py server [--port 6464]        = headless server
+# ‣ python sm64_net.py client HOST [--port 6464]   = Ursina viewer with interpolation
+# ‣ python sm64_net.py bots HOST --count 4         = scripted bot clients
+# ‣ python sm64_net.py bench --players 1 2 4 8 16  = localhost bandwidth / tick cost
+# Clients send inputs over UDP; every tick the server answers each client with a
+# quantized snapshot delta-compressed against the last tick that client acked.
+# --------------------------------------------------
+import argparse
+import asyncio
+import random
+import struct
+import time
+from collections import deque
+from math import sqrt, sin, cos, pi
+from sm64_kernel import MarioKernel
+from sm64_nav import NavGrid, NavAgent
+from sm64_heightfield import Heightfield
+from sm64_level import (LEVEL_TERRAIN, PLAYER_SPAWN, scatter_props, coin_spawns, goomba_spawns,
+                        build_collision_world)
+
+TICK_RATE = 30
+DEFAULT_PORT = 6464
+POSITION_SCALE = 32          # int16 positions in 1/32 m steps (±1024 m)
+HISTORY = 64                 # ticks of snapshot baselines kept for delta encoding
+NO_BASE = 0xFFFFFFFF
+INTERP_DELAY = 3             # ticks clients render behind the newest snapshot
+CLIENT_TIMEOUT = 5.0
+
+MSG_HELLO, MSG_INPUT, MSG_WELCOME, MSG_SNAPSHOT, MSG_BYE = range(1, 6)
+
+FLAG_GROUNDED, FLAG_DIVING, FLAG_SLIDING, FLAG_CROUCHING, FLAG_MOVING = 1, 2, 4, 8, 16
+
+HELLO = struct.Struct('<B')
+INPUT = struct.Struct('<BIIbbbbBBBB')     # kind, seq, ack tick, move xz, facing xz, crouch, jump/dive/pound presses
+WELCOME = struct.Struct('<BBIHHH')        # kind, player id, level seed, tick rate, coins, goombas
+SNAPSHOT = struct.Struct('<BII')          # kind, tick, base tick
+COUNTS = struct.Struct('<BB')
+PLAYER = struct.Struct('<BhhhBBH')        # id, x, y, z, rotation, flags, coins
+GOOMBA = struct.Struct('<Bhhh')           # alive, x, y, z
+
+
+def quantize(value):
+    return max(-32768, min(32767, int(round(value * POSITION_SCALE))))
+
+
+def axis_byte(value):
+    return max(-127, min(127, int(round(value * 127))))
+
+
+class Snapshot:
+    # Quantized world state for one tick; records are plain int tuples so they compare cheaply
+    __slots__ = ('players', 'coins', 'goombas')
+
+    def __init__(self, players, coins, goombas):
+        self.players = players
+        self.coins = coins
+        self.goombas = goombas
+
+
+def encode_snapshot(tick, state, coin_count, base_tick=NO_BASE, base=None):
+    out = bytearray(SNAPSHOT.pack(MSG_SNAPSHOT, tick, base_tick if base is not None else NO_BASE))
+    changed = [(pid, rec) for pid, rec in state.players.items() if base is None or base.players.get(pid) != rec]
+    removed = [pid for pid in base.players if pid not in state.players] if base is not None else []
+    out += COUNTS.pack(len(changed), len(removed))
+    for pid, rec in changed:
+        out += PLAYER.pack(pid, *rec)
+    out += bytes(removed)
+    coin_bytes = (coin_count + 7) // 8
+    if base is None or base.coins != state.coins:
+        out.append(1)
+        out += state.coins.to_bytes(coin_bytes, 'little')
+    else:
+        out.append(0)
+    mask = 0
+    records = bytearray()
+    for i, rec in enumerate(state.goombas):
+        if base is None or base.goombas[i] != rec:
+            mask |= 1 << i
+            records += GOOMBA.pack(*rec)
+    out += mask.to_bytes((len(state.goombas) + 7) // 8, 'little')
+    out += records
+    return bytes(out)
+
+
+def decode_snapshot(data, baselines, coin_count, goomba_count):
+    # Returns (tick, Snapshot), or None when the delta's baseline is no longer known
+    kind, tick, base_tick = SNAPSHOT.unpack_from(data, 0)
+    base = None
+    if base_tick != NO_BASE:
+        base = baselines.get(base_tick)
+        if base is None:
+            return None
+    offset = SNAPSHOT.size
+    players = dict(base.players) if base is not None else {}
+    n_changed, n_removed = COUNTS.unpack_from(data, offset)
+    offset += COUNTS.size
+    for _ in range(n_changed):
+        rec = PLAYER.unpack_from(data, offset)
+        offset += PLAYER.size
+        players[rec[0]] = rec[1:]
+    for pid in data[offset:offset + n_removed]:
+        players.pop(pid, None)
+    offset += n_removed
+    coin_bytes = (coin_count + 7) // 8
+    if data[offset]:
+        coins = int.from_bytes(data[offset + 1:offset + 1 + coin_bytes], 'little')
+        offset += 1 + coin_bytes
+    else:
+        coins = base.coins
+        offset += 1
+    mask_bytes = (goomba_count + 7) // 8
+    mask = int.from_bytes(data[offset:offset + mask_bytes], 'little')
+    offset += mask_bytes
+    goombas = list(base.goombas) if base is not None else [(0, 0, 0, 0)] * goomba_count
+    for i in range(goomba_count):
+        if mask >> i & 1:
+            goombas[i] = GOOMBA.unpack_from(data, offset)
+            offset += GOOMBA.size
+    return tick, Snapshot(players, coins, goombas)
+
+
+# ---------- Authoritative simulation ----------
+class NetPlayer:
+    __slots__ = ('pid', 'kernel', 'coins', 'move_x', 'move_z', 'facing_x', 'facing_z', 'presses')
+
+    def __init__(self, pid, kernel):
+        self.pid = pid
+        self.kernel = kernel
+        self.coins = 0
+        self.move_x = self.move_z = 0.0
+        self.facing_x, self.facing_z = 0.0, 1.0
+        self.presses = [0, 0, 0]
+
+
+class ServerWorld:
+    # The 4k port's Mario64 / Coin / Goomba rules for any number of players, no Ursina
+    def __init__(self, seed=0):
+        rng = random.Random(seed)
+        self.seed = seed
+        self.world = build_collision_world(LEVEL_TERRAIN + scatter_props(rng))
+        self.coin_positions = coin_spawns(rng)
+        self.coins_collected = 0
+        self.world.heightfield = Heightfield(self.world)
+        self.nav = NavGrid(self.world, heightfield=self.world.heightfield)
+        self.goombas = [NavAgent(self.nav, x, y, z, rng) for x, y, z in goomba_spawns(rng)]
+        self.goomba_alive = [True] * len(self.goombas)
+        self.players = {}
+
+    def add_player(self, pid):
+        kernel = MarioKernel(self.world)
+        kernel.reset(*self.spawn_point(pid))
+        self.players[pid] = NetPlayer(pid, kernel)
+        return self.players[pid]
+
+    def remove_player(self, pid):
+        self.players.pop(pid, None)
+
+    def spawn_point(self, pid):
+        x, y, z = PLAYER_SPAWN
+        return x + (pid % 4) * 1.5, y, z + (pid // 4 % 4) * 1.5
+
+    def apply_input(self, player, move_x, move_z, facing_x, facing_z, crouch, presses):
+        player.move_x, player.move_z = move_x, move_z
+        player.facing_x, player.facing_z = facing_x, facing_z
+        k = player.kernel
+        k.crouch(bool(crouch))
+        # Press counters survive packet loss: any change since last time is one press
+        jump, dive, pound = ((presses[i] - player.presses[i]) & 0xFF for i in range(3))
+        player.presses[:] = presses
+        if jump:
+            k.long_jump(facing_x, facing_z) or k.jump()
+        if dive:
+            k.dive(facing_x, facing_z)
+        if pound:
+            k.ground_pound()
+
+    def step(self, dt):
+        for player in self.players.values():
+            k = player.kernel
+            k.step(dt, player.move_x, player.move_z)
+            if k.pound_landed:
+                for i, g in enumerate(self.goombas):
+                    if self.goomba_alive[i] and self._distance(k, g.x, g.y, g.z) < 3:
+                        self.goomba_alive[i] = False
+            self._interact(player, k)
+            if k.y < -50:
+                k.reset(*self.spawn_point(player.pid))
+        self._step_goombas(dt)
+
+    def _distance(self, k, x, y, z):
+        dx, dy, dz = k.x - x, k.y - y, k.z - z
+        return sqrt(dx * dx + dy * dy + dz * dz)
+
+    def _interact(self, player, k):
+        for i, coin in enumerate(self.coin_positions):
+            if not self.coins_collected >> i & 1 and self._distance(k, *coin) < 1.5:
+                self.coins_collected |= 1 << i
+                player.coins += 1
+        for i, g in enumerate(self.goombas):
+            if not self.goomba_alive[i] or self._distance(k, g.x, g.y, g.z) >= 1.5:
+                continue
+            if k.velocity_y < -5 and not k.grounded:
+                self.goomba_alive[i] = False
+                k.velocity_y = 3.0
+            elif not k.grounded and g.y + 0.5 > k.y:
+                k.reset(*self.spawn_point(player.pid))
+
+    def _step_goombas(self, dt):
+        # Each Goomba chases the closest Mario on its nav grid
+        for i, g in enumerate(self.goombas):
+            if not self.goomba_alive[i]:
+                continue
+            target, best = None, g.chase_radius * g.chase_radius
+            for player in self.players.values():
+                k = player.kernel
+                d = (k.x - g.x) ** 2 + (k.z - g.z) ** 2
+                if d < best:
+                    target, best = (k.x, k.y, k.z), d
+            g.update(dt, target)
+
+    def capture(self):
+        players = {}
+        for pid, player in self.players.items():
+            k = player.kernel
+            flags = ((FLAG_GROUNDED if k.grounded else 0) | (FLAG_DIVING if k.diving else 0)
+                     | (FLAG_SLIDING if k.sliding else 0) | (FLAG_CROUCHING if k.crouching else 0)
+                     | (FLAG_MOVING if k.moving else 0))
+            players[pid] = (quantize(k.x), quantize(k.y), quantize(k.z), int(k.rotation_y / 360 * 256) & 0xFF,
+                            flags, min(player.coins, 0xFFFF))
+        goombas = [(1, quantize(g.x), quantize(g.y), quantize(g.z)) if alive else (0, 0, 0, 0)
+                   for g, alive in zip(self.goombas, self.goomba_alive)]
+        return Snapshot(players, self.coins_collected, goombas)
+
+
+# ---------- Server ----------
+class ClientSlot:
+    __slots__ = ('addr', 'pid', 'ack_tick', 'input_seq', 'last_heard', 'bytes_sent', 'bytes_received')
+
+    def __init__(self, addr, pid):
+        self.addr = addr
+        self.pid = pid
+        self.ack_tick = NO_BASE
+        self.input_seq = -1
+        self.last_heard = time.monotonic()
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+
+class GameServer(asyncio.DatagramProtocol):
+    def __init__(self, sim, tick_rate=TICK_RATE, max_players=32):
+        self.sim = sim
+        self.tick_rate = tick_rate
+        self.max_players = max_players
+        self.clients = {}
+        self.tick = 0
+        self.history = [None] * HISTORY
+        self.tick_times = []
+        self.transport = None
+        self.running = True
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        if not data:
+            return
+        client = self.clients.get(addr)
+        if client is not None:
+            client.last_heard = time.monotonic()
+            client.bytes_received += len(data)
+        kind = data[0]
+        if kind == MSG_HELLO:
+            if client is None:
+                pid = self._free_pid()
+                if pid is None:
+                    return
+                client = self.clients[addr] = ClientSlot(addr, pid)
+                client.bytes_received += len(data)
+                self.sim.add_player(pid)
+            self._send(client, WELCOME.pack(MSG_WELCOME, client.pid, self.sim.seed, self.tick_rate,
+                                            len(self.sim.coin_positions), len(self.sim.goombas)))
+        elif kind == MSG_INPUT and client is not None and len(data) == INPUT.size:
+            _, seq, ack, mx, mz, fx, fz, crouch, jump, dive, pound = INPUT.unpack(data)
+            if seq <= client.input_seq:
+                return  # stale or duplicated datagram
+            client.input_seq = seq
+            client.ack_tick = ack
+            self.sim.apply_input(self.sim.players[client.pid], mx / 127, mz / 127, fx / 127, fz / 127,
+                                 crouch, (jump, dive, pound))
+        elif kind == MSG_BYE and client is not None:
+            self._drop(client)
+
+    def _free_pid(self):
+        used = {c.pid for c in self.clients.values()}
+        for pid in range(min(self.max_players, 255)):
+            if pid not in used:
+                return pid
+        return None
+
+    def _drop(self, client):
+        self.clients.pop(client.addr, None)
+        self.sim.remove_player(client.pid)
+
+    def _send(self, client, payload):
+        client.bytes_sent += len(payload)
+        self.transport.sendto(payload, client.addr)
+
+    def step(self):
+        start = time.perf_counter()
+        now = time.monotonic()
+        for client in [c for c in self.clients.values() if now - c.last_heard > CLIENT_TIMEOUT]:
+            self._drop(client)
+        self.tick += 1
+        self.sim.step(1 / self.tick_rate)
+        state = self.sim.capture()
+        self.history[self.tick % HISTORY] = (self.tick, state)
+        for client in self.clients.values():
+            base_tick, base = NO_BASE, None
+            if client.ack_tick != NO_BASE and self.tick - client.ack_tick < HISTORY:
+                entry = self.history[client.ack_tick % HISTORY]
+                if entry is not None and entry[0] == client.ack_tick:
+                    base_tick, base = entry
+            self._send(client, encode_snapshot(self.tick, state, len(self.sim.coin_positions), base_tick, base))
+        self.tick_times.append(time.perf_counter() - start)
+
+    async def run(self, duration=None):
+        loop = asyncio.get_running_loop()
+        interval = 1 / self.tick_rate
+        next_tick = loop.time()
+        end = None if duration is None else next_tick + duration
+        while self.running and (end is None or next_tick < end):
+            self.step()
+            next_tick += interval
+            await asyncio.sleep(max(0.0, next_tick - loop.time()))
+
+
+# ---------- Client side ----------
+class SnapshotReceiver:
+    # Decodes deltas, tracks the newest tick to ack and interpolates for rendering
+    def __init__(self, coin_count, goomba_count, tick_rate=TICK_RATE):
+        self.coin_count = coin_count
+        self.goomba_count = goomba_count
+        self.tick_rate = tick_rate
+        self.baselines = {}
+        self.buffer = deque(maxlen=32)
+        self.latest_tick = NO_BASE
+        self.latest_time = 0.0
+        self.received = 0
+        self.dropped = 0
+
+    def receive(self, data, now=None):
+        decoded = decode_snapshot(data, self.baselines, self.coin_count, self.goomba_count)
+        if decoded is None:
+            self.dropped += 1
+            return None
+        tick, state = decoded
+        self.received += 1
+        self.baselines[tick] = state
+        if len(self.baselines) > HISTORY:
+            for old in [t for t in self.baselines if t <= tick - HISTORY]:
+                del self.baselines[old]
+        if self.latest_tick == NO_BASE or tick > self.latest_tick:
+            self.latest_tick = tick
+            self.latest_time = time.monotonic() if now is None else now
+            self.buffer.append((tick, state))
+        return state
+
+    def render_tick(self, now=None):
+        now = time.monotonic() if now is None else now
+        return self.latest_tick + (now - self.latest_time) * self.tick_rate - INTERP_DELAY
+
+    def sample(self, render_tick):
+        # Players and goombas as world-space tuples blended between the bracketing snapshots
+        if not self.buffer:
+            return {}, 0, []
+        older = newer = self.buffer[0]
+        for entry in self.buffer:
+            if entry[0] <= render_tick:
+                older = newer = entry
+            else:
+                newer = entry
+                break
+        (t0, s0), (t1, s1) = older, newer
+        alpha = 0.0 if t1 == t0 else min(max((render_tick - t0) / (t1 - t0), 0.0), 1.0)
+        players = {}
+        for pid, b in s1.players.items():
+            a = s0.players.get(pid, b)
+            turn = ((b[3] - a[3] + 128) % 256) - 128
+            players[pid] = (blend(a[0], b[0], alpha), blend(a[1], b[1], alpha), blend(a[2], b[2], alpha),
+                            (a[3] + turn * alpha) * 360 / 256, b[4], b[5])
+        goombas = []
+        for a, b in zip(s0.goombas, s1.goombas):
+            if b[0] and a[0]:
+                goombas.append((blend(a[1], b[1], alpha), blend(a[2], b[2], alpha), blend(a[3], b[3], alpha)))
+            else:
+                goombas.append(None if not b[0] else (b[1] / POSITION_SCALE, b[2] / POSITION_SCALE, b[3] / POSITION_SCALE))
+        return players, s1.coins, goombas
+
+
+def blend(a, b, alpha):
+    return (a + (b - a) * alpha) / POSITION_SCALE
+
+
+class InputState:
+    def __init__(self):
+        self.seq = 0
+        self.move_x = self.move_z = 0.0
+        self.facing_x, self.facing_z = 0.0, 1.0
+        self.crouch = False
+        self.presses = [0, 0, 0]
+
+    def press(self, button):
+        self.presses[button] = (self.presses[button] + 1) & 0xFF
+
+    def packet(self, ack_tick):
+        self.seq += 1
+        return INPUT.pack(MSG_INPUT, self.seq, ack_tick, axis_byte(self.move_x), axis_byte(self.move_z),
+                          axis_byte(self.facing_x), axis_byte(self.facing_z), int(self.crouch), *self.presses)
+
+
+class BotClient(asyncio.DatagramProtocol):
+    # Runs in circles and jumps on a timer; decodes every snapshot like a real client
+    def __init__(self, index, tick_rate=TICK_RATE):
+        self.index = index
+        self.tick_rate = tick_rate
+        self.receiver = None
+        self.input = InputState()
+        self.transport = None
+        self.bytes_received = 0
+        self.bytes_sent = 0
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        self.bytes_received += len(data)
+        if data[0] == MSG_WELCOME and self.receiver is None:
+            _, pid, seed, tick_rate, coins, goombas = WELCOME.unpack(data)
+            self.tick_rate = tick_rate
+            self.receiver = SnapshotReceiver(coins, goombas, tick_rate)
+        elif data[0] == MSG_SNAPSHOT and self.receiver is not None:
+            self.receiver.receive(data)
+
+    def send(self, payload):
+        self.bytes_sent += len(payload)
+        self.transport.sendto(payload)
+
+    async def run(self, duration):
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        interval = 1 / self.tick_rate
+        frame = 0
+        while loop.time() - start < duration:
+            if self.receiver is None:
+                self.send(HELLO.pack(MSG_HELLO))
+            else:
+                angle = frame * 0.05 + self.index
+                self.input.move_x, self.input.move_z = sin(angle), cos(angle)
+                self.input.facing_x, self.input.facing_z = self.input.move_x, self.input.move_z
+                if frame % 45 == self.index % 45:
+                    self.input.press(0)
+                self.send(self.input.packet(self.receiver.latest_tick))
+            frame += 1
+            await asyncio.sleep(interval)
+        self.send(bytes([MSG_BYE]))
+
+
+async def run_bots(host, port, count, duration):
+    loop = asyncio.get_running_loop()
+    bots = []
+    for i in range(count):
+        transport, bot = await loop.create_datagram_endpoint(lambda i=i: BotClient(i), remote_addr=(host, port))
+        bots.append(bot)
+    await asyncio.gather(*(bot.run(duration) for bot in bots))
+    for bot in bots:
+        bot.transport.close()
+    return bots
+
+
+async def bench(player_counts, duration, seed):
+    loop = asyncio.get_running_loop()
+    print(f'{"players":>7} {"tick ms":>8} {"p95 ms":>7} {"down B/s/pl":>12} {"up B/s/pl":>10} {"snap B":>7} {"decoded":>8}')
+    for count in player_counts:
+        transport, server = await loop.create_datagram_endpoint(lambda: GameServer(ServerWorld(seed)),
+                                                                local_addr=('127.0.0.1', 0))
+        port = transport.get_extra_info('sockname')[1]
+        server_task = asyncio.ensure_future(server.run())
+        bots = await run_bots('127.0.0.1', port, count, duration)
+        server.running = False
+        await server_task
+        transport.close()
+        times = sorted(server.tick_times[len(server.tick_times) // 10:]) or [0.0]
+        received = sum(b.bytes_received for b in bots)
+        snapshots = sum(b.receiver.received for b in bots if b.receiver)
+        dropped = sum(b.receiver.dropped for b in bots if b.receiver)
+        print(f'{count:7} {sum(times) / len(times) * 1000:8.3f} {times[int(len(times) * 0.95)] * 1000:7.3f} '
+              f'{received / duration / count:12.0f} {sum(b.bytes_sent for b in bots) / duration / count:10.0f} '
+              f'{received / max(snapshots, 1):7.1f} {snapshots / max(snapshots + dropped, 1):8.1%}')
+
+
+# ---------- Ursina viewer ----------
+def run_viewer(host, port):
+    import socket
+    from ursina import Ursina, Entity, Text, Sky, DirectionalLight, AmbientLight, camera, held_keys, color, time as clock
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.connect((host, port))
+    sock.settimeout(0.5)
+    welcome = None
+    while welcome is None:
+        sock.send(HELLO.pack(MSG_HELLO))
+        try:
+            data = sock.recv(2048)
+        except socket.timeout:
+            continue
+        if data[0] == MSG_WELCOME:
+            welcome = WELCOME.unpack(data)
+    sock.setblocking(False)
+    _, my_pid, seed, tick_rate, coin_count, goomba_count = welcome
+
+    app = Ursina()
+    rng = random.Random(seed)
+    colors = {'grass': color.rgb(34, 139, 34), 'dirt': color.rgb(139, 69, 19), 'orange': color.orange, 'gray': color.gray}
+    for shape, position, scale, rotation_x, color_name in LEVEL_TERRAIN + scatter_props(rng):
+        Entity(model='cube' if shape == 'box' else shape, color=colors[color_name], position=position, scale=scale,
+               rotation_x=rotation_x)
+    coins = [Entity(model='sphere', color=color.rgb(255, 215, 0), scale=0.5, position=p) for p in coin_spawns(rng)]
+    goombas = [Entity(model='sphere', color=color.rgb(139, 69, 19)) for i in range(goomba_count)]
+    marios = {}
+    receiver = SnapshotReceiver(coin_count, goomba_count, tick_rate)
+    state = InputState()
+    hud = Text('Coins: 0', position=(0.4, 0.45), origin=(0, 0), scale=1.5)
+
+    class NetView(Entity):
+        def __init__(self):
+            super().__init__()
+            self.send_timer = 0
+
+        def update(self):
+            while True:
+                try:
+                    data = sock.recv(4096)
+                except (BlockingIOError, ConnectionRefusedError):
+                    break
+                if data and data[0] == MSG_SNAPSHOT:
+                    receiver.receive(data)
+            forward, right = camera.forward, camera.right
+            state.move_x = (held_keys['w'] - held_keys['s']) * forward.x + (held_keys['d'] - held_keys['a']) * right.x
+            state.move_z = (held_keys['w'] - held_keys['s']) * forward.z + (held_keys['d'] - held_keys['a']) * right.z
+            length = sqrt(state.move_x ** 2 + state.move_z ** 2)
+            if length > 1:
+                state.move_x, state.move_z = state.move_x / length, state.move_z / length
+            length = sqrt(forward.x ** 2 + forward.z ** 2) or 1
+            state.facing_x, state.facing_z = forward.x / length, forward.z / length
+            state.crouch = bool(held_keys['shift'])
+            self.send_timer -= clock.dt
+            if self.send_timer <= 0:
+                self.send_timer = 1 / tick_rate
+                sock.send(state.packet(receiver.latest_tick))
+            if receiver.latest_tick == NO_BASE:
+                return
+            players, collected, goomba_positions = receiver.sample(receiver.render_tick())
+            for pid in [p for p in marios if p not in players]:
+                marios.pop(pid).enabled = False
+            for pid, (x, y, z, rotation, flags, coin_total) in players.items():
+                mario = marios.get(pid)
+                if mario is None:
+                    mario = marios[pid] = Entity(model='cube', color=color.rgb(0, 0, 255), scale=(0.8, 1.6, 0.4), origin_y=-0.5)
+                    Entity(parent=mario, model='cube', color=color.rgb(255, 0, 0), scale=(1.1, 0.2, 2.2), y=0.55)
+                mario.position = (x, y, z)
+                mario.rotation_y = rotation
+                mario.scale_y = 0.8 if flags & FLAG_CROUCHING else 1.6
+                mario.rotation_x = 45 if flags & FLAG_DIVING else (20 if flags & FLAG_SLIDING else 0)
+                if pid == my_pid:
+                    hud.text = f'Coins: {coin_total}'
+                    camera.position = (x, y + 6, z - 15)
+            for i, coin in enumerate(coins):
+                coin.enabled = not collected >> i & 1
+            for goomba, position in zip(goombas, goomba_positions):
+                goomba.enabled = position is not None
+                if position is not None:
+                    goomba.position = position
+
+        def input(self, key):
+            if key == 'space':
+                state.press(0)
+            if key == 'f':
+                state.press(1)
+            if key == 'g':
+                state.press(2)
+
+    NetView()
+    camera.rotation_x = 15
+    DirectionalLight(y=50, z=-20, shadows=True).look_at((0, -1, -0.5))
+    AmbientLight(color=color.rgba(180, 180, 220, 0.3))
+    Sky(color=color.rgb(100, 150, 255))
+    app.run()
+    sock.send(bytes([MSG_BYE]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Headless multiplayer server and clients for the 4k port')
+    sub = parser.add_subparsers(dest='mode', required=True)
+    server = sub.add_parser('server')
+    server.add_argument('--host', default='0.0.0.0')
+    server.add_argument('--port', type=int, default=DEFAULT_PORT)
+    server.add_argument('--seed', type=int, default=0)
+    server.add_argument('--tick-rate', type=int, default=TICK_RATE)
+    client = sub.add_parser('client')
+    client.add_argument('host')
+    client.add_argument('--port', type=int, default=DEFAULT_PORT)
+    bots = sub.add_parser('bots')
+    bots.add_argument('host')
+    bots.add_argument('--port', type=int, default=DEFAULT_PORT)
+    bots.add_argument('--count', type=int, default=4)
+    bots.add_argument('--seconds', type=float, default=30)
+    bench_args = sub.add_parser('bench')
+    bench_args.add_argument('--players', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    bench_args.add_argument('--seconds', type=float, default=5)
+    bench_args.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.mode == 'server':
+        async def serve():
+            loop = asyncio.get_running_loop()
+            transport, game = await loop.create_datagram_endpoint(
+                lambda: GameServer(ServerWorld(args.seed), args.tick_rate), local_addr=(args.host, args.port))
+            print(f'Serving on {args.host}:{args.port} at {args.tick_rate} Hz (seed {args.seed})')
+            try:
+                await game.run()
+            finally:
+                transport.close()
+        asyncio.run(serve())
+    elif args.mode == 'client':
+        run_viewer(args.host, args.port)
+    elif args.mode == 'bots':
+        asyncio.run(run_bots(args.host, args.port, args.count, args.seconds))
+    else:
+        asyncio.run(bench(args.players, args.seconds, args.seed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+# --------------------------------------------------
+# Frame pacing and frame-time histogram
+# --------------------------------------------------
+# ‣ FramePacer(target_fps).wait()  = call once per frame; sleeps, then spins
+#                                    the last couple of ms to the deadline
+# ‣ FramePacer.summary() / export  = percentiles, stutters, histogram (JSON)
+# ‣ FramePacer.idle.append(fn)     = fn(seconds) gets the spare time before
+#                                    each sleep (deferred GC, streaming, ...)
+# ‣ python sm64_pacing.py          = fake-clock checks + a real 120 Hz run
+# Deadlines advance by whole periods, so one late frame does not shift the
+# rest; falling a full period behind starts over instead of racing to catch
+# up. target_fps=0 only measures. clock / sleep are injectable for tests.
+# --------------------------------------------------
+import json
+import time
+from array import array
+
+
+class FramePacer:
+    def __init__(self, target_fps=60, clock=time.perf_counter, sleep=time.sleep, spin=0.002,
+                 bin_ms=0.5, max_ms=100.0):
+        self.clock = clock
+        self.sleep = sleep
+        self.spin = spin
+        self.bin_ms = bin_ms
+        self.bins = int(max_ms / bin_ms)
+        self.idle = []
+        self.set_target(target_fps)
+        self.reset()
+
+    def set_target(self, target_fps):
+        # Stutters are judged against the target, or 60 Hz when only measuring
+        self.target_fps = target_fps
+        self.period = 1.0 / target_fps if target_fps else 0.0
+        self.stutter_time = 1.5 * (self.period or 1 / 60)
+        self.deadline = None
+
+    def reset(self):
+        self.counts = array('I', bytes(4 * (self.bins + 1)))   # last bin collects everything slower
+        self.frames = 0
+        self.stutters = 0
+        self.total = 0.0
+        self.worst = 0.0
+        self.last = None
+        self.deadline = None
+
+    def wait(self):
+        clock = self.clock
+        now = clock()
+        if self.period:
+            if self.deadline is None:
+                self.deadline = now
+            else:
+                remaining = self.deadline - now
+                if self.idle and remaining > self.spin:
+                    for fn in self.idle:
+                        fn(remaining - self.spin)
+                    now = clock()
+                    remaining = self.deadline - now
+                if remaining > self.spin:
+                    self.sleep(remaining - self.spin)
+                while now < self.deadline:
+                    now = clock()
+            self.deadline += self.period
+            if now > self.deadline:
+                self.deadline = now + self.period
+        if self.last is not None:
+            self.record(now - self.last)
+        self.last = now
+
+    def record(self, frame_time):
+        i = int(frame_time * 1000 / self.bin_ms)
+        self.counts[i if i < self.bins else self.bins] += 1
+        self.frames += 1
+        self.total += frame_time
+        if frame_time > self.worst:
+            self.worst = frame_time
+        if frame_time > self.stutter_time:
+            self.stutters += 1
+
+    # ---------- Reading ----------
+    def percentile(self, p):
+        # Upper edge of the bin holding the p-th percentile frame, in ms
+        if not self.frames:
+            return 0.0
+        rank = p / 100 * self.frames
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return min((i + 1) * self.bin_ms, self.worst * 1000)
+        return self.worst * 1000
+
+    def stats(self):
+        mean = self.total / self.frames if self.frames else 0.0
+        return {
+            'target_fps': self.target_fps, 'frames': self.frames, 'stutters': self.stutters,
+            'mean_ms': mean * 1000, 'fps': 1 / mean if mean else 0.0,
+            'p50_ms': self.percentile(50), 'p99_ms': self.percentile(99), 'max_ms': self.worst * 1000,
+        }
+
+    def summary(self):
+        s = self.stats()
+        return (f"{s['frames']} frames at {s['fps']:.1f} fps (target {s['target_fps'] or 'none'}): "
+                f"p50 {s['p50_ms']:.1f} ms  p99 {s['p99_ms']:.1f} ms  max {s['max_ms']:.1f} ms  "
+                f"{s['stutters']} stutters > {self.stutter_time * 1000:.1f} ms")
+
+    def export(self, path):
+        data = self.stats()
+        data['bin_ms'] = self.bin_ms
+        data['histogram'] = list(self.counts)
+        with open(path, 'w') as f:
+            json.dump(data, f)
+
+
+if __name__ == '__main__':
+    class FakeClock:
+        # Sleeps overshoot like a coarse OS timer; every clock read costs a few microseconds
+        def __init__(self, oversleep=0.0015):
+            self.now = 0.0
+            self.oversleep = oversleep
+            self.sleeps = 0
+
+        def clock(self):
+            self.now += 0.000005
+            return self.now
+
+        def sleep(self, seconds):
+            self.sleeps += 1
+            self.now += seconds + self.oversleep
+
+    fake = FakeClock()
+    pacer = FramePacer(60, fake.clock, fake.sleep)
+    for frame in range(600):
+        fake.now += 0.025 if frame == 300 else 0.004   # one 25 ms hitch in otherwise light frames
+        pacer.wait()
+    s = pacer.stats()
+    assert s['frames'] == 599 and s['stutters'] == 1 and abs(s['p50_ms'] - 17.0) < 0.6, s
+    assert fake.sleeps == 598 and abs(s['mean_ms'] - 1000 / 60) < 0.05, s
+    # A single long frame resyncs instead of bursting to catch up
+    fake = FakeClock(oversleep=0.0)
+    pacer = FramePacer(100, fake.clock, fake.sleep)
+    for frame in range(10):
+        fake.now += 0.05 if frame == 4 else 0.001
+        pacer.wait()
+    assert pacer.counts[0] == 0 and pacer.stutters == 1, list(pacer.counts[:30])
+    # Measuring only: no sleeping, everything still recorded
+    fake = FakeClock()
+    pacer = FramePacer(0, fake.clock, fake.sleep)
+    for frame in range(100):
+        fake.now += 0.001
+        pacer.wait()
+    assert fake.sleeps == 0 and pacer.frames == 99 and pacer.percentile(99) <= 1.5
+    # Real clock: 120 Hz with 2 ms of work per frame, mostly asleep
+    pacer = FramePacer(120)
+    cpu = time.process_time()
+    for frame in range(240):
+        end = time.perf_counter() + 0.002
+        while time.perf_counter() < end:
+            pass
+        pacer.wait()
+    cpu = time.process_time() - cpu
+    print(pacer.summary())
+    print(f'cpu busy {cpu / (pacer.total or 1):.0%} of wall time (2 ms work in a {1000 / 120:.1f} ms frame)')
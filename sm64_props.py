@@ -0,0 +1,214 @@
+# --------------------------------------------------
+# Instanced environmental props from NumPy transform arrays
+# --------------------------------------------------
+# ‣ prop_rows(positions, rotations, scales) = (n, 3, 4) affine rows per instance
+# ‣ add_prop_colliders(world, parts, ...)   = box / sphere proxies per part
+# ‣ PropBatch(parts, positions, ...)        = one instanced draw per part,
+#                                             however many props there are
+# ‣ python sm64_props.py                    = checks against rotation_axes + timing
+# Transforms live in NumPy arrays and go to the GPU as a per-instance
+# vertex array; a small shader places each copy and lights it like the
+# fixed-function terrain (sun, ambient, fog). Parts come from
+# sm64_level.PROP_PARTS.
+# --------------------------------------------------
+import numpy as np
+from panda3d.core import (BoundingBox, Geom, GeomNode, GeomVertexArrayFormat, GeomVertexFormat, InternalName,
+                          Point3, Shader)
+from ursina import Entity, destroy
+from sm64_collision import LAYER_TERRAIN
+
+PROP_VERTEX = '''#version 140
+uniform mat4 p3d_ModelViewProjectionMatrix;
+uniform mat4 p3d_ModelViewMatrix;
+uniform mat3 p3d_NormalMatrix;
+in vec4 p3d_Vertex;
+in vec3 p3d_Normal;
+in vec4 row0;
+in vec4 row1;
+in vec4 row2;
+out vec3 normal;
+out vec3 view_position;
+
+void main() {
+    vec4 world = vec4(dot(row0, p3d_Vertex), dot(row1, p3d_Vertex), dot(row2, p3d_Vertex), 1.0);
+    // Normals go through rotation / scale, the inverse transpose of rotation * scale
+    vec3 n = p3d_Normal / (row0.xyz * row0.xyz + row1.xyz * row1.xyz + row2.xyz * row2.xyz);
+    normal = p3d_NormalMatrix * vec3(dot(row0.xyz, n), dot(row1.xyz, n), dot(row2.xyz, n));
+    view_position = (p3d_ModelViewMatrix * world).xyz;
+    gl_Position = p3d_ModelViewProjectionMatrix * world;
+}
+'''
+
+PROP_FRAGMENT = '''#version 140
+uniform vec4 p3d_ColorScale;
+uniform struct p3d_LightSourceParameters {
+    vec4 color;
+    vec4 position;
+} p3d_LightSource[1];
+uniform struct {
+    vec4 ambient;
+} p3d_LightModel;
+uniform struct {
+    vec4 color;
+    float density;
+} p3d_Fog;
+in vec3 normal;
+in vec3 view_position;
+out vec4 fragment;
+
+void main() {
+    vec3 to_light = normalize(p3d_LightSource[0].position.xyz);
+    float diffuse = max(dot(normalize(normal), to_light), 0.0);
+    // Fixed-function folds the color scale into the material, so the clamp comes after it
+    vec3 lit = min(p3d_ColorScale.rgb * (p3d_LightModel.ambient.rgb + p3d_LightSource[0].color.rgb * diffuse), 1.0);
+    float fog = exp(-p3d_Fog.density * length(view_position));
+    fragment = vec4(mix(p3d_Fog.color.rgb, lit, fog), p3d_ColorScale.a);
+}
+'''
+
+_shader = None
+
+
+def prop_axes(rotations):
+    # (n, 3, 3) rotation matrices for Ursina rotations in degrees (roll, then pitch, then yaw);
+    # column k is the world direction of local axis k, as in sm64_collision.rotation_axes
+    r = np.radians(np.asarray(rotations, dtype=np.float64).reshape(-1, 3))
+    sx, cx = np.sin(r[:, 0]), np.cos(r[:, 0])
+    sy, cy = np.sin(r[:, 1]), np.cos(r[:, 1])
+    sz, cz = np.sin(r[:, 2]), np.cos(r[:, 2])
+    zero, one = np.zeros_like(sx), np.ones_like(sx)
+    pitch = np.stack((one, zero, zero, zero, cx, -sx, zero, sx, cx), axis=1).reshape(-1, 3, 3)
+    yaw = np.stack((cy, zero, sy, zero, one, zero, -sy, zero, cy), axis=1).reshape(-1, 3, 3)
+    roll = np.stack((cz, sz, zero, -sz, cz, zero, zero, zero, one), axis=1).reshape(-1, 3, 3)
+    return yaw @ pitch @ roll
+
+
+def prop_transforms(positions, rotations=None, scales=None):
+    # Broadcasts optional rotations (n, 3) and scales (n,) or (n, 3) to match positions (n, 3)
+    positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+    n = len(positions)
+    rotations = np.zeros((n, 3)) if rotations is None else np.broadcast_to(np.asarray(rotations, dtype=np.float64), (n, 3))
+    scales = np.ones((n, 3)) if scales is None else np.asarray(scales, dtype=np.float64)
+    scales = np.broadcast_to(scales.reshape(n, 1) if scales.ndim == 1 else scales, (n, 3))
+    return positions, rotations, scales
+
+
+def prop_rows(positions, rotations=None, scales=None, offset=(0, 0, 0), part_scale=(1, 1, 1)):
+    # Rows of [rotation * scale | translation] for one part of every instance
+    positions, rotations, scales = prop_transforms(positions, rotations, scales)
+    basis = prop_axes(rotations) * scales[:, None, :]
+    rows = np.empty((len(positions), 3, 4), dtype=np.float32)
+    rows[:, :, :3] = basis * np.asarray(part_scale, dtype=np.float64)
+    rows[:, :, 3] = positions + basis @ np.asarray(offset, dtype=np.float64)
+    return rows
+
+
+def add_prop_colliders(world, parts, positions, rotations=None, scales=None, layer=LAYER_TERRAIN):
+    # Same proxies as build_collision_world: boxes keep the prop's rotation, spheres take the largest axis
+    positions, rotations, scales = prop_transforms(positions, rotations, scales)
+    basis = prop_axes(rotations) * scales[:, None, :]
+    added = []
+    for shape, offset, part_scale, color_name in parts:
+        centers = (positions + basis @ np.asarray(offset, dtype=np.float64)).tolist()
+        sizes = (np.abs(scales) * np.asarray(part_scale, dtype=np.float64)).tolist()
+        if shape == 'sphere':
+            for (x, y, z), size in zip(centers, sizes):
+                added.append(world.add_sphere(x, y, z, max(size) * 0.5, layer))
+        else:
+            for (x, y, z), (sx, sy, sz), (rx, ry, rz) in zip(centers, sizes, rotations.tolist()):
+                added.append(world.add_box(x, y, z, sx, sy, sz, rx, ry, rz, layer))
+    return added
+
+
+def instanced_geom(model, name):
+    # A copy of the model's mesh with a per-instance array holding three transform rows
+    source = model.node() if model.node().is_geom_node() else model.find('**/+GeomNode').node()
+    geom = source.get_geom(0).make_copy()
+    instance = GeomVertexArrayFormat()
+    for row in ('row0', 'row1', 'row2'):
+        instance.add_column(InternalName.make(row), 4, Geom.NT_float32, Geom.C_other)
+    instance.set_divisor(1)
+    fmt = GeomVertexFormat(geom.get_vertex_data().get_format())
+    fmt.add_array(instance)
+    vdata = geom.modify_vertex_data()
+    vdata.set_format(GeomVertexFormat.register_format(fmt))
+    node = GeomNode(name)
+    node.add_geom(geom)
+    return node, fmt.get_num_arrays() - 1
+
+
+class PropBatch(Entity):
+    # Every instance of one prop type; each part (trunk, leaves, ...) is a single draw call
+    def __init__(self, parts, positions, rotations=None, scales=None, palette=None, **kwargs):
+        super().__init__(**kwargs)
+        global _shader
+        if _shader is None:
+            _shader = Shader.make(Shader.SL_GLSL, PROP_VERTEX, PROP_FRAGMENT)
+        self.parts = parts
+        self.batches = []
+        for shape, offset, part_scale, color_name in parts:
+            source = Entity(model='cube' if shape == 'box' else shape, add_to_scene_entities=False)
+            node, array_index = instanced_geom(source.model, f'props-{shape}-{color_name}')
+            destroy(source)
+            batch = self.attach_new_node(node)
+            batch.set_shader(_shader, 1)
+            if palette:
+                batch.set_color_scale(palette[color_name])
+            self.batches.append((batch, array_index, offset, part_scale))
+        self.set_transforms(positions, rotations, scales)
+
+    def set_transforms(self, positions, rotations=None, scales=None):
+        # Re-uploads every instance; cheap enough to call when a level is generated, not per frame
+        for batch, array_index, offset, part_scale in self.batches:
+            rows = prop_rows(positions, rotations, scales, offset, part_scale)
+            node = batch.node()
+            vdata = node.modify_geom(0).modify_vertex_data()
+            array = vdata.modify_array(array_index)
+            array.unclean_set_num_rows(len(rows))
+            if len(rows):
+                memoryview(array).cast('B')[:] = rows.tobytes()
+            batch.set_instance_count(len(rows))
+            # Instances are placed by the shader, so culling needs the bounds of all of them
+            low = high = np.zeros(3)
+            if len(rows):
+                reach = np.abs(rows[:, :, :3]).sum(axis=2).max(axis=0) * 0.5
+                low, high = rows[:, :, 3].min(axis=0) - reach, rows[:, :, 3].max(axis=0) + reach
+            node.set_bounds(BoundingBox(Point3(*low), Point3(*high)))
+            node.set_final(True)
+        self.count = len(np.asarray(positions).reshape(-1, 3))
+
+
+if __name__ == '__main__':
+    import random
+    import time
+    from math import isclose
+    from sm64_collision import CollisionWorld, rotation_axes
+    from sm64_level import PROP_PARTS, scatter_prop_positions, scatter_props, build_collision_world
+    rng = np.random.default_rng(1)
+    rotations = rng.uniform(-180, 180, (200, 3))
+    for (rx, ry, rz), axes in zip(rotations.tolist(), prop_axes(rotations)):
+        assert np.allclose(axes.T.ravel(), rotation_axes(rx, ry, rz))
+    # Unrotated, unscaled props give exactly the colliders the loose pieces do
+    positions = scatter_prop_positions(random.Random(3), 50, 50)
+    pieces = build_collision_world(scatter_props(random.Random(3), 50, 50)).colliders
+    world = CollisionWorld()
+    for kind in ('tree', 'rock'):
+        add_prop_colliders(world, PROP_PARTS[kind], positions[kind])
+    expected = sorted((c.kind, round(c.x, 9), round(c.y, 9), round(c.z, 9), c.hx, c.hy, c.radius) for c in pieces)
+    assert expected == sorted((c.kind, round(c.x, 9), round(c.y, 9), round(c.z, 9), c.hx, c.hy, c.radius) for c in world.colliders)
+    # A part offset turns and scales with its prop
+    rows = prop_rows([(1, 0, 2)], [(0, 90, 0)], [2], offset=(0, 0, 1), part_scale=(0.5, 1, 1))
+    assert np.allclose(rows[0, :, 3], (3, 0, 2)) and isclose(abs(rows[0, 2, 0]), 1.0, abs_tol=1e-6)
+    for count in (10, 10000):
+        positions = rng.uniform(-500, 500, (count, 3)) * (1, 0, 1)
+        yaw = np.column_stack((np.zeros(count), rng.uniform(0, 360, count), np.zeros(count)))
+        scales = rng.uniform(0.7, 1.4, count)
+        start = time.perf_counter()
+        for shape, offset, part_scale, color_name in PROP_PARTS['tree']:
+            prop_rows(positions, yaw, scales, offset, part_scale)
+        rows_ms = (time.perf_counter() - start) * 1000
+        world = CollisionWorld()
+        start = time.perf_counter()
+        add_prop_colliders(world, PROP_PARTS['tree'], positions, yaw, scales)
+        print(f'{count} trees: instance rows {rows_ms:.1f} ms, {len(world.colliders)} colliders in '
+              f'{(time.perf_counter() - start) * 1000:.0f} ms')
@@ -0,0 +1,195 @@
+# --------------------------------------------------
+# Offscreen render check: golden images and render cost
+# --------------------------------------------------
+# ‣ python sm64_render_check.py            = render every shot offscreen, report
+#                                            draw calls / nodes / triangles / ms,
+#                                            compare against golden/<variant>/*.png
+# ‣   --update                             = rewrite the golden images instead
+# ‣   --display tinydisplay                = Panda's software rasterizer (no GPU, no
+#                                            shaders, so props are drawn loose)
+# ‣   --loose                              = props as one Entity per part, the
+#                                            pre-instancing path, to cost the difference
+# ‣   --stress OBJECTS / --seed N          = a generated level instead of the 4k level
+# ‣ frame_stats(root, camera)              = what the camera's frustum keeps this frame
+# The shots are built from sm64_scene, the code sm64pcportursina4k builds its
+# level with, so they cover the port's terrain, props, palette and lights;
+# Mario, the HUD and anything that moves after load are not in them.
+# Captures and diff images go to render_check/<variant>/. Exits 1 when a shot
+# is further from its golden image than the tolerance.
+# --------------------------------------------------
+import os
+import sys
+import json
+import time
+import numpy as np
+from panda3d.core import Filename, GeomPrimitive, PNMImage, StringStream, Texture, loadPrcFileData
+
+SHOTS = {
+    # name: (camera position, point looked at); 'spawn' is the game camera behind Mario
+    'spawn': ((0, 8, -15), (0, 4, 0)),
+    'overview': ((0, 45, -65), (0, 0, 0)),
+    'props': ((-35, 10, -35), (0, 2, 0)),
+    'slopes': ((40, 8, -32), (18, 2, -10)),
+}
+SIZE = (320, 180)
+GOLDEN_DIR = 'golden'
+OUT_DIR = 'render_check'
+TOLERANCE = 2.0          # mean absolute difference per channel, out of 255
+PIXEL_THRESHOLD = 24     # a pixel this far off in any channel counts as changed ...
+MAX_CHANGED = 0.005      # ... and at most this fraction of them may change
+
+
+def frame_stats(root, cam):
+    # Cull-side estimate: every Geom of a GeomNode whose bounds meet the frustum is one draw call;
+    # instanced nodes draw all their triangles once per instance
+    lens_bounds = cam.node().get_lens().make_bounds()
+    stats = {'nodes': root.count_num_descendants() + 1, 'geom_nodes': 0, 'draw_calls': 0, 'triangles': 0}
+    for path in root.find_all_matches('**/+GeomNode'):
+        if path.is_hidden():
+            continue
+        node = path.node()
+        bounds = node.get_bounds().make_copy()
+        bounds.xform(path.get_mat(cam))
+        if not lens_bounds.contains(bounds):
+            continue
+        instances = path.get_instance_count() or 1
+        stats['geom_nodes'] += 1
+        for geom in node.get_geoms():
+            stats['draw_calls'] += 1
+            for prim in geom.get_primitives():
+                if prim.get_primitive_type() == GeomPrimitive.PT_polygons:
+                    stats['triangles'] += prim.get_num_faces() * instances
+    return stats
+
+
+def texture_image(tex):
+    # (height, width, 3) uint8, top row first; Panda keeps rows bottom-up
+    image = np.frombuffer(tex.get_ram_image_as('RGB'), np.uint8)
+    return image.reshape(tex.get_y_size(), tex.get_x_size(), 3)[::-1]
+
+
+def read_png(path):
+    # Through PNMImage: a Texture gets scaled to a power of two when the GSG wants one (tinydisplay does)
+    image = PNMImage()
+    if not image.read(Filename(path)):
+        return None
+    image.make_rgb()
+    image.remove_alpha()
+    image.set_maxval(255)
+    stream = StringStream()
+    image.write(stream, 'golden.ppm')
+    data = stream.get_data()    # binary PPM: a short header, then rows top first
+    width, height = image.get_x_size(), image.get_y_size()
+    return np.frombuffer(data[len(data) - width * height * 3:], np.uint8).reshape(height, width, 3)
+
+
+def write_png(path, image):
+    height, width = image.shape[:2]
+    tex = Texture()
+    tex.setup_2d_texture(width, height, Texture.T_unsigned_byte, Texture.F_rgb)
+    tex.set_ram_image_as(np.ascontiguousarray(image[::-1]).tobytes(), 'RGB')
+    tex.write(path)
+
+
+def compare(image, golden):
+    # (passed, mean difference, fraction of changed pixels, amplified difference image)
+    if golden is None or golden.shape != image.shape:
+        return False, float('inf'), 1.0, None
+    diff = np.abs(image.astype(np.int16) - golden.astype(np.int16))
+    mean = float(diff.mean())
+    changed = float((diff.max(axis=2) > PIXEL_THRESHOLD).mean())
+    return mean <= TOLERANCE and changed <= MAX_CHANGED, mean, changed, np.minimum(diff * 4, 255).astype(np.uint8)
+
+
+def build_scene(seed=0, stress=0, loose=False, shaders=True):
+    # The 4k level from the port's own scene code (sm64_scene): terrain, props, coin / Goomba shapes and lights
+    from ursina import Entity
+    from sm64_props import PropBatch
+    from sm64_scene import (LEVEL_COLORS, color_coin_gold, color_dirt_brown, level_layout, terrain_kwargs,
+                            instance_shape, instance_node, add_lights)
+    terrain, groups, coins, goombas = level_layout(seed, stress)
+    for piece in terrain:
+        Entity(**terrain_kwargs(piece))
+    for parts, positions, rotations, scales in groups:
+        if shaders and not loose:
+            PropBatch(parts, positions, rotations, scales, palette=LEVEL_COLORS)
+            continue
+        n = len(positions)
+        rotations = np.zeros((n, 3)) if rotations is None else rotations
+        scales = np.ones(n) if scales is None else scales
+        for position, rotation, s in zip(np.asarray(positions).tolist(), np.asarray(rotations).tolist(),
+                                         np.asarray(scales).tolist()):
+            holder = Entity(position=position, rotation=rotation, scale=s)
+            for shape, offset, part_scale, color_name in parts:
+                Entity(parent=holder, model='cube' if shape == 'box' else shape, color=LEVEL_COLORS[color_name],
+                       position=offset, scale=part_scale)
+    for positions, shape, name in ((coins, instance_shape('cylinder', color_coin_gold, (0.5, 0.01, 0.5)), 'coin'),
+                                   (goombas, instance_shape('sphere', color_dirt_brown, 1), 'goomba')):
+        for x, y, z in positions:
+            instance_node(shape, name).set_pos(x, y, z)
+    add_lights(shadows=shaders)
+
+
+if __name__ == '__main__':
+    def option(name, default):
+        return type(default)(sys.argv[sys.argv.index(name) + 1]) if name in sys.argv else default
+
+    display = option('--display', 'gl')
+    seed, stress, frames = option('--seed', 0), option('--stress', 0), option('--frames', 10)
+    if display == 'tinydisplay':
+        loadPrcFileData('', 'load-display p3tinydisplay')
+    from ursina import Ursina, camera, scene, window
+    app = Ursina(window_type='offscreen', size=SIZE, development_mode=False)
+    window.fps_counter.enabled = False
+    camera.ui.hide()
+    shaders = base.win.gsg.supports_basic_shaders
+    loose = '--loose' in sys.argv or not shaders
+    variant = display + ('-loose' if loose else '') + (f'-stress{stress}-seed{seed}' if stress or seed else '')
+    start = time.perf_counter()
+    build_scene(seed, stress, loose, shaders)
+    print(f'{variant}: {base.win.gsg.get_driver_renderer() or display}, scene built in '
+          f'{(time.perf_counter() - start) * 1000:.0f} ms')
+    out_dir, golden_dir = os.path.join(OUT_DIR, variant), os.path.join(GOLDEN_DIR, variant)
+    os.makedirs(out_dir, exist_ok=True)
+    if '--update' in sys.argv:
+        os.makedirs(golden_dir, exist_ok=True)
+    camera.fov = 60
+    report, failed = {}, []
+    for name, (position, target) in SHOTS.items():
+        camera.position = position
+        camera.look_at(target)
+        for i in range(2):
+            base.graphicsEngine.render_frame()      # the first frame after a move still prepares state
+        start = time.perf_counter()
+        for i in range(frames):
+            base.graphicsEngine.render_frame()
+        ms = (time.perf_counter() - start) / frames * 1000
+        image = texture_image(base.win.get_screenshot())
+        write_png(os.path.join(out_dir, name + '.png'), image)
+        stats = frame_stats(scene, base.cam)
+        stats['ms'] = ms
+        golden_path = os.path.join(golden_dir, name + '.png')
+        if '--update' in sys.argv:
+            write_png(golden_path, image)
+            result = 'golden updated'
+        else:
+            golden = read_png(golden_path) if os.path.exists(golden_path) else None
+            passed, mean, changed, diff = compare(image, golden)
+            stats.update(passed=passed, mean_diff=mean, changed=changed)
+            if golden is None:
+                result = f'no golden image at {golden_path}'
+            elif diff is None:
+                result = (f'golden image is {golden.shape[1]}x{golden.shape[0]}, '
+                          f'capture is {image.shape[1]}x{image.shape[0]}')
+            else:
+                result = f'diff {mean:.2f}, {changed:.2%} changed'
+                write_png(os.path.join(out_dir, name + '-diff.png'), diff)
+            if not passed:
+                failed.append(name)
+                result += '  FAIL'
+        report[name] = stats
+        print(f'  {name:9} {stats["draw_calls"]:6} draws {stats["geom_nodes"]:6} geom nodes {stats["nodes"]:7} nodes '
+              f'{stats["triangles"]:9} tris {ms:7.1f} ms  {result}')
+    with open(os.path.join(out_dir, 'report.json'), 'w') as f:
+        json.dump(report, f, indent=1)
+    sys.exit(1 if failed else 0)
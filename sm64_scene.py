@@ -0,0 +1,61 @@
+# --------------------------------------------------
+# The 4k port's scene: level choice, palette, shapes and lights
+# --------------------------------------------------
+# ‣ level_layout(seed, stress)     = terrain pieces, prop groups, coin and
+#                                    Goomba spawns (a generated level when
+#                                    stress > 0)
+# ‣ LEVEL_COLORS / color_*         = the port's palette, by color name
+# ‣ terrain_kwargs(piece)          = Entity keyword arguments for one piece
+# ‣ instance_shape / instance_node = one shared shape, a bare node per copy
+# ‣ add_lights(shadows)            = sun, ambient light, sky and fog
+# sm64pcportursina4k builds its level from these and sm64_render_check
+# builds its shots from them, so the golden images are of the scene the
+# port draws (less Mario, the HUD and whatever has moved since load).
+# --------------------------------------------------
+import random
+from ursina import Entity, DirectionalLight, AmbientLight, Sky, Vec3, color, scene
+from sm64_level import LEVEL_TERRAIN, PROP_PARTS, scatter_prop_positions, coin_spawns, goomba_spawns
+from sm64_levelgen import generate_level
+
+color_grass_green = color.rgb(34, 139, 34)
+color_dirt_brown = color.rgb(139, 69, 19)
+color_coin_gold = color.rgb(255, 215, 0)
+LEVEL_COLORS = {'grass': color_grass_green, 'dirt': color_dirt_brown, 'orange': color.orange, 'gray': color.gray}
+
+
+def level_layout(seed=None, stress=0):
+    # (terrain, prop groups, coin positions, Goomba positions); seed None places props and spawns at random
+    if stress:
+        level = generate_level(seed or 0, stress)
+        return level.terrain, list(level.solid_groups()), level.coins.tolist(), level.goombas.tolist()
+    rng = random.Random(seed)
+    groups = [(PROP_PARTS[kind], positions, None, None) for kind, positions in scatter_prop_positions(rng).items()]
+    return LEVEL_TERRAIN, groups, coin_spawns(rng), goomba_spawns(rng)
+
+
+def terrain_kwargs(piece):
+    shape, position, scale, rotation_x, color_name = piece
+    return dict(model='cube' if shape == 'box' else shape, color=LEVEL_COLORS[color_name], position=position,
+                scale=scale, rotation_x=rotation_x)
+
+
+def instance_shape(model, tint, scale):
+    shape = Entity(model=model, color=tint, scale=scale, add_to_scene_entities=False)
+    shape.detach_node()
+    return shape
+
+
+def instance_node(shape, name):
+    node = scene.attach_new_node(name)
+    shape.instance_to(node)
+    return node
+
+
+def add_lights(shadows=True):
+    sun = DirectionalLight(shadows=shadows, y=50, z=-20, color=color.rgb(255, 240, 200))
+    sun.look_at(Vec3(0, -1, -0.5))
+    AmbientLight(color=color.rgba(180, 180, 220, 0.3))
+    Sky(color=color.rgb(100, 150, 255))
+    scene.fog_density = 0.008
+    scene.fog_color = color.rgb(100, 150, 255)
+    return sun
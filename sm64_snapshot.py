@@ -0,0 +1,122 @@
+# --------------------------------------------------
+# Fixed-layout world snapshots and a rewind ring buffer
+# --------------------------------------------------
+# ‣ WorldLayout(coins, goombas).size = bytes per snapshot
+# ‣ RewindBuffer(layout, seconds)    = last N seconds of snapshots, preallocated
+# ‣ python sm64_snapshot.py          = round-trip and cost self-check
+# A snapshot is one struct.pack_into into a bytearray that never grows,
+# so recording every tick is cheap and rewinding is just moving the head.
+# --------------------------------------------------
+import struct
+
+FLAG_CROUCHING = 0x80   # the rest of the state byte is the kernel's ACT_* action
+
+# tick, clock, x, y, z, rotation_y, velocity_y, mom_x, mom_z, last_jump_time,
+# wall_kick_cooldown, jump_count, action | crouching, coins
+KERNEL_FORMAT = 'Id9dBBH'
+KERNEL_FIELDS = 14
+GOOMBA_FIELDS = 6  # alive, x, y, z, direction x, direction z
+
+
+class WorldLayout:
+    def __init__(self, coin_count, goomba_count):
+        self.coin_count = coin_count
+        self.goomba_count = goomba_count
+        self.coin_words = (coin_count + 63) // 64
+        self.struct = struct.Struct('<' + KERNEL_FORMAT + 'Q' * self.coin_words + 'B5f' * goomba_count)
+        self.size = self.struct.size
+
+    def write(self, buffer, offset, tick, kernel, coins, coin_bits, goomba_values):
+        # goomba_values is flat: alive, x, y, z, dx, dz per Goomba
+        k = kernel
+        flags = k.action | (FLAG_CROUCHING if k.crouching else 0)
+        if self.coin_words == 1:
+            words = (coin_bits,)
+        else:
+            words = [coin_bits >> (64 * i) & 0xFFFFFFFFFFFFFFFF for i in range(self.coin_words)]
+        self.struct.pack_into(buffer, offset, tick, k.clock, k.x, k.y, k.z, k.rotation_y, k.velocity_y, k.mom_x,
+                              k.mom_z, k.last_jump_time, k.wall_kick_cooldown, k.jump_count, flags, coins,
+                              *words, *goomba_values)
+
+    def read(self, buffer, offset, kernel):
+        # Restores the kernel in place; returns (tick, coins, coin_bits, flat goomba values)
+        values = self.struct.unpack_from(buffer, offset)
+        k = kernel
+        (tick, k.clock, k.x, k.y, k.z, k.rotation_y, k.velocity_y, k.mom_x, k.mom_z, k.last_jump_time,
+         k.wall_kick_cooldown, k.jump_count, flags, coins) = values[:KERNEL_FIELDS]
+        k.crouching = bool(flags & FLAG_CROUCHING)
+        k.set_action(flags & ~FLAG_CROUCHING)
+        k.body.grounded = k.grounded
+        k.pound_landed = k.wall_kicked = False
+        coin_bits = 0
+        for i in range(self.coin_words):
+            coin_bits |= values[KERNEL_FIELDS + i] << (64 * i)
+        return tick, coins, coin_bits, values[KERNEL_FIELDS + self.coin_words:]
+
+
+class RewindBuffer:
+    # Ring of the newest snapshots; the oldest one is never rewound past
+    def __init__(self, layout, seconds=10, tick_rate=60):
+        self.layout = layout
+        self.capacity = max(1, int(seconds * tick_rate))
+        self.data = bytearray(layout.size * self.capacity)
+        self.head = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def record(self, tick, kernel, coins, coin_bits, goomba_values):
+        self.layout.write(self.data, self.head * self.layout.size, tick, kernel, coins, coin_bits, goomba_values)
+        self.head = (self.head + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+
+    def rewind(self, kernel, ticks=1):
+        # Drops the newest `ticks` snapshots and restores the newest one left
+        if not self.count:
+            return None
+        ticks = min(ticks, self.count - 1)
+        self.head = (self.head - ticks) % self.capacity
+        self.count -= ticks
+        return self.layout.read(self.data, (self.head - 1) % self.capacity * self.layout.size, kernel)
+
+    def clear(self):
+        self.head = 0
+        self.count = 0
+
+
+if __name__ == '__main__':
+    import time
+    from sm64_kernel import MarioKernel
+    from sm64_level import LEVEL_TERRAIN, PLAYER_SPAWN, build_collision_world
+    kernel = MarioKernel(build_collision_world(LEVEL_TERRAIN))
+    kernel.reset(*PLAYER_SPAWN)
+    layout = WorldLayout(5, 3)
+    rewind = RewindBuffer(layout, seconds=10, tick_rate=60)
+    goombas = [1, 0.0, 0.5, 0.0, 1.0, 0.0] * 3
+    history = []
+    start = time.perf_counter()
+    for tick in range(1200):
+        kernel.step(1 / 60, 0.0, 1.0)
+        if tick % 90 == 0:
+            kernel.jump()
+        rewind.record(tick, kernel, tick // 100, (1 << (tick // 300)) - 1, goombas)
+        history.append((kernel.x, kernel.y, kernel.z, kernel.velocity_y, kernel.jump_count, kernel.action))
+    record_us = (time.perf_counter() - start) / 1200 * 1e6
+    start = time.perf_counter()
+    state = rewind.rewind(kernel, 300)
+    restore_us = (time.perf_counter() - start) * 1e6
+    tick, coins, coin_bits, goomba_values = state
+    assert tick == 899 and coins == 8 and coin_bits == 0b11, state[:3]
+    assert (kernel.x, kernel.y, kernel.z, kernel.velocity_y, kernel.jump_count, kernel.action) == history[899]
+    assert list(goomba_values[:6]) == goombas[:6]
+    # Replaying from a restored snapshot follows the original run exactly
+    for tick in range(900, 1200):
+        kernel.step(1 / 60, 0.0, 1.0)
+        if tick % 90 == 0:
+            kernel.jump()
+        assert (kernel.x, kernel.y, kernel.z, kernel.velocity_y, kernel.jump_count, kernel.action) == history[tick], tick
+    assert rewind.rewind(kernel, 10 ** 6)[0] == 1200 - rewind.capacity
+    print(f'{layout.size} bytes per snapshot, {rewind.capacity} slots = {len(rewind.data)} bytes')
+    print(f'step + record {record_us:.1f} us/tick, rewind 300 ticks {restore_us:.1f} us')
@@ -0,0 +1,120 @@
+# --------------------------------------------------
+# Per-tick telemetry, written column by column off the main thread
+# --------------------------------------------------
+# ‣ TelemetryWriter(directory).log(*row) = queue one tick (a tuple append)
+# ‣ open_telemetry(directory)            = {column: memory-mapped array}
+# ‣ python sm64_telemetry.py DIRECTORY   = session summary
+# Every column is its own .npy file. A background thread appends full
+# batches and rewrites the fixed-size header, so a session can be mapped
+# and read while it is still being recorded.
+# --------------------------------------------------
+import os
+import queue
+import sys
+import threading
+import numpy as np
+
+COLUMNS = (
+    ('tick', '<u4'), ('frame_time', '<f4'),
+    ('x', '<f4'), ('y', '<f4'), ('z', '<f4'),
+    ('mom_x', '<f4'), ('mom_z', '<f4'), ('velocity_y', '<f4'),
+    ('grounded', '|u1'), ('sliding', '|u1'), ('diving', '|u1'),
+    ('jump_count', '|u1'), ('coins', '<u2'),
+)
+HEADER_SIZE = 128  # room for any row count, so the header is rewritten in place
+
+
+def npy_header(dtype, rows):
+    header = "{'descr': '%s', 'fortran_order': False, 'shape': (%d,), }" % (dtype, rows)
+    magic = b'\x93NUMPY\x01\x00'
+    padding = HEADER_SIZE - len(magic) - 2 - len(header) - 1
+    return magic + (HEADER_SIZE - len(magic) - 2).to_bytes(2, 'little') + (header + ' ' * padding + '\n').encode('latin1')
+
+
+class TelemetryWriter:
+    def __init__(self, directory, columns=COLUMNS, batch_rows=4096):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.columns = columns
+        self.dtype = np.dtype(list(columns))
+        self.batch_rows = batch_rows
+        self.rows = []
+        self.rows_written = 0
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name='telemetry-writer', daemon=True)
+        self.thread.start()
+
+    def log(self, *row):
+        # Main-thread cost is one tuple append; conversion and I/O happen on the writer
+        self.rows.append(row)
+        if len(self.rows) >= self.batch_rows:
+            self.queue.put(self.rows)
+            self.rows = []
+
+    def close(self):
+        if self.thread.is_alive():
+            if self.rows:
+                self.queue.put(self.rows)
+                self.rows = []
+            self.queue.put(None)
+            self.thread.join()
+
+    def _run(self):
+        files = []
+        for name, dtype in self.columns:
+            f = open(os.path.join(self.directory, name + '.npy'), 'wb')
+            f.write(npy_header(dtype, 0))
+            files.append(f)
+        try:
+            while True:
+                batch = self.queue.get()
+                if batch is None:
+                    break
+                table = np.array(batch, dtype=self.dtype)
+                self.rows_written += len(table)
+                for f, (name, dtype) in zip(files, self.columns):
+                    f.write(table[name].tobytes())
+                    f.seek(0)
+                    f.write(npy_header(dtype, self.rows_written))
+                    f.seek(0, os.SEEK_END)
+                    f.flush()
+        finally:
+            for f in files:
+                f.close()
+
+
+def open_telemetry(directory):
+    # Nothing is read until a column is sliced
+    columns = {}
+    for filename in sorted(os.listdir(directory)):
+        if filename.endswith('.npy'):
+            columns[filename[:-4]] = np.load(os.path.join(directory, filename), mmap_mode='r')
+    return columns
+
+
+def summarize(directory):
+    t = open_telemetry(directory)
+    rows = len(t['tick'])
+    if not rows:
+        return f'{directory}: empty'
+    frame_ms = t['frame_time'] * 1000
+    speed = np.hypot(t['mom_x'], t['mom_z'])
+    return '\n'.join((
+        f'{directory}: {rows} ticks, {float(t["frame_time"].sum()) / 60:.1f} min',
+        f'frame time  mean {frame_ms.mean():.2f} ms  p99 {np.percentile(frame_ms, 99):.2f} ms  max {frame_ms.max():.2f} ms',
+        f'airborne {1 - t["grounded"].mean():.1%}  sliding {t["sliding"].mean():.1%}  diving {t["diving"].mean():.1%}',
+        f'ground speed mean {speed.mean():.2f}  max {speed.max():.2f}  jumps by count {np.bincount(t["jump_count"]).tolist()}',
+        f'coins {int(t["coins"][-1])}',
+    ))
+
+
+if __name__ == '__main__':
+    for directory in sys.argv[1:] or ['telemetry']:
+        if not os.path.isdir(directory):
+            print(f'{directory}: no sessions recorded yet (run a port with --telemetry, '
+                  f'or python sm64_telemetry.py DIRECTORY)')
+            continue
+        sessions = [directory] if os.path.exists(os.path.join(directory, 'tick.npy')) else \
+            [os.path.join(directory, d) for d in sorted(os.listdir(directory))]
+        for session in sessions:
+            print(summarize(session))
@@ -0,0 +1,193 @@
+# --------------------------------------------------
+# Hierarchical timer wheel on the simulation clock
+# --------------------------------------------------
+# ‣ TimerWheel(tick_rate).after(seconds, fn, *args) = Timer; fn(*args) runs on
+#                                                    the first tick at least
+#                                                    `seconds` later
+# ‣ TimerWheel.after(seconds)                       = a bare cooldown / window:
+#                                                    check it with active()
+# ‣ TimerWheel.cancel(timer) / active(timer)        = O(1); None is never active
+# ‣ TimerWheel.advance(dt)                          = once per frame with the
+#                                                    sim dt; runs whole ticks
+# ‣ python sm64_timers.py                           = firing order against a
+#                                                    sorted list + timing
+# Level 0 has one slot per tick for the next 256 ticks; each level above
+# covers 64 slots of the whole level below. A timer goes in the lowest
+# level whose span reaches its due tick and drops a level each time the
+# wheel passes the start of its slot, so it is touched at most once per
+# level however long the delay. Cancelling only marks the timer; the slot
+# drops it when it comes round. Timers due on the same tick run in no
+# particular order.
+# --------------------------------------------------
+
+
+class Timer:
+    __slots__ = ('due', 'fn', 'args', 'active')
+
+    def __init__(self, due, fn, args):
+        self.due = due
+        self.fn = fn
+        self.args = args
+        self.active = True
+
+
+class TimerWheel:
+    def __init__(self, tick_rate=60, bits=(8, 6, 6, 6)):
+        self.tick_rate = tick_rate
+        self.shifts = []        # ticks per slot of each level, as a power of two
+        self.masks = []
+        self.spans = []         # ticks ahead each level reaches
+        self.levels = []
+        shift = 0
+        for b in bits:
+            self.shifts.append(shift)
+            self.masks.append((1 << b) - 1)
+            self.levels.append([[] for i in range(1 << b)])
+            shift += b
+            self.spans.append(1 << shift)
+        self.overflow = []      # past the top level (over 13 days at 60 Hz), looked at once per top slot
+        self.now = 0            # ticks run
+        self.elapsed = 0.0      # seconds advanced but not yet a whole tick
+        self.pending = 0
+        self.fired = 0
+
+    def __len__(self):
+        return self.pending
+
+    # ---------- Scheduling ----------
+    def after(self, seconds, fn=None, *args):
+        # At least one tick away, so a callback never reschedules into the slot being run
+        ticks = int(seconds * self.tick_rate + 0.999)
+        timer = Timer(self.now + (ticks if ticks > 0 else 1), fn, args)
+        self._place(timer)
+        self.pending += 1
+        return timer
+
+    def _place(self, timer):
+        delta = timer.due - self.now
+        for level, shift, mask, span in zip(self.levels, self.shifts, self.masks, self.spans):
+            if delta < span:
+                level[timer.due >> shift & mask].append(timer)
+                return
+        self.overflow.append(timer)
+
+    def cancel(self, timer):
+        if timer is not None and timer.active:
+            timer.active = False
+            self.pending -= 1
+
+    def active(self, timer):
+        return timer is not None and timer.active
+
+    def remaining(self, timer):
+        # Seconds until it runs, 0 once it has run or been cancelled
+        if timer is None or not timer.active:
+            return 0.0
+        return max(0.0, (timer.due - self.now) / self.tick_rate - self.elapsed)
+
+    # ---------- Running ----------
+    def advance(self, dt):
+        self.elapsed += dt
+        period = 1.0 / self.tick_rate
+        while self.elapsed >= period:
+            self.elapsed -= period
+            self.tick()
+
+    def tick(self):
+        self.now = now = self.now + 1
+        levels, shifts, masks = self.levels, self.shifts, self.masks
+        # Crossing into a new slot of an upper level hands its timers down, highest level first
+        # so they can fall more than one level in the same tick
+        if now & masks[0] == 0:
+            top = len(levels) - 1
+            for i in range(top, 0, -1):
+                if now & ((1 << shifts[i]) - 1) == 0:
+                    self._cascade(i, now >> shifts[i] & masks[i], i == top)
+        slot = levels[0][now & masks[0]]
+        if not slot:
+            return
+        for timer in slot:
+            if timer.active:
+                timer.active = False
+                self.pending -= 1
+                self.fired += 1
+                if timer.fn is not None:
+                    timer.fn(*timer.args)
+        slot.clear()
+
+    def _cascade(self, i, index, overflow):
+        slot = self.levels[i][index]
+        if overflow and self.overflow:
+            slot += self.overflow
+            self.overflow = []
+        # Everything in the slot is now due within the span of the levels below, never back here
+        place = self._place
+        for timer in slot:
+            if timer.active:
+                place(timer)
+        slot.clear()
+
+
+if __name__ == '__main__':
+    import time
+    import random
+    import heapq
+
+    # Firing ticks match a sorted reference, across cascades, cancels and callbacks that reschedule
+    rng = random.Random(4)
+    wheel = TimerWheel(tick_rate=60, bits=(4, 3, 3))       # small levels: cascades and overflow happen often
+    fired, timers = [], []
+
+    def ring(name):
+        fired.append((wheel.now, name))
+        if name % 7 == 0:
+            timers.append((wheel.after(rng.randint(1, 3000) / 60, ring, name + 1), name + 1))
+
+    for name in range(0, 4000, 7):
+        timers.append((wheel.after(rng.choice((0.0, 1, 30, 600, 9000)) * rng.random() / 60, ring, name), name))
+    cancelled = set()
+    for step in range(20000):
+        if step % 50 == 0 and timers:
+            timer, name = timers[rng.randrange(len(timers))]
+            if wheel.active(timer):
+                wheel.cancel(timer)
+                cancelled.add(name)
+        wheel.tick()
+    expected = sorted((t.due, name) for t, name in timers if name not in cancelled and t.due <= wheel.now)
+    assert sorted(fired) == expected, next((a, b) for a, b in zip(sorted(fired), expected) if a != b)
+    assert len(wheel) == sum(1 for t, name in timers if t.active) and all(t.due > wheel.now for t, n in timers if t.active)
+    print(f'{len(fired)} timers fired on their tick, {len(cancelled)} cancelled, {len(wheel)} still pending')
+    # Seconds round up to whole ticks and advance() runs them off the sim dt, not the wall clock
+    wheel = TimerWheel()
+    cooldown = wheel.after(0.3)
+    for frame in range(17):
+        wheel.advance(1 / 60)
+    assert wheel.active(cooldown) and abs(wheel.remaining(cooldown) - 1 / 60) < 1e-9
+    wheel.advance(1 / 60)
+    assert not wheel.active(cooldown) and not wheel.active(None)
+    days = wheel.after(14 * 86400)
+    assert days in wheel.overflow
+    wheel.cancel(days)
+    # Cost: schedule, cancel half, run them all off, against a heap doing the same
+    count = 100000
+    delays = [rng.randint(1, 4000) / 60 for i in range(count)]
+    wheel = TimerWheel()
+    start = time.perf_counter()
+    handles = [wheel.after(d) for d in delays]
+    for timer in handles[::2]:
+        wheel.cancel(timer)
+    while len(wheel):
+        wheel.tick()
+    seconds = time.perf_counter() - start
+    heap, now = [], 0
+    start = time.perf_counter()
+    for i, d in enumerate(delays):
+        heapq.heappush(heap, (int(d * 60 + 0.999), i, [True]))
+    for entry in heap[::2]:
+        entry[2][0] = False
+    while heap:
+        now += 1
+        while heap and heap[0][0] <= now:
+            heapq.heappop(heap)
+    print(f'{count} timers: wheel {seconds / count * 1e6:.2f} us each (schedule + cancel half + tick off), '
+          f'heap {(time.perf_counter() - start) / count * 1e6:.2f} us')
@@ -0,0 +1,227 @@
+# --------------------------------------------------
+# Batched tweens: every running tween evaluated in one numpy pass
+# --------------------------------------------------
+# ‣ Tweens().to(obj, 'scale_y', 1.5, duration, delay, curve='out_quad')
+#       = obj.scale_y eases from its value when the tween starts to 1.5
+# ‣ Tweens.to(obj, 'position', (x, y, z), ...)  = 3-component targets too
+# ‣   on_done=fn                                = fn(obj) once it arrives
+# ‣ Tweens.update(dt)                           = once per frame: one pass
+#                                                 over the arrays, then one
+#                                                 setattr per running tween
+# ‣ Tweens.cancel(obj, attr=None)               = drop obj's tweens
+# ‣ python sm64_tweens.py                       = curve / delay / interrupt
+#                                                 checks + cost per tween
+# Start, end, start time, duration and curve live in parallel arrays with a
+# free list of slots; there is no sequence object or list of per-frame
+# callbacks per tween. Like Entity.animate, a tween starting on an attribute
+# another tween is running replaces it, and a delayed tween reads its start
+# value when the delay runs out.
+# --------------------------------------------------
+import numpy as np
+
+# Every curve is a cubic, so one table lookup eases all tweens at once: c0 + c1 u + c2 u^2 + c3 u^3
+CURVES = {
+    'linear': (0, 1, 0, 0),
+    'in_quad': (0, 0, 1, 0),
+    'out_quad': (0, 2, -1, 0),
+    'smoothstep': (0, 0, 3, -2),
+    'in_cubic': (0, 0, 0, 1),
+    'out_cubic': (0, 3, -3, 1),
+    'out_back': (0, 4.70158, -6.40316, 2.70158),      # overshoots by 10% before settling
+}
+CURVE_IDS = {name: i for i, name in enumerate(CURVES)}
+COEFFICIENTS = np.array(list(CURVES.values()), np.float64)
+FREE, WAITING, RUNNING = 0, 1, 2
+
+
+def ease(u, curve):
+    # u in [0, 1] per tween, curve ids from CURVE_IDS
+    c = COEFFICIENTS[curve]
+    return ((c[:, 3] * u + c[:, 2]) * u + c[:, 1]) * u + c[:, 0]
+
+
+class Tweens:
+    def __init__(self, capacity=64):
+        self.now = 0.0
+        self.top = 0            # slots in use lie below this; update() evaluates [:top]
+        self.live = 0
+        self.waiting = 0        # delayed tweens yet to start
+        self.free = []
+        self.running = {}       # (id(obj), attr) -> the slot animating it
+        self._grow(capacity)
+
+    def _grow(self, capacity):
+        old = self.top
+
+        def grown(a, shape, dtype):
+            b = np.zeros(shape, dtype)
+            if old:
+                b[:old] = a[:old]
+            return b
+
+        self.capacity = capacity
+        self.state = grown(getattr(self, 'state', None), capacity, np.int8)
+        self.curve = grown(getattr(self, 'curve', None), capacity, np.int8)
+        self.begin = grown(getattr(self, 'begin', None), capacity, np.float64)
+        self.duration = grown(getattr(self, 'duration', None), capacity, np.float64)
+        self.start = grown(getattr(self, 'start', None), (capacity, 3), np.float64)
+        self.end = grown(getattr(self, 'end', None), (capacity, 3), np.float64)
+        self.width = grown(getattr(self, 'width', None), capacity, np.int8)
+        extra = capacity - len(getattr(self, 'objs', ()))
+        self.objs = getattr(self, 'objs', []) + [None] * extra
+        self.attrs = getattr(self, 'attrs', []) + [None] * extra
+        self.on_done = getattr(self, 'on_done', []) + [None] * extra
+
+    def __len__(self):
+        return self.live
+
+    # ---------- Starting ----------
+    def to(self, obj, attr, value, duration=0.1, delay=0.0, curve='out_quad', on_done=None):
+        if self.free:
+            i = self.free.pop()
+        else:
+            if self.top == self.capacity:
+                self._grow(self.capacity * 2)
+            i = self.top
+            self.top += 1
+        self.live += 1
+        width = 1 if isinstance(value, (int, float)) else 3
+        self.width[i] = width
+        self.end[i, :width] = value
+        self.curve[i] = CURVE_IDS[curve]
+        self.begin[i] = self.now + delay
+        self.duration[i] = max(duration, 1e-6)
+        self.objs[i], self.attrs[i], self.on_done[i] = obj, attr, on_done
+        self.state[i] = WAITING
+        self.waiting += 1
+        if delay <= 0.0:
+            self._start(i)
+        return i
+
+    def _start(self, i):
+        obj, attr = self.objs[i], self.attrs[i]
+        key = (id(obj), attr)
+        previous = self.running.get(key)
+        if previous is not None and self.objs[previous] is obj:
+            self._release(previous)
+        self.running[key] = i
+        value = getattr(obj, attr)
+        self.start[i, :self.width[i]] = value if self.width[i] == 1 else tuple(value)[:3]
+        self.state[i] = RUNNING
+        self.waiting -= 1
+
+    def _release(self, i):
+        obj, attr = self.objs[i], self.attrs[i]
+        key = (id(obj), attr)
+        if self.running.get(key) == i:
+            del self.running[key]
+        if self.state[i] == WAITING:
+            self.waiting -= 1
+        self.state[i] = FREE
+        self.objs[i] = self.on_done[i] = None
+        self.free.append(i)
+        self.live -= 1
+        if not self.live:
+            # Idle again: the next burst packs in from slot 0
+            self.top = 0
+            self.free.clear()
+
+    def cancel(self, obj, attr=None):
+        for i in range(self.top):
+            if self.state[i] != FREE and self.objs[i] is obj and (attr is None or self.attrs[i] == attr):
+                self._release(i)
+
+    # ---------- Running ----------
+    def update(self, dt):
+        self.now = now = self.now + dt
+        if not self.live:
+            return
+        n = self.top
+        state = self.state[:n]
+        if self.waiting:
+            for i in ((state == WAITING) & (self.begin[:n] <= now)).nonzero()[0].tolist():
+                self._start(i)
+        # Evaluated for every slot below top (free slots too: slices beat gathering the running ones)
+        running = state == RUNNING
+        u = (now - self.begin[:n]) / self.duration[:n]
+        np.minimum(u, 1.0, out=u)
+        e = ease(u, self.curve[:n])
+        a = self.start[:n]
+        values = (a + (self.end[:n] - a) * e[:, None]).tolist()
+        objs, attrs, widths = self.objs, self.attrs, self.width[:n].tolist()
+        for i in running.nonzero()[0].tolist():
+            v = values[i]
+            setattr(objs[i], attrs[i], v[0] if widths[i] == 1 else v)
+        for i in (running & (u >= 1.0)).nonzero()[0].tolist():
+            obj, on_done = objs[i], self.on_done[i]
+            self._release(i)
+            if on_done is not None:
+                on_done(obj)
+
+
+if __name__ == '__main__':
+    import time
+
+    class Node:
+        __slots__ = ('scale_y', 'position')
+
+        def __init__(self):
+            self.scale_y = 1.0
+            self.position = [0.0, 0.0, 0.0]
+
+    # Curves end where they should, delays read their start late, a new tween replaces a running one
+    tweens = Tweens(capacity=2)
+    a, b = Node(), Node()
+    tweens.to(a, 'scale_y', 1.5, 0.1, curve='out_quad')
+    tweens.to(a, 'scale_y', 1.0, 0.1, delay=0.2, curve='in_quad')
+    done = []
+    tweens.to(b, 'position', (1.0, 2.0, -1.0), 0.5, curve='out_quad', on_done=done.append)
+    trace = []
+    for frame in range(40):
+        tweens.update(1 / 60)
+        trace.append(a.scale_y)
+    assert abs(trace[2] - (1 + 0.5 * (0.5 * (2 - 0.5)))) < 1e-9, trace[2]       # out_quad halfway
+    assert trace[7] == trace[10] == 1.5 and abs(trace[14] - 1.375) < 1e-9 and trace[-1] == 1.0, trace
+    assert done == [b] and b.position == [1.0, 2.0, -1.0] and len(tweens) == 0
+    tweens.to(a, 'scale_y', 3.0, 1.0, curve='linear')
+    tweens.update(0.5)
+    tweens.to(a, 'scale_y', 0.0, 0.5, curve='linear')
+    tweens.update(0.25)
+    assert abs(a.scale_y - 1.0) < 1e-9 and len(tweens) == 1, a.scale_y
+    tweens.cancel(a)
+    assert len(tweens) == 0 and tweens.running == {}
+    for name in CURVES:
+        e = ease(np.array([0.0, 1.0]), np.full(2, CURVE_IDS[name], np.int8))
+        assert e[0] == 0.0 and abs(e[1] - 1) < 1e-9, (name, e)
+    # Cost of a half-second tween on each of `count` nodes from start to finish (the coin sparkle),
+    # against the Sequence of Wait / Func steps Entity.animate builds for each
+    from ursina import curve
+    from ursina.sequence import Sequence, Wait, Func
+
+    def animate(node, value, duration):
+        sequence = Sequence()
+        steps = max(int(duration * 60), 1)
+        for i in range(steps + 1):
+            sequence.append(Wait(duration / steps))
+            sequence.append(Func(setattr, node, 'scale_y', node.scale_y + (value - node.scale_y) * curve.out_quad(i / steps)))
+        sequence.start()
+        return sequence
+
+    time.dt = 1 / 60
+    for count in (5, 50, 500):
+        nodes = [Node() for i in range(count)]
+        tweens = Tweens()
+        start = time.perf_counter()
+        for node in nodes:
+            tweens.to(node, 'scale_y', 2.0, 0.5)
+        while len(tweens):
+            tweens.update(1 / 60)
+        batched = time.perf_counter() - start
+        start = time.perf_counter()
+        sequences = [animate(node, 1.0, 0.5) for node in nodes]
+        for frame in range(32):
+            for sequence in sequences:
+                sequence.update()
+        each = time.perf_counter() - start
+        print(f'{count:4} tweens over 0.5 s: batched {batched * 1e3:6.2f} ms ({batched / count * 1e6:5.1f} us each), '
+              f'sequences {each * 1e3:6.2f} ms ({each / count * 1e6:5.1f} us each)')
@@ -1,18 +1,50 @@
 # test.py - Super Mario 64-style Prototype in Ursina
 from ursina import *
-from math import sin, cos, atan2, acos
+from math import sin, cos
 import time
 import random
+import os
+import sys
+import atexit
+from sm64_ecs import World, Transform, Kinematics, Collectible, Patrol, Animator, move_kinematics, animate, sync_nodes
+from sm64_collision import CollisionWorld, LAYER_TERRAIN, LAYER_PLAYER, LAYER_ENEMY, LAYER_PICKUP
+from sm64_broadphase import Body, SweepAndPrune
+from sm64_kernel import MarioKernel
+from sm64_level import PLAYER_SPAWN
+from sm64_snapshot import WorldLayout, RewindBuffer
+from sm64_nav import NavGrid, NavAgent
+from sm64_heightfield import Heightfield
+from sm64_props import PropBatch, add_prop_colliders
+from sm64_debug import DebugOverlay
+from sm64_pacing import FramePacer
+from sm64_gc import GCManager
+from sm64_profiler import SamplingProfiler
+from sm64_timers import TimerWheel
+from sm64_tweens import Tweens
+from sm64_jobs import JobScheduler
+from sm64_scene import (LEVEL_COLORS, color_dirt_brown, color_coin_gold, level_layout, terrain_kwargs,
+                        instance_shape, instance_node, add_lights)
 
 # Custom colors for N64-like palette
 color_mario_blue = color.rgb(0, 0, 255)
 color_mario_red = color.rgb(255, 0, 0)
 color_mario_peach = color.rgb(255, 182, 193)
-color_grass_green = color.rgb(34, 139, 34)
-color_dirt_brown = color.rgb(139, 69, 19)
-color_coin_gold = color.rgb(255, 215, 0)
 
-interactable_entities = []
+level_world = CollisionWorld()
+# Coins, Goombas and coin sparkles are ECS entities drawn by bare Panda nodes
+ecs = World()
+# Goombas collide with each other, props and coins through a sweep-and-prune broadphase
+bodies = SweepAndPrune()
+GOOMBA_PUSHED_BY = LAYER_ENEMY | LAYER_PICKUP | LAYER_TERRAIN
+# Delayed destroys and popup expiry run off one timer wheel on the sim clock,
+# squash and stretch off one batch of tweens
+timers = TimerWheel(tick_rate=60)
+tweens = Tweens()
+
+def popup(message, seconds=1, position=(0.4, 0.35), scale=1.5):
+    t = Text(message, position=position, origin=(0, 0), scale=scale)
+    timers.after(seconds, destroy, t)
+    return t
 
 class Mario64(Entity):
     def __init__(self, **kwargs):
@@ -22,6 +54,7 @@ class Mario64(Entity):
         self.collider = 'box'
         self.scale = (0.6, 1.8, 0.6)
         self.origin_y = -0.5
+        self.collision_layer = LAYER_PLAYER
         # Visual components
         self.visual = Entity(parent=self, model='cube', color=color_mario_blue, scale=(0.8, 1.6, 0.4))
         self.hat = Entity(parent=self.visual, model='cube', color=color_mario_red, scale=(0.9, 0.3, 0.9), position=(0, 0.8, 0))
@@ -33,248 +66,369 @@ class Mario64(Entity):
         self.arm_r = Entity(parent=self.visual, model='cube', color=color_mario_blue, scale=(0.2, 0.5, 0.2), position=(0.5, 0, 0))
         self.leg_l = Entity(parent=self.visual, model='cube', color=color_mario_blue, scale=(0.2, 0.5, 0.2), position=(-0.2, -0.8, 0))
         self.leg_r = Entity(parent=self.visual, model='cube', color=color_mario_blue, scale=(0.2, 0.5, 0.2), position=(0.2, -0.8, 0))
-        # Movement
-        self.speed = 8
-        self.turn_speed = 160
-        self.jump_height = 5.0
-        self.double_jump_height = 6.0
-        self.triple_jump_height = 7.5
-        self.jump_duration = 0.35
-        self.gravity_strength = 24
-        self.velocity_y = 0
-        self.momentum = Vec3(0, 0, 0)
-        self.grounded = True
-        self.jump_count = 0
-        self.last_jump_time = 0
-        self.crouching = False
-        self.diving = False
-        self.sliding = False
-        self.wall_kick_cooldown = 0
+        # Movement (all kinematics live in the allocation-free kernel)
+        self.kernel = MarioKernel(level_world, speed=8, jump_height=5.0, double_jump_height=6.0, triple_jump_height=7.5,
+                                  jump_duration=0.35, gravity_strength=24)
+        self.kernel.reset(*self.position)
         self.coins = 0
-        self.show_collider = False
-        self.ground_pound_landed = False
 
     def update(self):
-        move_dir = Vec3(0, 0, 0)
+        if held_keys['r']:
+            return  # the rewind task owns the world while R is held
+        k = self.kernel
+        forward, right = camera.forward, camera.right
+        move_x = move_z = 0
         if held_keys['w'] or held_keys['up arrow']:
-            move_dir += camera.forward * Vec3(1, 0, 1)
+            move_x += forward.x
+            move_z += forward.z
         if held_keys['s'] or held_keys['down arrow']:
-            move_dir += camera.forward * Vec3(-1, 0, -1)
+            move_x -= forward.x
+            move_z -= forward.z
         if held_keys['a'] or held_keys['left arrow']:
-            move_dir += camera.right * Vec3(-1, 0, -1)
+            move_x -= right.x
+            move_z -= right.z
         if held_keys['d'] or held_keys['right arrow']:
-            move_dir += camera.right * Vec3(1, 0, 1)
-        if move_dir.length() > 0.01 and not self.sliding:
-            move_dir = move_dir.normalized()
-            target_rotation = atan2(move_dir.x, move_dir.z) * 180 / 3.14159
-            self.rotation_y = lerp(self.rotation_y, target_rotation, 15 * time.dt)
-            self.momentum = lerp(self.momentum, move_dir * self.speed, 10 * time.dt)
-        elif not self.sliding:
-            self.momentum = lerp(self.momentum, Vec3(0, 0, 0), 12 * time.dt)
-        ray = raycast(self.world_position + Vec3(0, 0.5, 0), self.momentum.normalized(), distance=self.momentum.length() * time.dt + 0.2, ignore=[self] + self.children)
-        if not ray.hit:
-            self.position += self.momentum * time.dt
+            move_x += right.x
+            move_z += right.z
+        k.step(time.dt, move_x, move_z)
+        self.setPos(k.x, k.y, k.z)
+        self.rotation_y = k.rotation_y
         # Animations
-        self.visual.y = sin(time.time() * 15) * 0.1 if self.grounded and not self.crouching else 0
-        self.arm_l.rotation_z = sin(time.time() * 10) * 20 if self.grounded and move_dir.length() > 0.01 else 0
-        self.arm_r.rotation_z = -sin(time.time() * 10) * 20 if self.grounded and move_dir.length() > 0.01 else 0
-        self.leg_l.rotation_z = sin(time.time() * 10) * 20 if self.grounded and move_dir.length() > 0.01 else 0
-        self.leg_r.rotation_z = -sin(time.time() * 10) * 20 if self.grounded and move_dir.length() > 0.01 else 0
-        if self.diving:
+        self.visual.y = sin(time.time() * 15) * 0.1 if k.grounded and not k.crouching else 0
+        self.arm_l.rotation_z = sin(time.time() * 10) * 20 if k.grounded and k.moving else 0
+        self.arm_r.rotation_z = -sin(time.time() * 10) * 20 if k.grounded and k.moving else 0
+        self.leg_l.rotation_z = sin(time.time() * 10) * 20 if k.grounded and k.moving else 0
+        self.leg_r.rotation_z = -sin(time.time() * 10) * 20 if k.grounded and k.moving else 0
+        if k.diving:
             self.visual.rotation_x = lerp(self.visual.rotation_x, 45, 10 * time.dt)
-        elif self.grounded:
+        elif k.sliding:
+            self.visual.rotation_x = 20
+        elif k.grounded:
             self.visual.rotation_x = lerp(self.visual.rotation_x, 0, 10 * time.dt)
-        # Gravity
-        self.velocity_y -= self.gravity_strength * time.dt
-        self.y += self.velocity_y * time.dt
-        ground_hit = False
-        ray_points = [(0, 0, 0), (0.3, 0, 0.3), (-0.3, 0, 0.3), (0.3, 0, -0.3), (-0.3, 0, -0.3)]
-        min_y = float('inf')
-        for point in ray_points:
-            ray_pos = self.world_position + Vec3(point[0], 0.1, point[2])
-            ground_ray = raycast(ray_pos, self.down, distance=0.5, ignore=[self] + self.children)
-            if ground_ray.hit and self.velocity_y <= 0:
-                ground_hit = True
-                if ground_ray.world_point.y < min_y:
-                    min_y = ground_ray.world_point.y
-        if ground_hit:
-            self.y = min_y + 0.05
-            self.velocity_y = 0
-            self.grounded = True
-            self.jump_count = 0
-            self.diving = False
-            if self.ground_pound_landed:
-                self.ground_pound_landed = False
-                for goomba in interactable_entities:
-                    if isinstance(goomba, Goomba) and distance(self, goomba) < 3:
-                        destroy(goomba)
-                        Text("Stunned Goomba!", position=(0.4, 0.35), origin=(0, 0), scale=1.5, duration=1)
-            normal = ground_ray.normal
-            slope_angle = acos(normal.y) * 180 / 3.14159
-            if slope_angle > 30 and not self.crouching:
-                self.sliding = True
-                slide_dir = Vec3(normal.x, 0, normal.z).normalized()
-                self.momentum += slide_dir * 8 * time.dt
-                self.visual.rotation_x = 20
-            else:
-                self.sliding = False
-                self.visual.rotation_x = lerp(self.visual.rotation_x, 0, 10 * time.dt)
-        else:
-            self.grounded = False
-            self.sliding = False
-        # Wall kick
-        if not self.grounded and self.wall_kick_cooldown <= 0:
-            wall_ray = raycast(self.world_position + Vec3(0, 0.5, 0), move_dir, distance=0.7, ignore=[self] + self.children)
-            if wall_ray.hit and move_dir.dot(wall_ray.normal) < -0.7:
-                self.velocity_y = 5.0
-                self.momentum = -move_dir * 4
-                self.wall_kick_cooldown = 0.3
-        self.wall_kick_cooldown -= time.dt
+        if k.pound_landed:
+            for goomba, patrol, t in ecs.view(Patrol, Transform):
+                if (t.x - k.x) ** 2 + (t.y - k.y) ** 2 + (t.z - k.z) ** 2 < 9 and ecs.destroy(goomba):
+                    popup("Stunned Goomba!")
         # Interactions
-        for entity in interactable_entities[:]:
-            if isinstance(entity, Coin) and distance(self, entity) < 1.5:
-                self.coins += 1
-                interactable_entities.remove(entity)
-                destroy(entity)
-                for i in range(5):
-                    p = Entity(model='quad', color=color_coin_gold, scale=0.1, position=entity.position)
-                    p.animate_position(p.position + Vec3(random.uniform(-0.5, 0.5), 1, random.uniform(-0.5, 0.5)), duration=0.5, curve=curve.out_quad)
-                    destroy(p, delay=0.5)
-                coin_ui.text = f"Coins: {self.coins}"
-            if isinstance(entity, Goomba) and distance(self, entity) < 1.5:
-                if self.velocity_y < -5 and not self.grounded:
-                    interactable_entities.remove(entity)
-                    destroy(entity)
-                    self.velocity_y = 3.0
-                    Text("Stomped Goomba!", position=(0.4, 0.35), origin=(0, 0), scale=1.5, duration=1)
-                elif not self.grounded and entity.position.y + 0.5 > self.position.y:
-                    self.respawn()
-                    Text("Ouch! Hit by Goomba!", position=(0.4, 0.35), origin=(0, 0), scale=1.5, duration=1)
+        for coin, collectible, t in ecs.view(Collectible, Transform):
+            if (t.x - k.x) ** 2 + (t.y - k.y) ** 2 + (t.z - k.z) ** 2 >= collectible.radius ** 2 or not ecs.destroy(coin):
+                continue
+            self.coins += collectible.value
+            for i in range(5):
+                spawn_sparkle(t.x, t.y, t.z)
+            coin_ui.text = f"Coins: {self.coins}"
+        for goomba, patrol, t in ecs.view(Patrol, Transform):
+            if (t.x - k.x) ** 2 + (t.y - k.y) ** 2 + (t.z - k.z) ** 2 >= patrol.radius ** 2 or not ecs.is_live(goomba):
+                continue
+            if k.velocity_y < -5 and not k.grounded:
+                ecs.destroy(goomba)
+                k.velocity_y = 3.0
+                popup("Stomped Goomba!")
+            elif not k.grounded and t.y + 0.5 > k.y:
+                self.respawn()
+                popup("Ouch! Hit by Goomba!")
         if self.y < -50:
             self.respawn()
 
     def input(self, key):
-        if key == 'space' and (self.grounded or (time.time() - self.last_jump_time < 0.35 and self.jump_count < 3)):
-            if self.grounded:
-                self.jump_count = 1
-            else:
-                self.jump_count += 1
-            if self.jump_count == 1:
-                self.velocity_y = self.jump_height
-            elif self.jump_count == 2:
-                self.velocity_y = self.double_jump_height
-            elif self.jump_count == 3:
-                self.velocity_y = self.triple_jump_height
-            self.grounded = False
-            self.sliding = False
-            self.last_jump_time = time.time()
-            self.visual.animate_scale_y(1.5, duration=0.1, curve=curve.out_quad)
-            self.visual.animate_scale_y(1.0, duration=0.1, delay=0.2, curve=curve.in_quad)
+        k = self.kernel
+        if key == 'space' and not k.long_jump(camera.forward.x, camera.forward.z) and k.jump():
+            self.squash(1.5)
         if key == 'shift':
-            self.crouching = True
+            k.crouch(True)
             self.visual.scale_y = 0.8
         if key == 'shift up':
-            self.crouching = False
+            k.crouch(False)
             self.visual.scale_y = 1.6
-        if key == 'space' and self.crouching and self.grounded:
-            self.velocity_y = 4.0
-            self.momentum += (camera.forward * Vec3(1, 0, 1)).normalized() * 5
-            self.grounded = False
-            self.sliding = False
-        if key == 'f' and not self.grounded and not self.diving:
-            self.diving = True
-            self.velocity_y = 2.0
-            self.momentum += (camera.forward * Vec3(1, 0, 1)).normalized() * 6
-        if key == 'g' and not self.grounded:
-            self.velocity_y = -15.0
-            self.diving = False
-            self.ground_pound_landed = True
-            self.visual.animate_scale_y(0.5, duration=0.1, curve=curve.out_quad)
-            self.visual.animate_scale_y(1.0, duration=0.1, delay=0.2, curve=curve.in_quad)
+        if key == 'f':
+            k.dive(camera.forward.x, camera.forward.z)
+        if key == 'g' and k.ground_pound():
+            self.squash(0.5)
+        if key == 'backspace':
+            reset_level()
         if key == 't':
-            self.show_collider = not self.show_collider
-            for e in scene.entities:
-                if hasattr(e, 'collider') and e != self.visual:
-                    e.visible = self.show_collider if e.collider else False
+            debug_overlay.toggle()
+        if key == 'p' and profiler.capture(PROFILE_SECONDS, profile_directory):
+            popup(f"Profiling {PROFILE_SECONDS:g} s...")
+
+    def squash(self, scale_y):
+        # Stretch (or squash) the body, hold it, then spring back
+        tweens.to(self.visual, 'scale_y', scale_y, 0.1, curve='out_quad')
+        tweens.to(self.visual, 'scale_y', 1.0, 0.1, delay=0.2, curve='in_quad')
 
     def respawn(self):
-        self.position = (0, 10, 0)
-        self.velocity_y = 0
-        self.momentum = Vec3(0, 0, 0)
+        self.position = PLAYER_SPAWN
         self.rotation_y = 0
-        self.diving = False
-        self.crouching = False
-        self.sliding = False
+        self.kernel.reset(*PLAYER_SPAWN)
         self.visual.scale_y = 1.6
         self.visual.rotation_x = 0
-        t = Text("Mama mia! You fell!", origin=(0, 0), scale=2)
-        destroy(t, delay=2)
-
-class Coin(Entity):
-    def __init__(self, position=(0, 0, 0)):
-        super().__init__(model='cylinder', color=color_coin_gold, scale=(0.5, 0.01, 0.5), position=position, collider='box')
-        self.base_y = position[1]
-        interactable_entities.append(self)
-    def update(self):
-        self.rotation_y += 120 * time.dt
-        self.y = self.base_y + sin(time.time() * 5) * 0.1
-
-class Goomba(Entity):
-    def __init__(self, position=(0, 0, 0)):
-        super().__init__(model='sphere', color=color_dirt_brown, scale=1, position=position, collider='sphere')
-        self.direction = Vec3(random.uniform(-1, 1), 0, random.uniform(-1, 1)).normalized()
-        self.grounded = True
-        interactable_entities.append(self)
-    def update(self):
-        ground_ray = raycast(self.position + Vec3(0, 0.1, 0), self.down, distance=1.5)
-        if ground_ray.hit:
-            self.y = ground_ray.world_point.y + 0.5
-            self.grounded = True
-            self.position += self.direction * 2 * time.dt
-            edge_ray = raycast(self.position + self.direction * 0.5 + Vec3(0, 0.1, 0), self.down, distance=1.5)
-            wall_ray = raycast(self.position + Vec3(0, 0.5, 0), self.direction, distance=0.7)
-            if not edge_ray.hit or wall_ray.hit:
-                self.direction = -self.direction
-        else:
-            self.grounded = False
-        self.scale = 1 + sin(time.time() * 5) * 0.1
+        popup("Mama mia! You fell!", 2, position=(0, 0), scale=2)
+
+# ECS prototypes: every coin / Goomba / sparkle node instances one shared shape (sm64_scene)
+def spawn_coin(slot):
+    x, y, z = coin_positions[slot]
+    return ecs.spawn(Transform(x, y, z, node=instance_node(coin_shape, 'coin')), Collectible(slot),
+                     Animator(spin=120, bob=0.1, base_y=y), bodies.add(Body(x, y, z, 0.35, LAYER_PICKUP)))
+
+def spawn_goomba(slot, x, y, z):
+    # Patrols around its spawn and chases Mario on the baked nav grid, no probe raycasts
+    agent = NavAgent(level_nav, x, y, z)
+    return ecs.spawn(Transform(agent.x, agent.y, agent.z, node=instance_node(goomba_shape, 'goomba')), Patrol(agent, slot),
+                     Animator(pulse=0.1), bodies.add(Body(agent.x, agent.y, agent.z, 0.5, LAYER_ENEMY, GOOMBA_PUSHED_BY, 1.0)))
+
+def spawn_sparkle(x, y, z):
+    # Drag eases the sparkle out to about (+-0.5, 1, +-0.5) over its half-second life
+    sparkle = ecs.spawn(Transform(x, y, z, node=instance_node(sparkle_shape, 'sparkle')),
+                        Kinematics(random.uniform(-0.5, 0.5) * 5.1, 5.1, random.uniform(-0.5, 0.5) * 5.1, drag=0.01))
+    timers.after(0.5, ecs.destroy, sparkle)
+    return sparkle
+
+def remove_node(world, entity):
+    t = world.get(entity, Transform)
+    if t is not None and t.node is not None:
+        t.node.remove_node()
+ecs.on_destroy.append(remove_node)
+
+def remove_body(world, entity):
+    body = world.get(entity, Body)
+    if body is not None:
+        bodies.remove(body)
+ecs.on_destroy.append(remove_body)
+
+def patrol_goombas(world, dt):
+    if held_keys['r']:
+        return
+    k = player.kernel
+    target = (k.x, k.y, k.z)
+    for goomba, patrol, t in world.view(Patrol, Transform):
+        a = patrol.agent
+        a.update(dt, target)
+        t.x, t.y, t.z = a.x, a.y, a.z
+
+def separate_goombas(world, dt):
+    # Goombas shoulder each other aside and slide around props and coins; the nav grid
+    # still owns the ground, so a push that would leave walkable cells is dropped
+    if held_keys['r']:
+        return
+    for goomba, patrol, body in world.view(Patrol, Body):
+        a = patrol.agent
+        body.x, body.y, body.z = a.x, a.y, a.z
+    bodies.update()
+    if not bodies.resolve(level_world):
+        return
+    for goomba, patrol, body, t in world.view(Patrol, Body, Transform):
+        a = patrol.agent
+        if body.x == a.x and body.z == a.z:
+            continue
+        cell, moved_to = level_nav.cell_at(a.x, a.z), level_nav.cell_at(body.x, body.z)
+        if moved_to == cell or level_nav.can_step(cell, moved_to):
+            a.x, a.z = body.x, body.z
+            a.y = level_nav.heights[moved_to] + 0.5
+            t.x, t.y, t.z = a.x, a.y, a.z
 
 # Scene setup
-app = Ursina(vsync=True)  # Enforce 60 FPS
+# --fps N paces in software (sleep, then spin) instead of waiting on vsync
+target_fps = int(sys.argv[sys.argv.index('--fps') + 1]) if '--fps' in sys.argv else 0
+app = Ursina(vsync=not target_fps)  # Enforce the display rate unless --fps is given
 window.title = 'Super Mario 64 – Ursina SM64 PC Port'
 window.borderless = False
 window.exit_button.visible = False
 window.fps_counter.enabled = True
 window.size = (1280, 720)
 
-# Terrain
-ground = Entity(model='cube', collider='box', scale=(120, 0.1, 120), position=(0, -0.05, 0), color=color_grass_green)
-Entity(model='cube', collider='box', color=color_dirt_brown, position=(12, 2.5, 12), scale=(10, 5, 10))
-Entity(model='cube', collider='box', color=color_dirt_brown, position=(-18, 4, 8), scale=(8, 8, 8))
-Entity(model='cube', collider='box', color=color.orange, position=(0, 6, -15), scale=(12, 2, 6))
-Entity(model='cube', collider='box', color=color.gray, position=(25, 1.5, -12), scale=(15, 3, 8), rotation_x=-20)
-Entity(model='cube', collider='box', color=color.gray, position=(-12, 3, -8), scale=(10, 6, 10), rotation_x=25)
-
-# Environmental objects
-for i in range(3):
-    x, z = random.uniform(-40, 40), random.uniform(-40, 40)
-    tree_trunk = Entity(model='cube', color=color_dirt_brown, scale=(0.5, 3, 0.5), position=(x, 1.5, z), collider='box')
-    tree_leaves = Entity(model='sphere', color=color_grass_green, scale=2.5, position=(x, 3, z), collider='sphere')
-for i in range(2):
-    x, z = random.uniform(-40, 40), random.uniform(-40, 40)
-    Entity(model='sphere', color=color.gray, scale=2, position=(x, 1, z), collider='sphere')
-
-# Cannon prop
-cannon = Entity(model='cylinder', color=color.gray, scale=(1, 2, 1), position=(20, 1, 20), rotation_x=30, collider='cylinder')
-
-# Collectibles and enemies
-for i in range(5):
-    Coin(position=(random.uniform(-20, 20), random.uniform(2, 5), random.uniform(-20, 20)))
-for i in range(3):
-    Goomba(position=(random.uniform(-20, 20), 1, random.uniform(-20, 20)))
+# Timers due this frame fire first. Background jobs then share a frame
+# budget (--job-budget MS, default 3): Goomba AI, sparkle motion and coin
+# spin run most overdue first, and what does not fit waits for the next
+# frame and catches up with a longer dt. Mario's physics is his Entity
+# update and always runs. The ECS pushes every transform to its node before
+# the Entity updates; entities destroyed mid-frame are removed together
+# after all updates
+def run_timers(task):
+    timers.advance(time.dt)
+    return task.cont
+app.taskMgr.add(run_timers, 'run_timers', sort=-2)
+def run_tweens(task):
+    tweens.update(time.dt)
+    return task.cont
+def goomba_ai(dt):
+    patrol_goombas(ecs, dt)
+    separate_goombas(ecs, dt)
+job_budget = float(sys.argv[sys.argv.index('--job-budget') + 1]) if '--job-budget' in sys.argv else 3.0
+jobs = JobScheduler(budget_ms=job_budget)
+jobs.add('goomba_ai', goomba_ai, priority=2)
+jobs.add('sparkles', lambda dt: move_kinematics(ecs, dt), priority=1)
+jobs.add('coin_spin', lambda dt: animate(ecs, dt), priority=0, hz=30)
+ecs.add_system(sync_nodes)
+def run_ecs(task):
+    jobs.run(time.dt)
+    ecs.run(time.dt)
+    return task.cont
+def flush_ecs(task):
+    ecs.flush()
+    return task.cont
+app.taskMgr.add(run_ecs, 'run_ecs', sort=-1)
+app.taskMgr.add(flush_ecs, 'flush_ecs', sort=1)
+app.taskMgr.add(run_tweens, 'run_tweens', sort=1)
+coin_shape = instance_shape('cylinder', color_coin_gold, (0.5, 0.01, 0.5))
+goomba_shape = instance_shape('sphere', color_dirt_brown, 1)
+sparkle_shape = instance_shape('quad', color_coin_gold, 0.1)
+
+# Static level geometry is mirrored into level_world for capsule moves and probes
+def solid(shape, layer=LAYER_TERRAIN, **kwargs):
+    # Collision goes through level_world only, so the Entity carries no Ursina collider
+    e = Entity(collision_layer=layer, **kwargs)
+    level_world.add_entity(e, shape, layer)
+    return e
+
+# Level: --seed N reproduces the placement (same as the net server's seed),
+# --stress OBJECTS swaps in a generated level of that many objects. Its heightfield
+# and nav grid cover only BAKE_RADIUS around the spawn, a fixed 128x128 cells:
+# Mario falls back to the capsule sweep past it and Goombas past it stand still.
+# Loading is then bound by the per-object collision and ECS setup, about 1.5 s and
+# 270 MB at 10k objects and 3 s and 530 MB at 100k, so ~100k is the practical
+# ceiling (1M would need several GB); the per-object jobs slow frames well before that.
+BAKE_RADIUS = 64
+level_seed = int(sys.argv[sys.argv.index('--seed') + 1]) if '--seed' in sys.argv else None
+level_stress = int(sys.argv[sys.argv.index('--stress') + 1]) if '--stress' in sys.argv else 0
+level_terrain, solid_groups, coin_positions, goomba_positions = level_layout(level_seed, level_stress)
+bake_bounds = None
+if level_stress:
+    bake_bounds = (PLAYER_SPAWN[0] - BAKE_RADIUS, PLAYER_SPAWN[2] - BAKE_RADIUS,
+                   PLAYER_SPAWN[0] + BAKE_RADIUS, PLAYER_SPAWN[2] + BAKE_RADIUS)
+
+# Terrain and the cannon prop
+for piece in level_terrain:
+    solid(piece[0], **terrain_kwargs(piece))
+
+# Trees, rocks (and generated blocks): one instanced draw per part, collision proxies in level_world
+prop_batches = []
+for parts, positions, rotations, scales in solid_groups:
+    prop_batches.append(PropBatch(parts, positions, rotations, scales, palette=LEVEL_COLORS))
+    add_prop_colliders(level_world, parts, positions, rotations, scales)
+
+# Ground heights for snapping and walkable cells for the Goombas, baked once from the static terrain
+level_world.heightfield = Heightfield(level_world, bounds=bake_bounds)
+level_nav = NavGrid(level_world, heightfield=level_world.heightfield, bounds=bake_bounds)
+
+# Collectibles and enemies, kept by spawn index so snapshots can bring them back
+coin_slots = [spawn_coin(i) for i in range(len(coin_positions))]
+goomba_slots = [spawn_goomba(i, *position) for i, position in enumerate(goomba_positions)]
 
 # Player
-player = Mario64(position=(0, 10, 0))
+player = Mario64(position=PLAYER_SPAWN)
+
+# T: wireframe of every collider, Goomba / coin body and Mario's capsule plus last frame's probes, in a few batches
+debug_overlay = DebugOverlay(level_world, bodies, (player.kernel.body,))
+
+# World snapshots: one per frame after the destroy flush, R rewinds, Backspace resets the level
+world_layout = WorldLayout(len(coin_slots), len(goomba_slots))
+rewind_buffer = RewindBuffer(world_layout, seconds=10, tick_rate=60)
+goomba_values = [0.0] * (6 * len(goomba_slots))
+dead_goomba = (0, 0.0, 0.0, 0.0, 0.0, 0.0)
+level_start = bytearray(world_layout.size)
+world_tick = 0
+
+def slot_alive(entity):
+    return ecs.is_live(entity)
+
+def capture_world():
+    coin_bits = 0
+    for i, coin in enumerate(coin_slots):
+        if not slot_alive(coin):
+            coin_bits |= 1 << i
+    for i, goomba in enumerate(goomba_slots):
+        j = i * 6
+        if not slot_alive(goomba):
+            goomba_values[j:j + 6] = dead_goomba
+            continue
+        a = ecs.get(goomba, Patrol).agent
+        goomba_values[j] = 1
+        goomba_values[j + 1], goomba_values[j + 2], goomba_values[j + 3] = a.x, a.y, a.z
+        goomba_values[j + 4], goomba_values[j + 5] = a.dir_x, a.dir_z
+    return coin_bits
+
+def restore_world(state):
+    global world_tick
+    world_tick, player.coins, coin_bits, goombas = state
+    k = player.kernel
+    player.setPos(k.x, k.y, k.z)
+    player.rotation_y = k.rotation_y
+    coin_ui.text = f"Coins: {player.coins}"
+    for i, coin in enumerate(coin_slots):
+        collected = coin_bits >> i & 1
+        if collected and slot_alive(coin):
+            ecs.destroy(coin)
+        elif not collected and not slot_alive(coin):
+            coin_slots[i] = spawn_coin(i)
+    for i, goomba in enumerate(goomba_slots):
+        alive, x, y, z, dx, dz = goombas[i * 6:i * 6 + 6]
+        if not alive:
+            if slot_alive(goomba):
+                ecs.destroy(goomba)
+            continue
+        if not slot_alive(goomba):
+            goomba = goomba_slots[i] = spawn_goomba(i, x, y, z)
+        a = ecs.get(goomba, Patrol).agent
+        a.warp(x, y, z, dx, dz)
+        t = ecs.get(goomba, Transform)
+        t.x, t.y, t.z = a.x, a.y, a.z
+
+def reset_level():
+    restore_world(world_layout.read(level_start, 0, player.kernel))
+    rewind_buffer.clear()
+    player.visual.scale_y = 1.6
+    player.visual.rotation_x = 0
+
+def record_world(task):
+    global world_tick
+    if held_keys['r']:
+        state = rewind_buffer.rewind(player.kernel)
+        if state:
+            restore_world(state)
+    else:
+        world_tick += 1
+        rewind_buffer.record(world_tick, player.kernel, player.coins, capture_world(), goomba_values)
+    return task.cont
+
+world_layout.write(level_start, 0, 0, player.kernel, 0, capture_world(), goomba_values)
+app.taskMgr.add(record_world, 'record_world', sort=2)
+
+# Telemetry: run with --telemetry to stream per-tick state to telemetry/<start time>/
+if '--telemetry' in sys.argv:
+    from sm64_telemetry import TelemetryWriter
+    telemetry = TelemetryWriter(os.path.join('telemetry', time.strftime('%Y%m%d-%H%M%S')))
+    atexit.register(telemetry.close)
+    def log_telemetry(task):
+        k = player.kernel
+        telemetry.log(world_tick, time.dt, k.x, k.y, k.z, k.mom_x, k.mom_z, k.velocity_y,
+                      k.grounded, k.sliding, k.diving, k.jump_count, player.coins)
+        return task.cont
+    app.taskMgr.add(log_telemetry, 'log_telemetry', sort=3)
+
+# Frame pacing: waits out the rest of the frame after it has been rendered and
+# keeps a frame-time histogram either way. With --fps, young GC passes run in
+# the pacer's spare time instead of mid-frame; every pause is logged alongside.
+frame_pacer = FramePacer(target_fps)
+gc_manager = GCManager(defer=bool(target_fps))
+frame_pacer.idle.append(gc_manager.idle)
+def pace_frame(task):
+    frame_pacer.wait()
+    gc_manager.frame()
+    return task.cont
+app.taskMgr.add(pace_frame, 'pace_frame', sort=55)
+atexit.register(lambda: print(frame_pacer.summary() + '\n' + gc_manager.summary() + '\n' + jobs.summary()))
+if '--telemetry' in sys.argv:
+    atexit.register(frame_pacer.export, os.path.join(telemetry.directory, 'frame_pacing.json'))
+    atexit.register(gc_manager.export, os.path.join(telemetry.directory, 'gc_pauses.json'))
+
+# On-demand profiling: P samples the main thread for a few seconds and writes
+# flamegraph / speedscope files; no sampler runs until then
+PROFILE_SECONDS = 5
+profiler = SamplingProfiler(owners=('Mario64.update', 'patrol_goombas', 'separate_goombas', 'move_kinematics',
+                                    'animate', 'sync_nodes', 'CameraController.update', 'record_world',
+                                    'log_telemetry', 'FramePacer.wait'))
+profile_directory = telemetry.directory if '--telemetry' in sys.argv else 'profiles'
+atexit.register(profiler.stop)
 
 # Camera
 camera_pivot = Entity(parent=player)
@@ -302,21 +456,21 @@ class CameraController(Entity):
             mouse.locked = True
         if mouse.right == False:
             mouse.locked = False
+        # Long drops: ease the view down towards where the jump arc says Mario lands
+        k = player.kernel
+        drop = k.y - k.arc.land_y if k.arc.landed and not k.grounded else 0.0
+        camera_pivot.y = lerp(camera_pivot.y, -clamp(drop, 0, 12) * 0.4, min(1, 4 * time.dt))
 
 camera_controller = CameraController()
 
 # Lighting and sky
-sun = DirectionalLight(shadows=True, y=50, z=-20, color=color.rgb(255, 240, 200))
-sun.look_at(Vec3(0, -1, -0.5))
-AmbientLight(color=color.rgba(180, 180, 220, 0.3))
-Sky(color=color.rgb(100, 150, 255))
-scene.fog_density = 0.008
-scene.fog_color = color.rgb(100, 150, 255)
+sun = add_lights()
 
 # UI
 coin_ui = Text("Coins: 0", position=(0.4, 0.45), origin=(0, 0), scale=1.5)
 Text("Super Mario 64 – Ursina SM64 PC Port", y=0.45, origin=(0, 0))
-Text("WASD/Arrows: Move | Space: Jump | Shift: Crouch | F: Dive | G: Ground Pound | Mouse: Camera | Z/X: Zoom | T: Debug", y=0.4, origin=(0, 0), scale=0.8)
+Text("WASD/Arrows: Move | Space: Jump | Shift: Crouch | F: Dive | G: Ground Pound | Mouse: Camera | Z/X: Zoom | R: Rewind | Backspace: Reset | T: Debug | P: Profile", y=0.4, origin=(0, 0), scale=0.8)
 
-# Run
+# Run; everything built so far stays for the session, so the collector can skip it
+gc_manager.start()
 app.run()
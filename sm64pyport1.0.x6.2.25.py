@@ -4,6 +4,12 @@ from math import sin, cos, atan2
 import time
 import numpy as np
 import random
+from sm64_pacing import FramePacer
+from sm64_profiler import SamplingProfiler
+from sm64_timers import TimerWheel
+from sm64_tweens import Tweens
+from sm64_jobs import JobScheduler
+from sm64_entities import EntityIndex, DestroyQueue
 
 # Custom colors for N64-like palette
 color_mario_blue  = color.rgb(0, 0, 255)
@@ -55,14 +61,18 @@ class Mario64(Entity):
         self.momentum         = Vec3(0, 0, 0)
         self.grounded         = True
         self.jump_count       = 0
-        self.last_jump_time   = 0
+        self.jump_window      = None   # timer: a second / third jump chains while it runs
         self.crouching        = False
         self.diving           = False
         self.sliding          = False
-        self.wall_kick_cooldown = 0
+        self.wall_kick_cooldown = None
         self.coins            = 0
         self.show_collider    = False
         self.ground_pound_landed = False
+        # Resting contact: standing still on static ground keeps this surface and skips the rays
+        self.rest_surface     = None
+        self.rest_position    = None
+        self.rest_surface_position = None
 
     def update(self):
         # Camera-based movement
@@ -76,19 +86,21 @@ class Mario64(Entity):
         if held_keys['d'] or held_keys['right arrow']:
             move_dir += camera.right * Vec3(1, 0, 1)
 
+        resting = self.rest_surface is not None and self.still_resting(move_dir)
         if move_dir.length() > 0.01 and not self.sliding:
             move_dir = move_dir.normalized()
             target_rotation = atan2(move_dir.x, move_dir.z) * 180 / 3.14159
             self.rotation_y = lerp(self.rotation_y, target_rotation, 15 * time.dt)
             self.momentum = lerp(self.momentum, move_dir * self.speed, 10 * time.dt)
-        elif not self.sliding:
+        elif not self.sliding and not resting:
             self.momentum = lerp(self.momentum, Vec3(0, 0, 0), 12 * time.dt)
 
         # Collision check
-        ray = raycast(self.world_position + Vec3(0, 0.5, 0), self.momentum.normalized(),
-                      distance=self.momentum.length() * time.dt + 0.2, ignore=[self] + self.children)
-        if not ray.hit:
-            self.position += self.momentum * time.dt
+        if not resting:
+            ray = raycast(self.world_position + Vec3(0, 0.5, 0), self.momentum.normalized(),
+                          distance=self.momentum.length() * time.dt + 0.2, ignore=[self] + self.children)
+            if not ray.hit:
+                self.position += self.momentum * time.dt
 
         # Animations
         self.visual.y = sin(time.time() * 15) * 0.1 if self.grounded and not self.crouching else 0
@@ -101,78 +113,77 @@ class Mario64(Entity):
         elif self.grounded:
             self.visual.rotation_x = lerp(self.visual.rotation_x, 0, 10 * time.dt)
 
-        # Gravity and ground check
-        self.velocity_y -= self.gravity_strength * time.dt
-        self.y += self.velocity_y * time.dt
-        ground_ray = raycast(self.world_position + Vec3(0, 0.1, 0), self.down, distance=1.5, ignore=[self] + self.children)
-        if ground_ray.hit and self.velocity_y <= 0:
-            self.y = ground_ray.world_point.y + 0.05
-            self.velocity_y = 0
-            self.grounded = True
-            self.jump_count = 0
-            self.diving = False
-            if self.ground_pound_landed:
-                self.ground_pound_landed = False
-                for goomba in interactable_entities:
-                    if isinstance(goomba, Goomba) and distance(self, goomba) < 3:
-                        destroy(goomba)
-                        Text("Stunned Goomba!", position=(0.4, 0.35), origin=(0, 0), scale=1.5, duration=1)
-
-            # Slope handling
-            normal = ground_ray.normal
-            slope_angle = acos(normal.y) * 180 / 3.14159
-            if slope_angle > 30 and not self.crouching:
-                self.sliding = True
-                slide_dir = Vec3(normal.x, 0, normal.z).normalized()
-                self.momentum += slide_dir * 8 * time.dt
-                self.visual.rotation_x = 20
+        # Gravity and ground check (resting: the cached contact stands in for all of it)
+        if not resting:
+            self.velocity_y -= self.gravity_strength * time.dt
+            self.y += self.velocity_y * time.dt
+            ground_ray = raycast(self.world_position + Vec3(0, 0.1, 0), self.down, distance=1.5, ignore=[self] + self.children)
+            if ground_ray.hit and self.velocity_y <= 0:
+                self.y = ground_ray.world_point.y + 0.05
+                self.velocity_y = 0
+                self.grounded = True
+                self.jump_count = 0
+                self.diving = False
+                if self.ground_pound_landed:
+                    self.ground_pound_landed = False
+                    for goomba in interactable_entities:
+                        if isinstance(goomba, Goomba) and distance(self, goomba) < 3 and destroy_queue.push(goomba):
+                            popup("Stunned Goomba!")
+
+                # Slope handling
+                normal = ground_ray.normal
+                slope_angle = acos(normal.y) * 180 / 3.14159
+                if slope_angle > 30 and not self.crouching:
+                    self.sliding = True
+                    slide_dir = Vec3(normal.x, 0, normal.z).normalized()
+                    self.momentum += slide_dir * 8 * time.dt
+                    self.visual.rotation_x = 20
+                else:
+                    self.sliding = False
+                    self.visual.rotation_x = lerp(self.visual.rotation_x, 0, 10 * time.dt)
+                    if move_dir.length() <= 0.01 and self.momentum.length() < 0.01:
+                        self.rest_on(ground_ray.entity)
             else:
+                self.grounded = False
                 self.sliding = False
-                self.visual.rotation_x = lerp(self.visual.rotation_x, 0, 10 * time.dt)
-        else:
-            self.grounded = False
-            self.sliding = False
 
         # Wall kick
-        if not self.grounded and self.wall_kick_cooldown <= 0:
+        if not self.grounded and not timers.active(self.wall_kick_cooldown):
             wall_ray = raycast(self.world_position + Vec3(0, 0.5, 0), move_dir, distance=0.7,
                                ignore=[self] + self.children)
             if wall_ray.hit and move_dir.dot(wall_ray.normal) < -0.7:
                 self.velocity_y = 5.0
                 self.momentum = -move_dir * 4
-                self.wall_kick_cooldown = 0.3
-
-        self.wall_kick_cooldown -= time.dt
+                self.wall_kick_cooldown = timers.after(0.3)
 
         # Interactable entities
-        for entity in interactable_entities[:]:
+        for entity in interactable_entities:
+            if destroy_queue.is_pending(entity):
+                continue
             if isinstance(entity, Coin) and distance(self, entity) < 1:
                 self.coins += 1
-                interactable_entities.remove(entity)
-                destroy(entity)
+                destroy_queue.push(entity)
                 # Particle effect
                 for i in range(5):
                     p = Entity(model='quad', color=color_coin_gold, scale=0.1, position=entity.position)
-                    p.animate_position(p.position + Vec3(random.uniform(-0.5, 0.5), 1, random.uniform(-0.5, 0.5)),
-                                      duration=0.5, curve=curve.out_quad)
-                    destroy(p, delay=0.5)
+                    particle_tweens.to(p, 'position', p.position + Vec3(random.uniform(-0.5, 0.5), 1, random.uniform(-0.5, 0.5)),
+                              0.5, curve='out_quad', on_done=destroy)
                 coin_ui.text = f"Coins: {self.coins}"
             if isinstance(entity, Goomba) and distance(self, entity) < 1:
                 if self.velocity_y < -5 and not self.grounded:  # Stomp
-                    interactable_entities.remove(entity)
-                    destroy(entity)
+                    destroy_queue.push(entity)
                     self.velocity_y = 3.0
-                    Text("Stomped Goomba!", position=(0.4, 0.35), origin=(0, 0), scale=1.5, duration=1)
+                    popup("Stomped Goomba!")
                 elif not self.grounded and entity.position.y + 0.5 > self.position.y:
                     self.respawn()
-                    Text("Ouch! Hit by Goomba!", position=(0.4, 0.35), origin=(0, 0), scale=1.5, duration=1)
+                    popup("Ouch! Hit by Goomba!")
 
         # Respawn
         if self.y < -50:
             self.respawn()
 
     def input(self, key):
-        if key == 'space' and (self.grounded or (time.time() - self.last_jump_time < 0.35 and self.jump_count < 3)):
+        if key == 'space' and (self.grounded or (timers.active(self.jump_window) and self.jump_count < 3)):
             if self.grounded:
                 self.jump_count = 1
             else:
@@ -187,9 +198,9 @@ class Mario64(Entity):
 
             self.grounded = False
             self.sliding = False
-            self.last_jump_time = time.time()
-            self.visual.animate_scale_y(1.5, duration=0.1, curve=curve.out_quad)
-            self.visual.animate_scale_y(1.0, duration=0.1, delay=0.2, curve=curve.in_quad)
+            timers.cancel(self.jump_window)
+            self.jump_window = timers.after(0.35)
+            self.squash(1.5)
 
         if key == 'shift':
             self.crouching = True
@@ -213,14 +224,36 @@ class Mario64(Entity):
             self.velocity_y = -10.0
             self.diving = False
             self.ground_pound_landed = True
-            self.visual.animate_scale_y(0.5, duration=0.1, curve=curve.out_quad)
-            self.visual.animate_scale_y(1.0, duration=0.1, delay=0.2, curve=curve.in_quad)
+            self.squash(0.5)
 
         if key == 't':
             self.show_collider = not self.show_collider
             for e in scene.entities:
                 if hasattr(e, 'collider'):
                     e.visible = self.show_collider if e.collider else False
+        if key == 'p' and profiler.capture(5):
+            popup("Profiling 5 s...")
+
+    def rest_on(self, surface):
+        self.momentum = Vec3(0, 0, 0)
+        self.rest_surface = surface
+        self.rest_position = self.position
+        self.rest_surface_position = surface.world_position
+
+    def still_resting(self, move_dir):
+        # Wakes on input, a push (velocity or momentum set from outside), a move, or the ground moving or going away
+        s = self.rest_surface
+        if (move_dir.length() > 0.01 or self.velocity_y != 0 or self.momentum != Vec3(0, 0, 0)
+                or self.position != self.rest_position or s.is_empty() or not s.enabled
+                or s.world_position != self.rest_surface_position):
+            self.rest_surface = None
+            return False
+        return True
+
+    def squash(self, scale_y):
+        # Stretch (or squash) the body, hold it, then spring back
+        squash_tweens.to(self.visual, 'scale_y', scale_y, 0.1, curve='out_quad')
+        squash_tweens.to(self.visual, 'scale_y', 1.0, 0.1, delay=0.2, curve='in_quad')
 
     def respawn(self):
         self.position = (0, 10, 0)
@@ -232,47 +265,101 @@ class Mario64(Entity):
         self.sliding = False
         self.visual.scale_y = 1.6
         self.visual.rotation_x = 0
-        t = Text("Mama mia! You fell!", origin=(0, 0), scale=2)
-        destroy(t, delay=2)
+        popup("Mama mia! You fell!", 2, position=(0, 0), scale=2)
 
 class Coin(Entity):
     def __init__(self, position=(0, 0, 0)):
         super().__init__(model='cylinder', color=color_coin_gold, scale=(0.5, 0.01, 0.5), position=position, collider='box')
         self.base_y = position[1]
-        interactable_entities.append(self)
-    def update(self):
-        self.rotation_y += 120 * time.dt
-        self.y = self.base_y + sin(time.time() * 5) * 0.1
+        self.clock = 0.0    # sim time it has spun for, so a deferred spin bobs on from where it was
+        interactable_entities.add(self)
+    def spin(self, dt):
+        self.clock += dt
+        self.rotation_y += 120 * dt
+        self.y = self.base_y + sin(self.clock * 5) * 0.1
 
 class Goomba(Entity):
     def __init__(self, position=(0, 0, 0)):
         super().__init__(model='sphere', color=color_dirt_brown, scale=1, position=position, collider='sphere')
         self.direction = Vec3(random.uniform(-1, 1), 0, random.uniform(-1, 1)).normalized()
-        interactable_entities.append(self)
-    def update(self):
+        self.clock = 0.0
+        interactable_entities.add(self)
+    def walk(self, dt):
+        self.clock += dt
         if not hasattr(self, 'grounded'):
             self.grounded = True
         ground_ray = raycast(self.position + Vec3(0, 0.1, 0), self.down, distance=1.5)
         if ground_ray.hit:
             self.y = ground_ray.world_point.y + 0.5
-            self.position += self.direction * 2 * time.dt
+            self.position += self.direction * 2 * dt
             if abs(self.x) > 25 or abs(self.z) > 25:
                 self.direction = -self.direction
             self.grounded = True
         else:
             self.grounded = False
-        self.scale = 1 + sin(time.time() * 5) * 0.1
+        self.scale = 1 + sin(self.clock * 5) * 0.1
 
 # Scene setup
 app = Ursina(vsync=False)
+# Uncapped, this spins a core at 1000+ FPS; the pacer sleeps out the rest of each frame instead
+frame_pacer = FramePacer(60)
+def pace_frame(task):
+    frame_pacer.wait()
+    return task.cont
+app.taskMgr.add(pace_frame, 'pace_frame', sort=55)
+# Cooldowns, the jump window and popup expiry: one timer wheel, run before the updates
+timers = TimerWheel(tick_rate=60)
+def run_timers(task):
+    timers.advance(time.dt)
+    return task.cont
+app.taskMgr.add(run_timers, 'run_timers', sort=-2)
+# Squash and stretch is Mario's feedback and runs every frame after the updates;
+# the coin particles are cosmetic and are a job
+squash_tweens = Tweens()
+particle_tweens = Tweens()
+def run_tweens(task):
+    squash_tweens.update(time.dt)
+    return task.cont
+app.taskMgr.add(run_tweens, 'run_tweens', sort=1)
+# Goomba AI, particles and coin spin share a 3 ms budget after the updates, most
+# overdue first; what does not fit waits a frame and catches up with a longer dt.
+# Mario64.update is an Entity update and always runs
+def goomba_ai(dt):
+    for entity in interactable_entities:
+        if isinstance(entity, Goomba):
+            entity.walk(dt)
+def coin_spin(dt):
+    for entity in interactable_entities:
+        if isinstance(entity, Coin):
+            entity.spin(dt)
+jobs = JobScheduler(budget_ms=3.0)
+jobs.add('goomba_ai', goomba_ai, priority=2)
+jobs.add('particles', particle_tweens.update, priority=1)
+jobs.add('coin_spin', coin_spin, priority=0, hz=30)
+def run_jobs(task):
+    jobs.run(time.dt)
+    return task.cont
+app.taskMgr.add(run_jobs, 'run_jobs', sort=1)
+
+def popup(message, seconds=1, position=(0.4, 0.35), scale=1.5):
+    t = Text(message, position=position, origin=(0, 0), scale=scale)
+    timers.after(seconds, destroy, t)
+    return t
+# P: sample the next 5 s (Mario64.update and the Goomba / Coin jobs vs the engine) into profiles/
+profiler = SamplingProfiler(owners=('Mario64.update', 'Goomba.walk', 'Coin.spin'))
 window.title = 'Super Mario 64 – Ursina SM64 PC Port'
 window.borderless = False
 window.exit_button.visible = False
 window.fps_counter.enabled = True
 window.size = (1280, 720)
 
-# Interactable entities list
-interactable_entities = []
+# Interactable entities: removed mid-frame through the queue, then unlinked and destroyed together after the jobs
+interactable_entities = EntityIndex()
+destroy_queue = DestroyQueue(destroy, interactable_entities)
+def flush_destroy_queue(task):
+    destroy_queue.flush()
+    return task.cont
+app.taskMgr.add(flush_destroy_queue, 'flush_destroy_queue', sort=2)
 
 # Terrain
 ground = Entity(model='cube', collider='box', scale=(120, 0.1, 120), position=(0, -0.05, 0), color=color_grass_green)
@@ -340,6 +427,6 @@ scene.fog_color = color.rgb(100, 150, 255)
 # UI
 coin_ui = Text("Coins: 0", position=(0.4, 0.45), origin=(0, 0), scale=1.5)
 Text("Super Mario 64 – Ursina SM64 PC Port", y=0.45, origin=(0, 0))
-Text("WASD/Arrows: Move | Space: Jump | Shift: Crouch | F: Dive | G: Ground Pound | Q/E: Camera | Z/X: Zoom | T: Debug", y=0.4, origin=(0, 0), scale=0.8)
+Text("WASD/Arrows: Move | Space: Jump | Shift: Crouch | F: Dive | G: Ground Pound | Q/E: Camera | Z/X: Zoom | T: Debug | P: Profile", y=0.4, origin=(0, 0), scale=0.8)
 
 app.run()